@@ -0,0 +1,91 @@
+"""Import-time benchmark: how long fresh interpreters take to import the package.
+
+    python -m benchmarks.bench_import [--runs 10] [--check] [--json results.json]
+
+Each statement runs in `--runs` new interpreters and the median is reported. With
+`--check`, the exit status is 1 if any median is above its threshold in THRESHOLDS, or if
+a statement loads a module it shouldn't.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+# Median milliseconds allowed per statement, with room for slow CI machines
+THRESHOLDS: Dict[str, float] = {
+    "import swarm": 50,
+    "from swarm import Swarm": 800,
+}
+
+# Modules each statement must not load, since they are only needed by opt-in features
+FORBIDDEN: Dict[str, Sequence[str]] = {
+    "import swarm": ("scrapybara", "pydantic"),
+    "from swarm import Swarm": ("http.server", "multiprocessing", "PIL", "zstandard", "swarm.broker", "swarm.cache", "swarm.checkpoint", "swarm.hedging", "swarm.placement", "swarm.ratelimit", "sqlite3"),
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {forbidden!r} if m in sys.modules))
+"""
+
+
+def measure(statement: str, runs: int = 10) -> Dict:
+    """Median and spread of the import time of `statement`, and the forbidden modules it loaded"""
+    forbidden = tuple(FORBIDDEN.get(statement, ()))
+    times: List[float] = []
+    loaded = set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", PROBE.format(statement=statement, forbidden=forbidden)],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+        times.append(float(out[0]) * 1000)
+        loaded.update(m for m in (out[1].split(",") if len(out) > 1 else []) if m)
+    return {
+        "statement": statement,
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "threshold_ms": THRESHOLDS.get(statement),
+        "forbidden_loaded": sorted(loaded),
+    }
+
+
+def regressions(rows: List[Dict]) -> List[str]:
+    problems = []
+    for row in rows:
+        if row["threshold_ms"] is not None and row["median_ms"] > row["threshold_ms"]:
+            problems.append(f"{row['statement']}: {row['median_ms']:.1f} ms > {row['threshold_ms']} ms")
+        if row["forbidden_loaded"]:
+            problems.append(f"{row['statement']}: loaded {', '.join(row['forbidden_loaded'])}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Interpreters to start per statement")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = [measure(statement, args.runs) for statement in THRESHOLDS]
+    for row in rows:
+        print(f"{row['statement']:<28} {row['median_ms']:8.1f} ms  (min {row['min_ms']:.1f}, max {row['max_ms']:.1f}, threshold {row['threshold_ms']})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    problems = regressions(rows)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Offline benchmarks of the orchestration layer, run against the fake Scrapybara client.
+
+    python -m benchmarks.bench_orchestration [--quick] [--json results.json]
+
+- overhead: time the swarm spends per act call when the model answers instantly
+- throughput: tasks per second for swarms of 1 to 64 agents with a fixed model latency
+- memory: heap growth per turn as an agent's history gets longer
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+from swarm import Swarm, Agent
+from swarm.tools import OrchestratorSchema
+from tests.mock_client import FakeScrapybara, FakeStep
+
+
+def make_plan(assignments: Sequence[tuple]) -> OrchestratorSchema:
+    return OrchestratorSchema(
+        overall_task="benchmark",
+        task_assignments=[
+            OrchestratorSchema.TaskAssignment(id=f"t{i}", agent_name=name, prompt=prompt)
+            for i, (name, prompt) in enumerate(assignments)
+        ],
+        execution_notes="",
+    )
+
+
+def quiet(step) -> None:
+    """Agents print every step by default, which would dominate the timings"""
+
+
+def make_swarm(client: FakeScrapybara, agents: int, **kwargs) -> tuple:
+    workers = [Agent(name=f"Agent{i}", on_step=quiet, **kwargs) for i in range(agents)]
+    orchestrator = Agent(name="Orchestrator", orchestrator=True, on_step=quiet)
+    return Swarm([orchestrator] + workers, client=client, max_concurrency=agents), orchestrator, workers
+
+
+def bench_overhead(tasks: int = 200, agents: int = 4) -> Dict:
+    """Wall time per act call with a zero-latency model, i.e. the swarm's own cost"""
+    names = [f"Agent{i}" for i in range(agents)]
+    client = FakeScrapybara([make_plan([(names[i % agents], f"task {i}") for i in range(tasks)])])
+    swarm, orchestrator, _ = make_swarm(client, agents)
+
+    start = time.perf_counter()
+    swarm.run(orchestrator, prompt="benchmark")
+    elapsed = time.perf_counter() - start
+    return {
+        "tasks": tasks,
+        "act_calls": client.act_calls,
+        "seconds": elapsed,
+        "ms_per_act": 1000 * elapsed / client.act_calls,
+    }
+
+
+def bench_throughput(sizes: Sequence[int] = (1, 2, 4, 8, 16, 32, 64), tasks_per_agent: int = 4,
+                     latency: float = 0.05) -> List[Dict]:
+    """Tasks per second as the swarm grows. `efficiency` is the ideal wall time over the actual one."""
+    rows = []
+    for size in sizes:
+        names = [f"Agent{i}" for i in range(size)]
+        plan = make_plan([(name, f"task {j}") for j in range(tasks_per_agent) for name in names])
+        client = FakeScrapybara([plan], latency=latency)
+        swarm, orchestrator, _ = make_swarm(client, size)
+
+        start = time.perf_counter()
+        swarm.run(orchestrator, prompt="benchmark")
+        elapsed = time.perf_counter() - start
+        # Two planning calls, then every agent works through its tasks in parallel
+        ideal = (2 + tasks_per_agent) * latency
+        rows.append({
+            "agents": size,
+            "tasks": size * tasks_per_agent,
+            "seconds": elapsed,
+            "tasks_per_second": size * tasks_per_agent / elapsed,
+            "efficiency": ideal / elapsed,
+        })
+    return rows
+
+
+def bench_memory(turns: int = 200, output_chars: int = 2000, context_budget: Optional[int] = None) -> Dict:
+    """Heap growth over a long run of one agent whose every task produces `output_chars` of tool output"""
+    def script(prompt: str) -> List[FakeStep]:
+        return [
+            FakeStep(text="looking", tool_calls=[("bash", {"command": f"echo {'x' * output_chars}"})]),
+            FakeStep(text=f"done: {prompt}"),
+        ]
+
+    client = FakeScrapybara([make_plan([("Agent0", f"task {i}")]) for i in range(turns)], script=script)
+    swarm, orchestrator, workers = make_swarm(client, 1, context_budget=context_budget)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        swarm.run(orchestrator, prompt="benchmark")
+        final, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "turns": turns,
+        "context_budget": context_budget,
+        "history_messages": len(workers[0].messages),
+        "final_kb": (final - baseline) / 1024,
+        "peak_kb": (peak - baseline) / 1024,
+        "kb_per_turn": (final - baseline) / 1024 / turns,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smaller runs, for a quick sanity check")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    scale = 0.1 if args.quick else 1
+    results = {
+        "overhead": bench_overhead(tasks=int(200 * scale)),
+        "throughput": bench_throughput(
+            sizes=(1, 4, 16) if args.quick else (1, 2, 4, 8, 16, 32, 64),
+            latency=0.05 * scale,
+        ),
+        "memory": [
+            bench_memory(turns=int(200 * scale)),
+            bench_memory(turns=int(200 * scale), context_budget=4000),
+        ],
+    }
+
+    overhead = results["overhead"]
+    print(f"overhead: {overhead['ms_per_act']:.2f} ms per act call ({overhead['act_calls']} calls)")
+    print("throughput:")
+    for row in results["throughput"]:
+        print(f"  {row['agents']:>3} agents: {row['tasks_per_second']:8.1f} tasks/s, efficiency {row['efficiency']:.0%}")
+    print("memory:")
+    for row in results["memory"]:
+        print(
+            f"  budget {str(row['context_budget']):>5}: {row['kb_per_turn']:.1f} KiB per turn, "
+            f"peak {row['peak_kb']:.0f} KiB, {row['history_messages']} messages kept"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
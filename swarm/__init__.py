@@ -1,4 +1,22 @@
-from .core import Swarm
-from .types import Agent, Response
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# The exports are imported on first use, so that `import swarm` and its lightweight
+# submodules don't pay for loading scrapybara
+if TYPE_CHECKING:
+    from .core import Swarm
+    from .types import Agent, Response
 
 __all__ = ["Swarm", "Agent", "Response"]
+
+_EXPORTS = {"Swarm": ".core", "Agent": ".types", "Response": ".types"}
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,244 @@
+import abc
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .tools import OrchestratorSchema
+
+class WorkerError(Exception):
+    """Raised on the coordinator when a worker failed an assignment with something other than an ApiError"""
+
+class WorkItem(BaseModel):
+    """One task assignment for a worker to run"""
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    agent_name: str
+    assignment: Optional[OrchestratorSchema.TaskAssignment] = None
+    prompt: Optional[str] = None  # The task prompt, including upstream results
+    messages: List[Any] = []  # The agent's history, serialized with to_json
+    lease: Optional[str] = None  # Set by brokers that lease items to workers, to fence off stale updates
+
+class WorkUpdate(BaseModel):
+    """A step a worker took for an item, or the item's result"""
+    item_id: str
+    kind: Literal["step", "result"]
+    data: Dict[str, Any] = {}
+    worker: Optional[str] = None
+    lease: Optional[str] = None  # The lease of the item the worker was given
+
+class Broker(abc.ABC):
+    """Carries work items from a coordinator to workers and their updates back.
+
+    The coordinator calls `submit` and `updates`, and workers call `fetch` and `publish`.
+    Implementations must be safe to use from several threads.
+    """
+
+    @abc.abstractmethod
+    def submit(self, item: WorkItem) -> None:
+        """Queue an item for the workers"""
+
+    @abc.abstractmethod
+    def fetch(self, timeout: Optional[float] = None) -> Optional[WorkItem]:
+        """The next item to work on, waiting at most `timeout` seconds. None on timeout."""
+
+    @abc.abstractmethod
+    def publish(self, update: WorkUpdate) -> None:
+        """Send an update for an item back to the coordinator"""
+
+    @abc.abstractmethod
+    def updates(self, timeout: Optional[float] = None) -> List[WorkUpdate]:
+        """Updates published since the last call, in order, waiting at most `timeout` seconds for one"""
+
+    def close(self) -> None:
+        pass
+
+class QueueBroker(Broker):
+    """A broker on multiprocessing queues, for workers in processes started by the coordinator.
+
+    Pass the broker to the worker processes when starting them. Items are handed out in
+    the order they were submitted.
+    """
+
+    def __init__(self, context: Optional[Any] = None):
+        if context is None:
+            import multiprocessing
+            context = multiprocessing.get_context()
+        self._items = context.Queue()
+        self._updates = context.Queue()
+
+    def submit(self, item: WorkItem) -> None:
+        self._items.put(item.model_dump_json())
+
+    def fetch(self, timeout: Optional[float] = None) -> Optional[WorkItem]:
+        try:
+            return WorkItem.model_validate_json(self._items.get(timeout=timeout))
+        except queue.Empty:
+            return None
+
+    def publish(self, update: WorkUpdate) -> None:
+        self._updates.put(update.model_dump_json())
+
+    def updates(self, timeout: Optional[float] = None) -> List[WorkUpdate]:
+        try:
+            data = [self._updates.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                data.append(self._updates.get_nowait())
+            except queue.Empty:
+                return [WorkUpdate.model_validate_json(d) for d in data]
+
+    def close(self) -> None:
+        """Flush what this process put on the queues and stop their feeder threads"""
+        for q in (self._items, self._updates):
+            q.close()
+            q.join_thread()
+
+class SQLiteBroker(Broker):
+    """A broker in an SQLite database, shared by coordinator and worker processes on one host.
+
+    Workers get the highest priority item first. An item without a result `lease_seconds`
+    after a worker took it, or after the worker's last step, is handed out again with a
+    new lease, in case that worker died. Updates carrying an older lease are dropped, so
+    a slow worker that lost its lease can't report a second result. Waiting calls poll
+    the database every `poll_interval` seconds.
+    """
+
+    def __init__(self, path: str = ".swarm_cache/broker.sqlite", lease_seconds: float = 3600, poll_interval: float = 0.05):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, priority INTEGER NOT NULL, data TEXT NOT NULL, claimed REAL, done INTEGER NOT NULL DEFAULT 0, lease TEXT)"
+        )
+        # Databases created before items were fenced by lease
+        if "lease" not in [row[1] for row in self._db.execute("PRAGMA table_info(items)")]:
+            self._db.execute("ALTER TABLE items ADD COLUMN lease TEXT")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS updates (seq INTEGER PRIMARY KEY AUTOINCREMENT, item_id TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._db.commit()
+        # Only updates published from now on are for this coordinator
+        self._cursor = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM updates").fetchone()[0]
+
+    def submit(self, item: WorkItem) -> None:
+        priority = item.assignment.priority if item.assignment else 1
+        with self._lock:
+            self._db.execute("INSERT INTO items (id, priority, data) VALUES (?, ?, ?)", (item.id, priority, item.model_dump_json()))
+            self._db.commit()
+
+    def _claim(self) -> Optional[WorkItem]:
+        now = time.time()
+        with self._lock:
+            # A single statement, so two workers can't claim the same item
+            row = self._db.execute(
+                "UPDATE items SET claimed = ?, lease = ? WHERE seq = (SELECT seq FROM items WHERE done = 0 AND (claimed IS NULL OR claimed < ?) "
+                "ORDER BY priority DESC, seq LIMIT 1) RETURNING data, lease",
+                (now, uuid.uuid4().hex, now - self.lease_seconds),
+            ).fetchone()
+            self._db.commit()
+        if row is None:
+            return None
+        item = WorkItem.model_validate_json(row[0])
+        item.lease = row[1]
+        return item
+
+    def fetch(self, timeout: Optional[float] = None) -> Optional[WorkItem]:
+        return _poll(self._claim, timeout, self.poll_interval)
+
+    def publish(self, update: WorkUpdate) -> None:
+        with self._lock:
+            if update.lease is not None:
+                # Each step renews the lease, and updates under a lease that was handed on are stale
+                renewed = self._db.execute(
+                    "UPDATE items SET claimed = ? WHERE id = ? AND lease = ? AND done = 0",
+                    (time.time(), update.item_id, update.lease),
+                ).rowcount
+                if not renewed:
+                    self._db.commit()
+                    return
+            self._db.execute("INSERT INTO updates (item_id, data) VALUES (?, ?)", (update.item_id, update.model_dump_json()))
+            if update.kind == "result":
+                self._db.execute("UPDATE items SET done = 1 WHERE id = ?", (update.item_id,))
+            self._db.commit()
+
+    def _read(self) -> List[WorkUpdate]:
+        with self._lock:
+            rows = self._db.execute("SELECT seq, data FROM updates WHERE seq > ? ORDER BY seq", (self._cursor,)).fetchall()
+            if rows:
+                self._cursor = rows[-1][0]
+        return [WorkUpdate.model_validate_json(data) for _, data in rows]
+
+    def updates(self, timeout: Optional[float] = None) -> List[WorkUpdate]:
+        return _poll(self._read, timeout, self.poll_interval) or []
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def _poll(read: Callable[[], Any], timeout: Optional[float], interval: float) -> Any:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        value = read()
+        if value or (deadline is not None and time.monotonic() >= deadline):
+            return value
+        time.sleep(interval if deadline is None else max(0.0, min(interval, deadline - time.monotonic())))
+
+class Dispatcher:
+    """The coordinator's side of a broker: submits items and routes updates back to them.
+
+    A single reader polls the broker while items are outstanding. Updates for items that
+    are no longer awaited, e.g. from a worker whose lease expired, are dropped.
+    """
+
+    def __init__(self, broker: Broker, poll: float = 0.5):
+        self.broker = broker
+        self.poll = poll
+        self._pending: Dict[str, Tuple[asyncio.Future, Callable[[WorkUpdate], None]]] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    async def run(self, item: WorkItem, on_step: Callable[[WorkUpdate], None]) -> WorkUpdate:
+        """Submit an item and wait for its result. `on_step` is called on a worker thread
+        with each step update, in order."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending[item.id] = (future, on_step)
+        try:
+            await asyncio.to_thread(self.broker.submit, item)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+            return await future
+        finally:
+            self._pending.pop(item.id, None)
+
+    async def _read(self) -> None:
+        try:
+            while self._pending:
+                for update in await asyncio.to_thread(self.broker.updates, self.poll):
+                    entry = self._pending.get(update.item_id)
+                    if entry is None or entry[0].done():
+                        continue
+                    future, on_step = entry
+                    if update.kind == "result":
+                        future.set_result(update)
+                        continue
+                    try:
+                        await asyncio.to_thread(on_step, update)
+                    except Exception as e:
+                        future.set_exception(e)
+        except Exception as e:
+            # Don't leave the items waiting on a broker that broke
+            for future, _ in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import threading
+import time
+from heapq import heappop, heappush
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+BROADCAST = "*"  # Recipient of messages for every mailbox but the sender's
+
+class AgentMessage(BaseModel):
+    """A message from one agent to another, or to every agent"""
+    sender: str
+    recipient: str  # An agent name, or BROADCAST
+    type: str = "message"  # e.g. "handoff_request"
+    content: Dict[str, Any] = {}
+    priority: int = 1  # Higher number = delivered first, like TaskAssignment.priority
+    task_id: Optional[str] = None  # The task the sender was working on
+    key: Optional[str] = None  # Pending messages in a mailbox with the same key are coalesced
+    timestamp: float = Field(default_factory=time.time)
+
+class MessageBus:
+    """Per-agent priority mailboxes, safe to use from worker threads and the event loop.
+
+    Messages are received highest priority first, then in the order they were sent. A
+    message with the same `key` as one still pending in the mailbox is coalesced into it,
+    raising its priority if needed. `receive` and `areceive` wait for a message instead of
+    polling.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._cond = threading.Condition()
+        self._mailboxes: Dict[str, List[list]] = {}  # Heaps of [-priority, seq, message, live]
+        self._pending: Dict[str, int] = {}  # Live entries per mailbox
+        self._keys: Dict[Tuple[str, str], list] = {}  # Pending entry per (mailbox, key)
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._seq = itertools.count()
+        self.coalesced = 0
+        for name in names:
+            self.register(name)
+
+    def register(self, name: str) -> None:
+        """Create a mailbox for `name` if it doesn't have one"""
+        with self._cond:
+            self._mailboxes.setdefault(name, [])
+            self._pending.setdefault(name, 0)
+            self._waiters.setdefault(name, [])
+
+    def _put(self, name: str, message: AgentMessage) -> bool:
+        pending = self._keys.get((name, message.key)) if message.key else None
+        if pending:
+            self.coalesced += 1
+            if message.priority > pending[2].priority:
+                # Replace the entry, keeping its place among messages of the same priority
+                pending[3] = False
+                entry = [-message.priority, pending[1], pending[2].model_copy(update={"priority": message.priority}), True]
+                heappush(self._mailboxes[name], entry)
+                self._keys[(name, message.key)] = entry
+            return False
+        entry = [-message.priority, next(self._seq), message, True]
+        heappush(self._mailboxes[name], entry)
+        self._pending[name] += 1
+        if message.key:
+            self._keys[(name, message.key)] = entry
+        return True
+
+    def send(self, message: AgentMessage) -> int:
+        """Deliver a message. Returns the number of mailboxes it was added to rather than coalesced into."""
+        with self._cond:
+            if message.recipient == BROADCAST:
+                recipients = [name for name in self._mailboxes if name != message.sender]
+            elif message.recipient in self._mailboxes:
+                recipients = [message.recipient]
+            else:
+                raise ValueError(f"Unknown recipient: {message.recipient}")
+            delivered = sum(self._put(name, message) for name in recipients)
+            self._cond.notify_all()
+            for name in recipients:
+                for loop, future in self._waiters[name]:
+                    loop.call_soon_threadsafe(_wake, future)
+        return delivered
+
+    def _pop(self, name: str) -> Optional[AgentMessage]:
+        heap = self._mailboxes.get(name, [])
+        while heap:
+            _, _, message, live = heappop(heap)
+            if live:
+                self._pending[name] -= 1
+                if message.key:
+                    del self._keys[(name, message.key)]
+                return message
+        return None
+
+    def receive(self, name: str, timeout: Optional[float] = None) -> Optional[AgentMessage]:
+        """The next message for `name`, waiting at most `timeout` seconds. None on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending.get(name), timeout)
+            return self._pop(name)
+
+    async def areceive(self, name: str, timeout: Optional[float] = None) -> Optional[AgentMessage]:
+        """Like `receive`, but waits without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self._cond:
+                message = self._pop(name)
+                if message or (deadline is not None and loop.time() >= deadline):
+                    return message
+                waiter = (loop, loop.create_future())
+                self._waiters.setdefault(name, []).append(waiter)
+            try:
+                await asyncio.wait_for(waiter[1], None if deadline is None else deadline - loop.time())
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._waiters[name].remove(waiter)
+
+    def drain(self, name: str) -> List[AgentMessage]:
+        """Take every pending message for `name`, in the order they would be received"""
+        with self._cond:
+            messages = []
+            while (message := self._pop(name)) is not None:
+                messages.append(message)
+            return messages
+
+    def pending(self, name: Optional[str] = None) -> int:
+        """Number of messages waiting for `name`, or for everyone"""
+        with self._cond:
+            return self._pending.get(name, 0) if name else sum(self._pending.values())
+
+    def clear(self) -> None:
+        """Drop every pending message"""
+        with self._cond:
+            for name in self._mailboxes:
+                self._mailboxes[name] = []
+                self._pending[name] = 0
+            self._keys.clear()
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
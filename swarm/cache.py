@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+import shlex
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Literal, Optional, Tuple
+
+from scrapybara.tools import Tool
+
+from .tools import OrchestratorSchema
+
+class PlanCache:
+    """A persistent LRU cache of orchestrator plans, stored in SQLite.
+
+    Plans are keyed by the task prompt, the orchestrator's system prompt (which contains
+    the agent roster) and the model, so changing any of them misses the cache. Entries
+    expire `ttl` seconds after they were stored and the least recently used ones are
+    evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path: str = ".swarm_cache/plans.sqlite", max_entries: int = 1000, ttl: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, plan TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(prompt: str, system: str, model: Any) -> str:
+        """Stable hash of everything the orchestrator's first plan depends on"""
+        model_id = f"{model.provider}/{model.name}" if hasattr(model, "name") else str(model)
+        payload = json.dumps([prompt, system, model_id])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[OrchestratorSchema]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT plan, created FROM plans WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE plans SET used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return OrchestratorSchema.model_validate_json(row[0])
+
+    def put(self, key: str, plan: OrchestratorSchema) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans (key, plan, created, used) VALUES (?, ?, ?, ?)",
+                (key, plan.model_dump_json(), now, now),
+            )
+            self._db.execute(
+                "DELETE FROM plans WHERE key NOT IN (SELECT key FROM plans ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM plans")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# Shell commands that only read state, and git subcommands that only read the repository.
+# Commands that run another command, like env, xargs or timeout, are left out.
+READ_ONLY_COMMANDS = {
+    "cat", "df", "du", "echo", "file", "find", "grep", "head", "hostname", "id", "ls",
+    "printenv", "pwd", "rg", "stat", "tail", "tree", "uname", "wc", "which", "whoami",
+}
+READ_ONLY_GIT_COMMANDS = {"blame", "diff", "log", "ls-files", "rev-parse", "show", "status"}
+MUTATING_FIND_FLAGS = {"-delete", "-exec", "-execdir", "-ok", "-okdir", "-fprint", "-fprint0", "-fprintf", "-fls"}
+_COMMAND_SEPARATORS = re.compile(r"\|\||&&|[|;&\n]")
+
+ToolCallKind = Literal["read", "volatile", "write"]
+
+def is_read_only_command(command: Optional[str]) -> bool:
+    """Whether a bash command is made only of known read-only commands, without redirections"""
+    if not command or any(token in command for token in (">", "`", "$(", "<(")):
+        return False
+    for segment in _COMMAND_SEPARATORS.split(command):
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            return False
+        if not words:
+            continue
+        name = os.path.basename(words[0])
+        if name == "git":
+            if len(words) < 2 or words[1] not in READ_ONLY_GIT_COMMANDS:
+                return False
+            # e.g. git diff --output=patch.diff writes the diff to a file
+            if any(word.startswith("--output") for word in words[2:]):
+                return False
+        elif name == "find":
+            if MUTATING_FIND_FLAGS.intersection(words):
+                return False
+        elif name not in READ_ONLY_COMMANDS:
+            return False
+    return True
+
+class ToolCallCache:
+    """Memoizes read-only tool calls per instance.
+
+    Calls are classified as "read" (cached by instance, tool and arguments), "volatile"
+    (never cached, e.g. screenshots) or "write" (never cached, and they clear the cache of
+    their instance). Tools listed in `read_only` or `volatile` are classified as such,
+    other unknown tools count as writes. Cached results expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: Optional[float] = 60, read_only: Iterable[str] = (), volatile: Iterable[str] = ()):
+        self.ttl = ttl
+        self.read_only = set(read_only)
+        self.volatile = set(volatile)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[Tuple[str, str], Tuple[Any, float]]] = {}  # instance -> (tool, args) -> (result, time)
+
+    def classify(self, tool_name: str, args: Dict[str, Any]) -> ToolCallKind:
+        if tool_name in self.read_only:
+            return "read"
+        if tool_name in self.volatile:
+            return "volatile"
+        match tool_name:
+            case "bash":
+                if args.get("restart"):
+                    return "write"
+                if args.get("list_sessions") or args.get("check_session") is not None:
+                    return "volatile"
+                return "read" if is_read_only_command(args.get("command")) else "write"
+            case "str_replace_editor":
+                return "read" if args.get("command") == "view" else "write"
+            case "computer":
+                return "volatile" if args.get("action") in ("take_screenshot", "get_cursor_position") else "write"
+        return "write"
+
+    def call(self, instance_id: str, tool: Tool, args: Dict[str, Any]) -> Any:
+        kind = self.classify(tool.name, args)
+        if kind == "volatile":
+            return tool(**args)
+        if kind == "write":
+            self.invalidate(instance_id)
+            return tool(**args)
+
+        key = (tool.name, json.dumps(args, sort_keys=True, default=str))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(instance_id, {}).get(key)
+            if entry and (self.ttl is None or now - entry[1] <= self.ttl):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        result = tool(**args)
+        with self._lock:
+            self._entries.setdefault(instance_id, {})[key] = (result, now)
+        return result
+
+    def invalidate(self, instance_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(instance_id, None):
+                self.invalidations += 1
+
+    def wrap(self, tool: Tool, instance_id: str) -> "CachedTool":
+        return CachedTool(tool, self, instance_id)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+class CachedTool(Tool):
+    """A tool whose calls go through a ToolCallCache"""
+    _tool: Tool
+    _cache: ToolCallCache
+    _instance_id: str
+
+    def __init__(self, tool: Tool, cache: ToolCallCache, instance_id: str) -> None:
+        super().__init__(name=tool.name, description=tool.description, parameters=tool.parameters)
+        self._tool = tool
+        self._cache = cache
+        self._instance_id = instance_id
+
+    def __call__(self, **kwargs: Any) -> Any:
+        return self._cache.call(self._instance_id, self._tool, kwargs)
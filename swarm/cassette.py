@@ -0,0 +1,189 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, IO, List, Optional
+
+from scrapybara.core.api_error import ApiError
+from scrapybara.types.act import ActResponse, Message, Step, TextPart, TokenUsage, UserMessage
+
+from .images import IMAGE_KEYS
+from .util import step_messages, to_json
+
+class CassetteMiss(LookupError):
+    """Raised when a replayed act call doesn't match anything in the cassette"""
+
+def _open(path: str, mode: str) -> IO[str]:
+    """Open a cassette as text, zstd-compressed if the path ends in .zst"""
+    if str(path).endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd cassettes require zstandard: pip install 'capyswarm[cassettes]'") from e
+        return zstandard.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def _strip_images(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_strip_images(v) for v in value]
+    if isinstance(value, dict):
+        return {
+            k: _strip_images(v) for k, v in value.items()
+            if k not in IMAGE_KEYS and not (k == "image" and value.get("type") == "image")
+        }
+    return value
+
+def request_key(model: Any, tools: List[Any], system: Optional[str], messages: Optional[List[Message]] = None,
+                schema: Any = None, prompt: Optional[str] = None, **kwargs) -> str:
+    """Stable hash of an act request.
+
+    Screenshots are left out, since they rarely come out byte for byte the same twice, and
+    so is the model's API key.
+    """
+    if prompt is not None and not messages:
+        messages = [UserMessage(content=[TextPart(text=prompt)])]
+    request = {
+        "model": [getattr(model, "provider", None), getattr(model, "name", str(model))],
+        "system": system,
+        "tools": sorted(tool.name for tool in tools),
+        "schema": schema.model_json_schema() if schema else None,
+        "messages": _strip_images(to_json(messages or [])),
+        "options": {k: kwargs[k] for k in ("temperature", "max_tokens") if kwargs.get(k) is not None},
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+class RecordingClient:
+    """Wraps a Scrapybara client and writes every act call to a JSONL cassette.
+
+    Each line holds the request's key, the steps as they were passed to `on_step`, and the
+    structured output and usage, or the ApiError the call raised. Use a `.zst` path to
+    compress the cassette, and `close()` it when done. Everything but `act` is passed
+    through to the wrapped client.
+    """
+
+    def __init__(self, client: Any, path: str):
+        self.client = client
+        self.path = path
+        self._file = _open(path, "wt")
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def act(self, model, tools, system, messages=None, schema=None, on_step=None, **kwargs) -> ActResponse:
+        entry = {"key": request_key(model, tools, system, messages, schema, **kwargs), "steps": []}
+
+        def record_step(step: Step) -> None:
+            # Recorded before on_step runs, since the swarm may rewrite tool results
+            entry["steps"].append(to_json(step))
+            if on_step:
+                on_step(step)
+
+        try:
+            response = self.client.act(
+                model=model, tools=tools, system=system, messages=messages, schema=schema, on_step=record_step, **kwargs
+            )
+        except ApiError as e:
+            entry["error"] = {"status_code": e.status_code, "body": to_json(e.body)}
+            self._write(entry)
+            raise
+        except Exception:
+            # e.g. a budget stopping the agent from within on_step
+            entry["interrupted"] = True
+            self._write(entry)
+            raise
+        entry["output"] = to_json(response.output)
+        entry["usage"] = to_json(response.usage)
+        self._write(entry)
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "RecordingClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class ReplayBrowser:
+    def stop(self) -> None:
+        pass
+
+class ReplayInstance:
+    """Stands in for a Scrapybara instance during replay. Its tools are never called."""
+
+    def __init__(self, instance_id: str):
+        self.id = instance_id
+        self.status = "running"
+        self.browser = ReplayBrowser()
+
+    def stop(self) -> None:
+        self.status = "terminated"
+
+class ReplayClient:
+    """Serves act calls from a cassette written by RecordingClient, without the API or instances.
+
+    Calls are matched by `request_key`. Identical requests are served in the order they were
+    recorded, and a request that isn't in the cassette raises CassetteMiss. Steps are passed
+    to `on_step` and recorded ApiErrors are raised again, just like the live call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.instances: List[ReplayInstance] = []
+        self._lock = threading.Lock()
+        with _open(path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["key"]].append(entry)
+
+    def start_ubuntu(self, **kwargs) -> ReplayInstance:
+        with self._lock:
+            instance = ReplayInstance(f"replay-{len(self.instances)}")
+            self.instances.append(instance)
+        return instance
+
+    def get_instances(self, **kwargs) -> List[ReplayInstance]:
+        with self._lock:
+            return list(self.instances)
+
+    def remaining(self) -> int:
+        """Number of recorded act calls that haven't been replayed"""
+        with self._lock:
+            return sum(len(entries) for entries in self.entries.values())
+
+    def act(self, model, tools, system, messages=None, schema=None, on_step=None, **kwargs) -> ActResponse:
+        key = request_key(model, tools, system, messages, schema, **kwargs)
+        with self._lock:
+            entry = self.entries[key].popleft() if self.entries.get(key) else None
+        if entry is None:
+            raise CassetteMiss(f"No recorded act call matches request {key[:12]} in {self.path}")
+
+        steps = []
+        for data in entry["steps"]:
+            step = Step.model_validate(data)
+            steps.append(step)
+            if on_step:
+                on_step(step)
+
+        if "error" in entry:
+            raise ApiError(status_code=entry["error"]["status_code"], body=entry["error"]["body"])
+        if entry.get("interrupted"):
+            raise CassetteMiss(f"The recorded act call {key[:12]} was interrupted, but the replayed one was not")
+        output = entry.get("output")
+        return ActResponse(
+            messages=list(messages or []) + step_messages(steps),
+            steps=steps,
+            text=steps[-1].text if steps else None,
+            output=schema.model_validate(output) if schema and output is not None else None,
+            usage=TokenUsage.model_validate(entry["usage"]) if entry.get("usage") else None,
+        )
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from scrapybara.types.act import Step
+
+from .tools import OrchestratorSchema
+from .types import TaskResult
+from .util import messages_from_json
+
+class Journal:
+    """An append-only journal of swarm runs in SQLite, used to resume runs after a crash.
+
+    Records are committed before `append` returns and the database uses a write-ahead
+    log, so a process that is killed loses at most the record it was writing.
+    """
+
+    def __init__(self, path: str = ".swarm_cache/journal.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records (seq INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS records_run ON records (run_id, seq)")
+        self._db.commit()
+
+    def append(self, run_id: str, kind: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO records (run_id, kind, data, created) VALUES (?, ?, ?, ?)",
+                (run_id, kind, json.dumps(data), time.time()),
+            )
+            self._db.commit()
+
+    def records(self, run_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """The (kind, data) records of a run, oldest first"""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, data FROM records WHERE run_id = ? ORDER BY seq", (run_id,)).fetchall()
+        return [(kind, json.loads(data)) for kind, data in rows]
+
+    def unfinished(self) -> List[str]:
+        """Ids of runs that started but never finished, most recent first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT run_id FROM records WHERE kind = 'start' AND run_id NOT IN "
+                "(SELECT run_id FROM records WHERE kind = 'finish') ORDER BY seq DESC"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+class RunState(BaseModel):
+    """A run as far as its journal got.
+
+    The run journals a `start` record, then per turn a `plan` record with the orchestrator's
+    conversation, `instance`, `step` and `task` records while the plan's assignments run,
+    and a `round` record once their results are added to the conversation. A `finish`
+    record marks the end of the run.
+    """
+    run_id: str
+    prompt: Optional[str] = None
+    init_len: int = 0  # Number of messages the run was started with
+    messages: List[Any] = []  # The orchestrator's conversation at the last turn
+    turns: int = 0
+    plan: Optional[OrchestratorSchema] = None  # The plan whose assignments were running, if any
+    results: List[TaskResult] = []  # Results of the plans the orchestrator got back
+    finished_tasks: Dict[str, TaskResult] = {}  # Finished assignments of the running plan
+    partial_steps: Dict[str, List[Step]] = {}  # Steps of unfinished assignments of the running plan
+    agent_messages: Dict[str, List[Any]] = {}  # Each agent's history after its last finished assignment
+    instances: Dict[str, str] = {}  # Instance id per agent instance key
+    finished: bool = False
+
+    @classmethod
+    def load(cls, journal: Journal, run_id: str) -> "RunState":
+        records = journal.records(run_id)
+        if not records:
+            raise ValueError(f"No journal records for run {run_id}")
+        state = cls(run_id=run_id)
+        for kind, data in records:
+            match kind:
+                case "start":
+                    state.prompt = data["prompt"]
+                    state.messages = messages_from_json(data["messages"])
+                    state.init_len = len(state.messages)
+                    state.agent_messages = {name: messages_from_json(m) for name, m in data["agents"].items()}
+                case "plan" | "round":
+                    state.turns = data["turns"]
+                    state.messages = messages_from_json(data["messages"])
+                    if state.plan:
+                        order = [a.id for a in state.plan.task_assignments]
+                        state.results.extend(state.finished_tasks[i] for i in order if i in state.finished_tasks)
+                    state.plan = OrchestratorSchema.model_validate(data["plan"]) if kind == "plan" else None
+                    state.finished_tasks = {}
+                    state.partial_steps = {}
+                case "instance":
+                    state.instances[data["key"]] = data["instance_id"]
+                case "step":
+                    state.partial_steps.setdefault(data["task_id"], []).append(Step.model_validate(data["step"]))
+                case "task":
+                    result = TaskResult.model_validate(data["result"])
+                    result.steps = state.partial_steps.pop(result.task_id, [])
+                    state.finished_tasks[result.task_id] = result
+                    state.agent_messages[result.agent_name] = messages_from_json(data["agent_messages"])
+                case "finish":
+                    state.finished = True
+        return state
@@ -0,0 +1,129 @@
+import abc
+import json
+from collections import Counter
+from typing import Any, Callable, List, Optional, Tuple
+from pydantic import BaseModel
+from scrapybara.types.act import Message, TextPart, ToolMessage, UserMessage
+
+CHARS_PER_TOKEN = 4  # Rough average for English text and JSON
+IMAGE_TOKENS = 1600  # Approximate cost of one full screenshot
+MESSAGE_TOKENS = 4  # Per-message overhead
+
+class Compaction(BaseModel):
+    """A record of history removed from an agent's context"""
+    agent_name: str = ""
+    elided_messages: int
+    tokens_before: int
+    tokens_after: int
+    summary: str
+
+def _estimate_result(result: Any) -> int:
+    if isinstance(result, BaseModel):
+        result = result.model_dump()
+    if isinstance(result, dict):
+        tokens = 0
+        for key, value in result.items():
+            if key in ("base_64_image", "base64_image"):
+                tokens += IMAGE_TOKENS if value else 0
+            elif value is not None:
+                tokens += len(str(value)) // CHARS_PER_TOKEN
+        return tokens
+    return len(str(result)) // CHARS_PER_TOKEN
+
+def estimate_tokens(messages: List[Message]) -> int:
+    """Estimate the token count of messages from their size, without a tokenizer"""
+    tokens = 0
+    for message in messages:
+        tokens += MESSAGE_TOKENS
+        for part in message.content:
+            match part.type:
+                case "text":
+                    tokens += len(part.text) // CHARS_PER_TOKEN
+                case "image":
+                    tokens += IMAGE_TOKENS
+                case "reasoning":
+                    tokens += len(part.reasoning) // CHARS_PER_TOKEN
+                case "tool-call":
+                    tokens += len(json.dumps(part.args, default=str)) // CHARS_PER_TOKEN
+                case "tool-result":
+                    tokens += _estimate_result(part.result)
+    return tokens
+
+class Compactor(abc.ABC):
+    """Base class for strategies that shrink a history to fit a token budget.
+
+    The first message (the original task) and the most recent messages are kept verbatim.
+    Older messages are replaced by a note containing `summarize(elided_messages)`.
+    """
+
+    def __init__(self, keep_recent: int = 6, estimator: Callable[[List[Message]], int] = estimate_tokens):
+        self.keep_recent = keep_recent  # Messages that are never elided
+        self.estimator = estimator
+
+    @abc.abstractmethod
+    def summarize(self, messages: List[Message]) -> str:
+        """The note that replaces the elided messages"""
+
+    def compact(self, messages: List[Message], budget: int) -> Tuple[List[Message], Optional[Compaction]]:
+        tokens_before = self.estimator(messages)
+        if tokens_before <= budget:
+            return messages, None
+
+        head = messages[:1] if messages and isinstance(messages[0], UserMessage) else []
+        # Grow the verbatim tail from the end while it fits, but always keep `keep_recent`
+        start = len(messages)
+        used = self.estimator(head)
+        while start > len(head):
+            cost = self.estimator(messages[start - 1:start])
+            if len(messages) - start >= self.keep_recent and used + cost > budget:
+                break
+            used += cost
+            start -= 1
+        # Tool results must stay with the tool calls they answer
+        while start < len(messages) and isinstance(messages[start], ToolMessage):
+            start += 1
+
+        elided = messages[len(head):start]
+        if not elided:
+            return messages, None
+        tail = messages[start:]
+
+        summary = self.summarize(elided)
+        note = TextPart(text=f"[{len(elided)} earlier messages were removed to save context. {summary}]")
+        content = [part for message in head for part in message.content] + [note]
+        # Merge into a single user message so roles keep alternating
+        if tail and isinstance(tail[0], UserMessage):
+            content += tail[0].content
+            tail = tail[1:]
+        compacted = [UserMessage(content=content)] + tail
+
+        return compacted, Compaction(
+            elided_messages=len(elided),
+            tokens_before=tokens_before,
+            tokens_after=self.estimator(compacted),
+            summary=summary,
+        )
+
+class TruncatingCompactor(Compactor):
+    """Drops old messages, leaving only a tally of the tool calls they contained"""
+
+    def summarize(self, messages: List[Message]) -> str:
+        calls = Counter(
+            part.tool_name
+            for message in messages
+            for part in message.content
+            if part.type == "tool-call"
+        )
+        if not calls:
+            return "They contained no tool calls."
+        return "Tool calls made in them: " + ", ".join(f"{name} x{count}" for name, count in calls.items()) + "."
+
+class SummarizingCompactor(Compactor):
+    """Replaces old messages with the text returned by `summarize_fn`, e.g. an LLM summary"""
+
+    def __init__(self, summarize_fn: Callable[[List[Message]], str], **kwargs):
+        super().__init__(**kwargs)
+        self.summarize_fn = summarize_fn
+
+    def summarize(self, messages: List[Message]) -> str:
+        return self.summarize_fn(messages)
@@ -0,0 +1,86 @@
+import hashlib
+import json
+from typing import Any, List, Literal, Optional, Set, Tuple
+from pydantic import BaseModel
+
+from .images import IMAGE_KEYS, dhash
+
+class ConvergencePolicy(BaseModel):
+    """When an agent counts as stuck, and what happens then. None disables a check."""
+    max_repeats: Optional[int] = 4  # Runs in a row of the same step, or cycle of steps, that stop the agent
+    max_cycle: int = 4  # Longest cycle of steps checked for repetition
+    stall_steps: Optional[int] = 10  # Steps in a row that only produced results seen before
+    max_plan_repeats: Optional[int] = 3  # Identical orchestrator plans in a row that stop the run
+    # "escalate" stops the agent and reports why to the orchestrator, "stop" also stops the run
+    action: Literal["escalate", "stop"] = "escalate"
+
+class Stalled(Exception):
+    """Raised inside an agent's act call to stop it once it stops making progress"""
+
+    def __init__(self, reason: str, kind: str, stop_run: bool = False):
+        super().__init__(reason)
+        self.reason = reason
+        self.kind = kind  # "repeat" or "no_progress"
+        self.stop_run = stop_run  # Whether the policy stops the whole run
+        self.steps: List = []  # Steps the agent completed before it was stopped
+
+def _result_fingerprint(result: Any) -> Any:
+    """The result, with screenshots replaced by a perceptual hash so identical screens match"""
+    if isinstance(result, BaseModel):
+        result = result.model_dump()
+    if not isinstance(result, dict):
+        return result
+    result = dict(result)
+    for key in IMAGE_KEYS:
+        if result.get(key):
+            try:
+                result[key] = dhash(result[key])
+            except Exception:
+                # Without Pillow only byte-identical screenshots match
+                result[key] = hashlib.sha1(result[key].encode()).hexdigest()
+    return result
+
+def step_fingerprints(step: Any) -> Tuple[Optional[str], Optional[str]]:
+    """Hashes of the step's tool calls with their results, and of the results alone.
+    Both are None for a step without tool calls."""
+    if not step.tool_calls:
+        return None, None
+    calls = [(call.tool_name, call.args) for call in step.tool_calls]
+    results = [(result.tool_name, _result_fingerprint(result.result)) for result in step.tool_results or []]
+    observed = json.dumps(results, sort_keys=True, default=str)
+    action = json.dumps(calls, sort_keys=True, default=str) + observed
+    return hashlib.sha1(action.encode()).hexdigest(), hashlib.sha1(observed.encode()).hexdigest()
+
+class ConvergenceMonitor:
+    """Watches the steps of one act call for repeated cycles and for a lack of new results"""
+
+    def __init__(self, policy: ConvergencePolicy):
+        self.policy = policy
+        self.actions: List[str] = []
+        self.seen: Set[str] = set()
+        self.stale = 0  # Steps in a row whose results were all seen before
+
+    def check(self, step: Any) -> Optional[Tuple[str, str]]:
+        """Add a step. Returns the kind of stall and why the agent is stuck, or None."""
+        action, observed = step_fingerprints(step)
+        if action is None:
+            return None
+        self.actions.append(action)
+        self.stale = self.stale + 1 if observed in self.seen else 0
+        self.seen.add(observed)
+
+        repeats = self.policy.max_repeats
+        if repeats:
+            for period in range(1, self.policy.max_cycle + 1):
+                window = self.actions[-period * repeats:]
+                if len(window) == period * repeats and all(window[i] == window[i + period] for i in range(len(window) - period)):
+                    steps = "step" if period == 1 else f"{period} steps"
+                    return "repeat", f"repeated the same {steps} {repeats} times"
+        if self.policy.stall_steps and self.stale >= self.policy.stall_steps:
+            return "no_progress", f"no new results in {self.stale} steps"
+        return None
+
+def plan_fingerprint(plan: Any) -> str:
+    """Hash of the work a plan assigns, ignoring assignment ids"""
+    work = sorted((a.agent_name, a.prompt) for a in plan.task_assignments)
+    return hashlib.sha1(json.dumps(work).encode()).hexdigest()
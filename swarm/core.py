@@ -1,24 +1,103 @@
 # Standard library imports
+import asyncio
 import copy
-from typing import List, Optional, Dict, Any, Deque
-from collections import deque
+import functools
+import queue
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator, List, Optional, Dict, Any
 
 # Package/library imports
 from scrapybara import Scrapybara
-from scrapybara.tools import BashTool, ComputerTool, EditTool, BrowserTool
 from scrapybara.core.api_error import ApiError
-from scrapybara.types.act import Message
+from scrapybara.tools import BashTool, ComputerTool, EditTool
+from scrapybara.types.act import ActResponse, AssistantMessage, Message, Step, TextPart, TokenUsage, UserMessage
 
 # Local imports
-from .util import debug_print
-from .types import Agent, Response, get_orchestrator_prompt
-from .tools import HandoffTool, OrchestratorSchema
+from .util import debug_print, messages_from_json, step_messages, to_json
+from .types import RESUME_PROMPT, Agent, BatchResult, Response, TaskResult, get_orchestrator_prompt, get_results_prompt, get_task_prompt
+from .scheduler import PlanError, order_plan, run_plan
+from .pool import InstancePool
+from .events import SwarmEvent, AgentSwitchEvent, CompactionEvent, PlanEvent, RunFinishedEvent, UsageEvent, step_events
+from .compaction import Compactor, TruncatingCompactor
+from .images import ImageHistory, ImagePolicy
+from .metrics import MetricsRegistry, MetricsSink
+from .tracing import Tracer, span
+from .usage import Budget, BudgetExceeded, UsageTracker
+from .bus import AgentMessage, MessageBus
+from .steplog import FLUSH_SECONDS, StepLogger, default_step_logger
+from .convergence import ConvergenceMonitor, ConvergencePolicy, Stalled, plan_fingerprint
+from .tools import HandoffTool, MessageTool, ObservedTool, OrchestratorSchema
+
+# Opt-in features are imported on first use, to keep `import swarm` fast
+if TYPE_CHECKING:
+    from .broker import Broker, WorkUpdate
+    from .cache import PlanCache, ToolCallCache
+    from .checkpoint import Journal, RunState
+    from .hedging import HedgePolicy
+    from .placement import PlacementScheduler
 
 class Swarm:
-    def __init__(self, agents: List[Agent], api_key: Optional[str] = None):
-        self.client = Scrapybara(api_key=api_key)
-        self.instances: Dict[str, any] = {}  # Track active Scrapybara instances
+    def __init__(
+        self,
+        agents: List[Agent],
+        api_key: Optional[str] = None,
+        client: Optional[Scrapybara] = None,
+        max_concurrency: int = 4,
+        pool: Optional[InstancePool] = None,
+        warm_instances: int = 0,
+        compactor: Optional[Compactor] = None,
+        image_policy: Optional[ImagePolicy] = None,
+        plan_cache: Optional["PlanCache"] = None,
+        tool_cache: Optional["ToolCallCache"] = None,
+        metrics: Optional[MetricsSink] = None,
+        tracer: Optional[Tracer] = None,
+        budget: Optional[Budget] = None,
+        journal: Optional["Journal"] = None,
+        broker: Optional["Broker"] = None,
+        hedge: Optional["HedgePolicy"] = None,
+        step_log: Optional[StepLogger] = None,
+        convergence: Optional[ConvergencePolicy] = None,
+        placement: Optional["PlacementScheduler"] = None,
+    ):
+        # Checked before the pool is created, so a bad swarm doesn't leave one behind
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        # Clients passed in are used as they are, so wrap them in RateLimitedClient yourself
+        if client is None:
+            from .ratelimit import RateLimitedClient
+            client = RateLimitedClient(Scrapybara(api_key=api_key))
+        self.client = client
+        # A pool passed in may be shared with other swarms, so only close our own
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else InstancePool(self.client, warm=warm_instances)
+        self.instances: Dict[str, any] = {}  # Instances leased for the current run
+        self.compactor = compactor if compactor is not None else TruncatingCompactor()
+        self.image_policy = image_policy  # Screenshot policy for agents without their own
+        self.plan_cache = plan_cache  # Opt-in cache of first orchestrator plans
+        self.tool_cache = tool_cache  # Opt-in cache of read-only tool calls
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.tracer = tracer  # Opt-in timeline of runs, agents and instances
+        self.budget = budget  # Default usage limits of every run
+        self.journal = journal  # Opt-in checkpoints of every run, for resume()
+        self.broker = broker  # Opt-in broker that hands task assignments to workers
+        self._dispatcher = None
+        if broker:
+            from .broker import Dispatcher
+            self._dispatcher = Dispatcher(broker)
+        self.hedge = hedge  # Opt-in hedging of slow orchestrator planning calls
+        # Steps of agents without their own on_step are rendered off the agents' threads
+        self.step_log = step_log if step_log is not None else default_step_logger()
+        self.convergence = convergence  # Opt-in detection of agents that loop or stall
+        self.placement = placement  # Opt-in spreading of agents on the shared instance over several
+        self._leased_at: Dict[str, float] = {}  # When each instance of the current run was leased
         self.agents = agents
+        self.max_concurrency = max_concurrency  # Max task assignments running at once
+        self._instance_lock = threading.Lock()
+        self._executors: set = set()  # Thread pools of the runs in progress
         
         orchestrator = [agent for agent in agents if agent.orchestrator]
         match len(orchestrator):
@@ -27,103 +106,513 @@ class Swarm:
             case 1:
                 self.orchestrator = orchestrator[0]
                 self.orchestrator.schema = OrchestratorSchema
-                self.orchestrator.system = get_orchestrator_prompt(self.agents)
             case _:
                 raise ValueError("Cannot have multiple orchestrator agents")
-        
-        self.message_queue: Deque[dict] = deque()  # Queue for inter-agent messages
+
+        self.bus = MessageBus(agent.name for agent in agents)  # Mailboxes for handoffs and messages between agents
+
+        self._roster: Optional[tuple] = None  # Agent names the orchestrator's system prompt lists
+        self._roles: Dict[str, Optional[str]] = {}  # Each agent's prompt when it joined the roster
+        self._refresh_roster()
+
+    def close(self, timeout: Optional[float] = 30) -> None:
+        """Return the leased instances and, if the swarm created its pool, stop all of its
+        instances in parallel, waiting at most `timeout` seconds. Safe to call repeatedly."""
+        self._release_instances()
+        for executor in list(self._executors):
+            executor.shutdown(wait=False)
+        if self._owns_pool:
+            self.pool.close(timeout)
+            self.metrics.set("swarm_live_instances", self.pool.live())
+
+    def __enter__(self) -> "Swarm":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "Swarm":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await asyncio.to_thread(self.close)
 
     def __del__(self):
-        """Clean up all Scrapybara instances"""
-        for instance in self.instances.values():
+        """Clean up whatever close() didn't"""
+        if hasattr(self, "pool"):
+            self.close()
+
+    @staticmethod
+    async def _run_agent(executor: ThreadPoolExecutor, call: Callable[..., Any], **kwargs) -> Any:
+        """Run an agent's blocking call on the run's thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(call, **kwargs))
+
+    def _release_instances(self) -> None:
+        """Return the instances leased for a run to the pool"""
+        with self._instance_lock:
+            instances = list(self.instances.values())
+            self.instances.clear()
+            self._leased_at.clear()
+        # Releasing may stop expired instances, which mustn't block other leases
+        for instance in instances:
+            self.pool.release(instance)
+        self.metrics.set("swarm_live_instances", self.pool.live())
+
+    def _get_or_create_instance(self, agent: Agent, checkpoint: Optional[Callable[[str, dict], None]] = None) -> any:
+        """Lease an instance for the agent, reusing the one leased for its key during this run"""
+        key = self._instance_key(agent)
+        # Agents run on worker threads, so only one of them may lease the shared instance
+        with span(self.tracer, "acquire instance", "agent", agent.name, instance=key), self._instance_lock:
+            if key in self.instances:
+                return self.instances[key]
+                
+            start = time.perf_counter()
             try:
-                instance.browser.stop()
-                instance.stop()
+                instance = self._lease_instance(agent, key)
+                key = self._instance_key(agent)  # Changed if the agent fell back to the shared instance
+                self.instances[key] = instance
+                self._leased_at[key] = time.monotonic()
+                if checkpoint:
+                    checkpoint("instance", {"key": key, "instance_id": instance.id})
+                self.metrics.observe("swarm_instance_acquire_seconds", time.perf_counter() - start, agent=agent.name)
+                self.metrics.set("swarm_live_instances", self.pool.live())
+                return instance
             except ApiError as e:
                 print(f"Error {e.status_code}: {e.body}")
-        self.instances.clear()
+                self.metrics.inc("swarm_api_errors_total", agent=agent.name, status=str(e.status_code))
+                raise e
 
-    def _get_or_create_instance(self, agent: Agent) -> any:
-        """Get existing instance or create new one for agent"""
-        if agent.instance in self.instances:
-            return self.instances[agent.instance]
-            
-        try:
-            if agent.instance == "shared":
-                instance = self.client.start_ubuntu(timeout_hours=1)
-            else:
-                try:
-                    instance = next(
-                        inst for inst in self.client.get_instances()
-                        if inst.id == agent.instance
-                    )
-                except StopIteration:
-                    print(f"Instance {agent.instance} not found, falling back to shared instance")
-                    agent.instance = "shared"
-                    # Get or create shared instance
-                    if "shared" in self.instances:
-                        return self.instances["shared"]
-                    instance = self.client.start_ubuntu(timeout_hours=1)
-            # instance.browser.start()
-            self.instances[agent.instance] = instance
-            return instance
-        except ApiError as e:
-            print(f"Error {e.status_code}: {e.body}")
-            raise e
+    def _instance_seconds(self) -> float:
+        """Total time the instances of the current run have been leased"""
+        now = time.monotonic()
+        return sum(now - leased_at for leased_at in list(self._leased_at.values()))
+
+    def _instance_key(self, agent: Agent) -> str:
+        """The key the agent's instance is leased under: its placement, if the swarm places
+        agents on the shared instance, or else its `instance`"""
+        if self.placement and agent.instance == "shared":
+            return self.placement.place(agent)
+        return agent.instance
+
+    def _lease_instance(self, agent: Agent, key: str) -> any:
+        """Lease the instance named by the agent, falling back to the shared instance"""
+        if agent.instance == "shared":
+            return self.pool.lease()
+
+        instance = self.pool.lease(agent.instance)
+        if instance is None:
+            print(f"Instance {agent.instance} not found, falling back to shared instance")
+            agent.instance = "shared"
+            # Get or lease shared instance
+            key = self._instance_key(agent)
+            if key in self.instances:
+                return self.instances[key]
+            instance = self.pool.lease()
+        # instance.browser.start()
+        return instance
 
     # TODO: change to use new tool system
-    def _setup_agent_tools(self, agent: Agent, instance: any) -> List:
-        """Setup agent tools, ensuring HandoffTool is always included"""
-        handoff_tool = HandoffTool(instance, self, agent)
-        
-        # If user provided tools, add HandoffTool if not already present
-        if agent.tools:
-            if not any(isinstance(tool, HandoffTool) for tool in agent.tools):
-                agent.tools.append(handoff_tool)
-            return agent.tools
-            
-        # Otherwise use all default tools
-        return [
+    def _setup_agent_tools(
+        self,
+        agent: Agent,
+        instance: any,
+        assignment: Optional[OrchestratorSchema.TaskAssignment] = None,
+    ) -> List:
+        """Setup agent tools, falling back to the default Ubuntu tools unless the agent opted out.
+        Worker agents also get the handoff and message tools."""
+        tools = agent.tools or ([
             BashTool(instance),
             ComputerTool(instance),
             EditTool(instance),
-            # BrowserTool(instance),
-            handoff_tool,
-        ]
+        ] if agent.default_tools else [])
+
+        # Route calls through the tool cache, keyed by the instance they run on
+        if self.tool_cache:
+            tools = [self.tool_cache.wrap(tool, instance.id) for tool in tools]
+
+        # Agents placed on the same instance take turns at its desktop
+        if self.placement and agent.instance == "shared":
+            key = self._instance_key(agent)
+            tools = [self.placement.wrap(tool, key) for tool in tools]
+
+        if not agent.orchestrator:
+            tools = tools + [
+                HandoffTool(self.bus, agent.name, self.orchestrator.name, assignment),
+                MessageTool(self.bus, agent.name, assignment),
+            ]
+
+        def observe_tool(name: str, args: Dict[str, Any], start: float, duration: float) -> None:
+            self.metrics.observe("swarm_tool_seconds", duration, agent=agent.name, tool=name)
+            if self.tracer:
+                self.tracer.add(name, "agent", agent.name, start, duration, **args)
+                self.tracer.add(name, "instance", instance.id, start, duration, agent=agent.name)
+
+        return [ObservedTool(tool, observe_tool) for tool in tools]
+
+    def _refresh_roster(self) -> None:
+        """Rebuild the orchestrator's system prompt, but only if the agent list changed.
+
+        Reusing the same text keeps the start of every orchestrator request identical byte
+        for byte, so the provider can serve it from its prompt cache. Agents are listed with
+        the prompt they had when they joined, since plans overwrite `agent.prompt`.
+        """
+        roster = tuple(agent.name for agent in self.agents if not agent.orchestrator)
+        if roster == self._roster:
+            return
+        for agent in self.agents:
+            self._roles.setdefault(agent.name, agent.prompt)
+            self.bus.register(agent.name)
+        self.orchestrator.system = get_orchestrator_prompt(self.agents, self._roles)
+        self._roster = roster
+
+    def _get_agent(self, name: str) -> Optional[Agent]:
+        """Look up a non-orchestrator agent by name"""
+        return next(
+            (a for a in self.agents if a.name == name and not a.orchestrator),
+            None
+        )
 
     def get_act_completion(
         self,
         agent: Agent,
         messages: Optional[List[Message]] = None,
+        prompt: Optional[str] = None,
         debug: bool = False,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        usage: Optional[UsageTracker] = None,
+        assignment: Optional[OrchestratorSchema.TaskAssignment] = None,
+        checkpoint: Optional[Callable[[str, dict], None]] = None,
     ):
-        """Get a completion from the agent"""
-        instance = self._get_or_create_instance(agent)
-        tools = self._setup_agent_tools(agent, instance)
-
-        response = self.client.act(
-            model=agent.model,
-            tools=tools,
-            system=agent.system,
-            prompt=agent.prompt,
-            messages=messages if messages else [],
-            schema=agent.schema,
-            on_step=agent.on_step,
-        )
+        """Get a completion from the agent.
+
+        With a usage tracker, raises BudgetExceeded before the call or from within it once
+        the run's or the agent's budget is exhausted. With a convergence policy, worker agents
+        that repeat themselves or stop making progress are stopped with Stalled. With a
+        checkpoint callback, the instance leased and every step taken for the assignment are
+        journaled.
+        """
+        # Don't spend instance time on an agent that is out of budget
+        if usage:
+            usage.check(agent, starting_act=True)
+        instance = self._get_or_create_instance(agent, checkpoint)
+        tools = self._setup_agent_tools(agent, instance, assignment)
+
+        # client.act ignores `prompt` when `messages` is given, so append it ourselves
+        prompt = prompt if prompt is not None else agent.prompt
+        messages = list(messages) if messages else []
+        if prompt:
+            messages.append(UserMessage(content=[TextPart(text=prompt)]))
+
+        # Deduplicate and downscale old screenshots, including the ones taken during this call
+        image_policy = agent.image_policy or self.image_policy
+        images = ImageHistory(image_policy) if image_policy else None
+        if images:
+            images.add_messages(messages)
+
+        # Keep the history sent with every request within the agent's token budget
+        if agent.context_budget:
+            compactor = agent.compactor or self.compactor
+            messages, compaction = compactor.compact(messages, agent.context_budget)
+            if compaction:
+                compaction.agent_name = agent.name
+                agent.compactions.append(compaction)
+                debug_print(debug, f"Compacted {agent.name}:", compaction)
+                if on_event:
+                    on_event(CompactionEvent(agent_name=agent.name, compaction=compaction))
+
+        steps = []
+        policy = agent.convergence or self.convergence
+        monitor = ConvergenceMonitor(policy) if policy and not agent.orchestrator else None
+
+        def on_step(step):
+            steps.append(step)
+            # Checked before screenshots are rewritten, so identical screens still match
+            stalled = monitor.check(step) if monitor else None
+            if images and step.tool_results:
+                images.add(step.tool_results)
+            self._handle_step(agent, step, on_event, usage, assignment, checkpoint)
+            if stalled:
+                kind, reason = stalled
+                self.metrics.inc("swarm_stalls_total", agent=agent.name, kind=kind)
+                raise Stalled(f"{agent.name} stopped: {reason}", kind, policy.action == "stop")
+
+        if usage:
+            usage.start_act(agent)
+        start = time.perf_counter()
+        try:
+            with span(self.tracer, "act", "agent", agent.name, messages=len(messages)):
+                request = dict(
+                    model=agent.model,
+                    tools=tools,
+                    system=agent.system,
+                    messages=messages,
+                    schema=agent.schema,
+                    images_to_keep=(image_policy.max_images or sys.maxsize) if image_policy else 4,
+                )
+                # Tools run before the loser of a hedge is stopped, so only requests without
+                # tools are hedged: plans of an orchestrator with `default_tools=False`
+                if agent.orchestrator and self.hedge and not tools:
+                    from .hedging import hedged_call
+                    response, hedged, won = hedged_call(
+                        lambda on_step: self.client.act(on_step=on_step, **request), on_step, self.hedge
+                    )
+                    if hedged:
+                        self.metrics.inc("swarm_plan_hedges_total", agent=agent.name)
+                    if won:
+                        self.metrics.inc("swarm_plan_hedge_wins_total", agent=agent.name)
+                else:
+                    response = self.client.act(on_step=on_step, **request)
+        except ApiError as e:
+            self.metrics.inc("swarm_api_errors_total", agent=agent.name, status=str(e.status_code))
+            raise
+        except (BudgetExceeded, Stalled) as e:
+            e.steps = steps
+            raise
+        finally:
+            if usage:
+                usage.end_act(agent)
+            elapsed = time.perf_counter() - start
+            self.metrics.observe("swarm_act_seconds", elapsed, agent=agent.name)
+            if agent.orchestrator:
+                self.metrics.observe("swarm_plan_seconds", elapsed, agent=agent.name)
+        if images:
+            debug_print(debug, f"Saved {images.bytes_saved} bytes of screenshots for {agent.name}")
 
         # If this is the orchestrator and we got a plan, update agent prompts
         if agent.orchestrator and response.output:
             for assignment in response.output.task_assignments:
-                target_agent = next(
-                    (a for a in self.agents if a.name == assignment.agent_name),
-                    None
-                )
+                target_agent = self._get_agent(assignment.agent_name)
                 if target_agent:
                     target_agent.prompt = assignment.prompt
 
         return response
 
-    def run(
+    def _handle_step(
+        self,
+        agent: Agent,
+        step: Step,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        usage: Optional[UsageTracker] = None,
+        assignment: Optional[OrchestratorSchema.TaskAssignment] = None,
+        checkpoint: Optional[Callable[[str, dict], None]] = None,
+    ) -> None:
+        """Journal, count and report a step the agent took, then enforce its budget"""
+        if checkpoint and assignment:
+            checkpoint("step", {"task_id": assignment.id, "step": to_json(step)})
+        self.metrics.inc("swarm_steps_total", agent=agent.name)
+        if agent.on_step:
+            agent.on_step(step)
+        else:
+            instance = self.instances.get(self._instance_key(agent))
+            self.step_log.log(agent.name, step, getattr(instance, "id", None), agent.color)
+        if on_event:
+            for event in step_events(agent.name, step):
+                on_event(event)
+        if usage:
+            try:
+                usage.add_step(agent, step)
+            finally:
+                if on_event and step.usage:
+                    agent_usage, total_usage = usage.snapshot(agent.name)
+                    on_event(UsageEvent(agent_name=agent.name, usage=agent_usage, total=total_usage))
+
+    async def _remote_act_completion(
+        self,
+        agent: Agent,
+        messages: List[Message],
+        prompt: str,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        usage: Optional[UsageTracker] = None,
+        assignment: Optional[OrchestratorSchema.TaskAssignment] = None,
+        checkpoint: Optional[Callable[[str, dict], None]] = None,
+    ) -> ActResponse:
+        """Like `get_act_completion`, but run by a worker through the swarm's broker.
+
+        Steps are reported as the worker streams them back. A budget exhausted by a remote
+        step can't interrupt the worker, so the run stops once the current plan is done.
+        """
+        from .broker import WorkerError, WorkItem
+
+        if usage:
+            usage.start_act(agent)
+        steps = []
+
+        def on_step(update: "WorkUpdate") -> None:
+            step = Step.model_validate(update.data["step"])
+            steps.append(step)
+            try:
+                self._handle_step(agent, step, on_event, usage, assignment, checkpoint)
+            except BudgetExceeded:
+                pass  # Recorded in usage.stop_reason
+
+        item = WorkItem(agent_name=agent.name, assignment=assignment, prompt=prompt, messages=to_json(messages))
+        start = time.perf_counter()
+        try:
+            with span(self.tracer, "act", "agent", agent.name, messages=len(messages), remote=True):
+                update = await self._dispatcher.run(item, on_step)
+        finally:
+            if usage:
+                usage.end_act(agent)
+            self.metrics.observe("swarm_act_seconds", time.perf_counter() - start, agent=agent.name)
+
+        # Handoff requests made on the worker go to the orchestrator like local ones
+        for handoff in update.data.get("handoffs", []):
+            self.bus.send(AgentMessage.model_validate(handoff))
+        error = update.data.get("error")
+        if error:
+            match error["type"]:
+                case "api":
+                    self.metrics.inc("swarm_api_errors_total", agent=agent.name, status=str(error["status_code"]))
+                    raise ApiError(status_code=error["status_code"], body=error["body"])
+                case "budget":
+                    e = BudgetExceeded(error["reason"], agent.name)
+                    e.steps = steps
+                    raise e
+                case "stalled":
+                    e = Stalled(error["reason"], error["kind"], error["stop_run"])
+                    e.steps = steps
+                    raise e
+                case _:
+                    raise WorkerError(error["message"])
+
+        output = update.data.get("output")
+        return ActResponse(
+            messages=messages_from_json(update.data["messages"]),
+            steps=steps,
+            text=update.data.get("text"),
+            output=agent.schema.model_validate(output) if agent.schema and output is not None else output,
+            usage=TokenUsage.model_validate(update.data["usage"]) if update.data.get("usage") else None,
+        )
+
+    def _get_cached_plan(self, key: str, agent: Agent) -> Optional[ActResponse]:
+        """Build an orchestrator completion from a cached plan, as if it had just planned"""
+        plan = self.plan_cache.get(key)
+        if plan is None:
+            return None
+        return ActResponse(
+            messages=[
+                UserMessage(content=[TextPart(text=agent.prompt)]),
+                AssistantMessage(content=[TextPart(text=plan.model_dump_json())]),
+            ],
+            steps=[],
+            output=plan,
+        )
+
+    async def _run_assignments(
+        self,
+        assignments: List[OrchestratorSchema.TaskAssignment],
+        max_concurrency: int,
+        executor: ThreadPoolExecutor,
+        debug: bool = False,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        usage: Optional[UsageTracker] = None,
+        checkpoint: Optional[Callable[[str, dict], None]] = None,
+        finished: Optional[Dict[str, TaskResult]] = None,
+        partial: Optional[Dict[str, List]] = None,
+    ) -> List[TaskResult]:
+        """Run a validated plan, starting each assignment as soon as its dependencies finish.
+
+        When resuming, assignments in `finished` are not run again and the ones with steps in
+        `partial` continue from their last step.
+        """
+        # Only swarms with a broker import it, and only their workers fail with WorkerError
+        if self.broker:
+            from .broker import WorkerError
+            worker_errors = (WorkerError,)
+        else:
+            worker_errors = ()
+
+        finished = finished or {}
+        partial = partial or {}
+
+        def record(result: TaskResult, agent: Agent) -> None:
+            # Steps are journaled as they happen, so the result is stored without them
+            if checkpoint:
+                checkpoint("task", {
+                    "result": result.model_dump(mode="json", exclude={"steps"}),
+                    "agent_messages": to_json(agent.messages),
+                })
+
+        async def run_assignment(
+            assignment: OrchestratorSchema.TaskAssignment,
+            upstream: List[TaskResult],
+        ) -> TaskResult:
+            if assignment.id in finished:
+                return finished[assignment.id]
+            result = TaskResult(
+                task_id=assignment.id,
+                agent_name=assignment.agent_name,
+                prompt=assignment.prompt,
+            )
+            agent = self._get_agent(assignment.agent_name)
+            debug_print(debug, f"Running {assignment.id} on {agent.name}:", assignment.prompt)
+            await _emit(on_event, AgentSwitchEvent(agent_name=agent.name, task_id=assignment.id, prompt=assignment.prompt))
+            messages, prompt = agent.messages, get_task_prompt(assignment.prompt, upstream)
+            done = list(partial.get(assignment.id, []))
+            if done:
+                # Replay the interrupted attempt and ask the agent to pick it up from there
+                messages = list(messages) + [UserMessage(content=[TextPart(text=prompt)])] + step_messages(done)
+                prompt = RESUME_PROMPT
+            try:
+                if self.broker:
+                    completion = await self._remote_act_completion(
+                        agent, messages, prompt, on_event, usage, assignment, checkpoint
+                    )
+                else:
+                    completion = await self._run_agent(
+                        executor,
+                        self.get_act_completion,
+                        agent=agent,
+                        messages=messages,
+                        prompt=prompt,
+                        debug=debug,
+                        on_event=on_event,
+                        usage=usage,
+                        assignment=assignment,
+                        checkpoint=checkpoint,
+                    )
+            except ApiError as e:
+                print(f"Error {e.status_code}: {e.body}")
+                result.error = f"Error {e.status_code}: {e.body}"
+                result.steps = done
+                record(result, agent)
+                return result
+            except BudgetExceeded as e:
+                # Keep whatever the agent got done before it ran out of budget
+                result.error = e.reason
+                result.steps = done + e.steps
+                result.text = result.steps[-1].text if result.steps else None
+                record(result, agent)
+                return result
+            except Stalled as e:
+                # The orchestrator sees why the agent was stopped in the results
+                result.error = e.reason
+                result.steps = done + e.steps
+                result.text = result.steps[-1].text if result.steps else None
+                if e.stop_run and usage:
+                    usage.stop(e.reason)
+                record(result, agent)
+                return result
+            except worker_errors as e:
+                print(f"Worker error: {e}")
+                result.error = f"Worker error: {e}"
+                result.steps = done
+                record(result, agent)
+                return result
+
+            agent.messages = list(completion.messages)
+            result.steps = done + completion.steps
+            result.text = completion.text
+            result.output = completion.output
+            result.usage = completion.usage
+            record(result, agent)
+            return result
+
+        # Assignments skipped because a dependency failed aren't journaled, since the failure is:
+        # on resume the failed dependency comes back from the journal and they are skipped again
+        return await run_plan(assignments, run_assignment, max_concurrency)
+
+    async def arun(
         self,
         agent: Agent,
         messages: Optional[List[Message]] = None,
@@ -131,37 +620,570 @@ class Swarm:
         context_variables: dict = {},
         debug: bool = False,
         max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        bypass_plan_cache: bool = False,
+        budget: Optional[Budget] = None,
+        run_id: Optional[str] = None,
     ) -> Response:
+        """Plan with the orchestrator and run its task assignments concurrently.
+
+        Each turn the orchestrator emits a plan, its assignments run as soon as their
+        dependencies finish (capped by `max_concurrency`), and the results are fed back
+        to the orchestrator. Invalid plans are sent back to the orchestrator unexecuted.
+        The run ends when the orchestrator returns a plan with no assignments or after
+        `max_turns` turns.
+
+        If the swarm has a plan cache, the first plan for a task is looked up there unless
+        `bypass_plan_cache` is set.
+
+        Usage is aggregated per agent and for the run. Once `budget` (or the swarm's budget)
+        is exhausted, running agents are stopped and the run returns its partial results
+        with a `stop_reason`. Agents with their own budget are stopped individually.
+
+        With a convergence policy, agents that loop or stall are stopped and the reason is
+        reported to the orchestrator, or ends the run if the policy says so. So does an
+        orchestrator that keeps emitting the same plan.
+
+        If the swarm has a journal, the run is checkpointed under `run_id` (a new id by
+        default) after every step and every finished assignment, so it can be continued
+        with `resume` if the process dies.
+
+        `on_event` is called with every SwarmEvent of the run. It is always called from a
+        worker thread and may block to slow the run down.
+        """
         if not agent.orchestrator:
             raise ValueError("Only the orchestrator agent can be used with run(). Other agents should be coordinated through the orchestrator agent.")
-            
-        active_agent = agent
-        context_variables = copy.deepcopy(context_variables)
-        messages = copy.deepcopy(messages) if messages else []
-        init_len = len(messages)
-        all_steps = []
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        from .checkpoint import RunState
 
         if prompt:
-            active_agent.prompt = prompt
-        
-        # TODO: change loop so it stops when the orchestrator has decided to stop
-        while len(messages) - init_len < max_turns and active_agent:
-            completion = self.get_act_completion(
-                agent=active_agent,
-                messages=messages,
+            agent.prompt = prompt
+        messages = copy.deepcopy(messages) if messages else []
+        state = RunState(run_id=run_id or uuid.uuid4().hex, prompt=agent.prompt, init_len=len(messages), messages=messages)
+        if self.journal:
+            await asyncio.to_thread(self.journal.append, state.run_id, "start", {
+                "prompt": agent.prompt,
+                "messages": to_json(messages),
+                "agents": {a.name: to_json(a.messages) for a in self.agents if not a.orchestrator},
+            })
+        return await self._arun(agent, state, context_variables, debug, max_turns, max_concurrency, on_event, bypass_plan_cache, budget)
+
+    async def aresume(
+        self,
+        run_id: str,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        budget: Optional[Budget] = None,
+    ) -> Response:
+        """Continue a run from its last checkpoint in the journal, e.g. after the process died.
+
+        Instances the run leased are reattached if they are still running. Finished
+        assignments are not run again and interrupted ones continue from their last step.
+        `max_turns` includes the turns taken before the interruption, while usage and
+        budgets only count what happens after resuming.
+        """
+        if not self.journal:
+            raise ValueError("resume() requires a swarm with a journal")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        from .checkpoint import RunState
+
+        state = await asyncio.to_thread(RunState.load, self.journal, run_id)
+        if state.finished:
+            raise ValueError(f"Run {run_id} already finished")
+
+        self.orchestrator.prompt = state.prompt
+        for name, messages in state.agent_messages.items():
+            agent = self._get_agent(name)
+            if agent:
+                agent.messages = messages
+        await asyncio.to_thread(self._reattach_instances, state.instances)
+        return await self._arun(self.orchestrator, state, {}, debug, max_turns, max_concurrency, on_event, False, budget)
+
+    def resume(
+        self,
+        run_id: str,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        budget: Optional[Budget] = None,
+    ) -> Response:
+        """Synchronous wrapper around `aresume`"""
+        return asyncio.run(
+            self.aresume(
+                run_id=run_id,
                 debug=debug,
+                max_turns=max_turns,
+                max_concurrency=max_concurrency,
+                on_event=on_event,
+                budget=budget,
             )
-            
-            debug_print(debug, "Received completion:", completion)
-            # TODO: update agent switching and async handling
-            # messages.extend(completion.messages)
-            # all_steps.extend(completion.steps)
+        )
+
+    def _reattach_instances(self, instances: Dict[str, str]) -> None:
+        """Lease the instances of a journaled run again, if they are still running"""
+        with self._instance_lock:
+            for key, instance_id in instances.items():
+                # Instances agents name themselves are looked up again on lease
+                if key == instance_id or key in self.instances:
+                    continue
+                instance = self.pool.adopt(instance_id)
+                if instance is not None:
+                    self.instances[key] = instance
+                    self._leased_at[key] = time.monotonic()
+        self.metrics.set("swarm_live_instances", self.pool.live())
 
-        return Response(
+    async def _arun(
+        self,
+        agent: Agent,
+        state: "RunState",
+        context_variables: dict,
+        debug: bool,
+        max_turns: int,
+        max_concurrency: Optional[int],
+        on_event: Optional[Callable[[SwarmEvent], None]],
+        bypass_plan_cache: bool,
+        budget: Optional[Budget],
+    ) -> Response:
+        """The planning loop of `arun`, starting from the given point of the run"""
+        active_agent = agent
+        context_variables = copy.deepcopy(context_variables)
+        messages = list(state.messages)
+        max_concurrency = max_concurrency or self.max_concurrency
+        init_len = state.init_len
+        all_results = list(state.results)
+        all_steps = [step for result in all_results for step in result.steps]
+        self.bus.clear()  # Messages left over from an earlier run are stale
+        if self.placement:
+            self.placement.reset()  # Agents are placed afresh on the instances of every run
+        self._refresh_roster()
+        completion = None
+        turns = state.turns
+        stop_reason = None
+        usage = UsageTracker(budget or self.budget, self._instance_seconds)
+        checkpoint = functools.partial(self.journal.append, state.run_id) if self.journal else None
+        resumed_plan = state.plan  # The plan that was running when the run was interrupted
+        names = [a.name for a in self.agents if not a.orchestrator]
+        last_plan, plan_repeats = None, 0  # Fingerprint of the last plan and how often it came in a row
+        # A thread for each agent that may run at once. asyncio's default executor has at most
+        # min(32, cpus + 4), and an agent waiting for a message would hold a thread its peer needs.
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="swarm-agent")
+        self._executors.add(executor)
+
+        try:
+            with span(self.tracer, "run", "swarm", "run", prompt=active_agent.prompt):
+                while resumed_plan or turns < max_turns:
+                    finished, partial = {}, {}
+                    if resumed_plan:
+                        plan, resumed_plan = resumed_plan, None
+                        assignments = order_plan(plan.task_assignments, names)
+                        finished, partial = state.finished_tasks, state.partial_steps
+                    else:
+                        # Only the first plan of a fresh conversation depends on nothing but the task
+                        cache_key = None
+                        completion = None
+                        if turns == 0 and not messages and active_agent.prompt and self.plan_cache and not bypass_plan_cache:
+                            from .cache import PlanCache
+                            cache_key = PlanCache.key(active_agent.prompt, active_agent.system, active_agent.model)
+                            completion = self._get_cached_plan(cache_key, active_agent)
+                            debug_print(debug, "Plan cache", "hit" if completion else "miss")
+                        cached = completion is not None
+
+                        if not cached:
+                            try:
+                                completion = await self._run_agent(
+                                    executor,
+                                    self.get_act_completion,
+                                    agent=active_agent,
+                                    messages=messages,
+                                    # Later turns continue the conversation instead of repeating the task
+                                    prompt=None if turns == 0 else "",
+                                    debug=debug,
+                                    on_event=on_event,
+                                    usage=usage,
+                                    checkpoint=checkpoint,
+                                )
+                            except BudgetExceeded as e:
+                                all_steps.extend(e.steps)
+                                stop_reason = e.reason
+                                break
+                        turns += 1
+                        self.metrics.inc("swarm_turns_total", agent=active_agent.name)
+                        debug_print(debug, "Received completion:", completion)
+                        messages = list(completion.messages)
+                        all_steps.extend(completion.steps)
+
+                        # The orchestrator signals it is done by not assigning any more work
+                        plan = completion.output
+                        if not plan or not plan.task_assignments:
+                            break
+
+                        # Reject broken plans before any agent starts working on them
+                        try:
+                            assignments = order_plan(plan.task_assignments, names)
+                        except PlanError as e:
+                            debug_print(debug, "Rejected plan:", e)
+                            messages.append(UserMessage(content=[TextPart(text=f"Your plan was rejected: {e}. Output a corrected plan.")]))
+                            continue
+
+                        # An orchestrator that keeps assigning the same work isn't getting anywhere
+                        if self.convergence and self.convergence.max_plan_repeats:
+                            fingerprint = plan_fingerprint(plan)
+                            plan_repeats = plan_repeats + 1 if fingerprint == last_plan else 1
+                            last_plan = fingerprint
+                            if plan_repeats >= self.convergence.max_plan_repeats:
+                                self.metrics.inc("swarm_stalls_total", agent=active_agent.name, kind="plan_repeat")
+                                stop_reason = f"Run stopped: the orchestrator emitted the same plan {plan_repeats} times in a row"
+                                break
+
+                        if cache_key and not cached:
+                            self.plan_cache.put(cache_key, plan)
+                        if checkpoint:
+                            await asyncio.to_thread(checkpoint, "plan", {
+                                "turns": turns, "messages": to_json(messages), "plan": plan.model_dump(mode="json"),
+                            })
+                    await _emit(on_event, PlanEvent(agent_name=active_agent.name, plan=plan))
+                    results = await self._run_assignments(
+                        assignments, max_concurrency, executor, debug, on_event, usage, checkpoint, finished, partial
+                    )
+                    for result in results:
+                        all_steps.extend(result.steps)
+                    all_results.extend(results)
+                    # Handoff requests the agents sent while working go to the orchestrator with the results
+                    handoffs = [m for m in self.bus.drain(active_agent.name) if m.type == "handoff_request"]
+                    messages.append(UserMessage(content=[TextPart(text=get_results_prompt(results, handoffs))]))
+                    self.metrics.set("swarm_queued_messages", self.bus.pending())
+                    if checkpoint:
+                        await asyncio.to_thread(checkpoint, "round", {"turns": turns, "messages": to_json(messages)})
+
+                    # Stop with the partial results once the run is out of budget
+                    if usage.stop_reason:
+                        stop_reason = f"Run stopped: {usage.stop_reason}"
+                        break
+        finally:
+            # Leased instances stay warm in the pool for the next run
+            await asyncio.to_thread(self._release_instances)
+            # Wait for the run's steps to be written, but a stuck sink mustn't hang the run
+            await asyncio.to_thread(self.step_log.flush, FLUSH_SECONDS)
+            self._executors.discard(executor)
+            executor.shutdown(wait=False)
+        if checkpoint:
+            await asyncio.to_thread(checkpoint, "finish", {"stop_reason": stop_reason})
+
+        response = Response(
             messages=messages[init_len:],
             agent=active_agent,
             context_variables=context_variables,
             steps=all_steps,
-            usage=completion.usage if hasattr(completion, 'usage') else None,
+            usage=usage.usage,
             output=completion.output if hasattr(completion, 'output') else None,
+            results=all_results,
+            stop_reason=stop_reason,
+            run_id=state.run_id,
+        )
+        await _emit(on_event, RunFinishedEvent(agent_name=active_agent.name, response=response))
+        return response
+
+    def run(
+        self,
+        agent: Agent,
+        messages: Optional[List[Message]] = None,
+        prompt: Optional[str] = None,
+        context_variables: dict = {},
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        on_event: Optional[Callable[[SwarmEvent], None]] = None,
+        bypass_plan_cache: bool = False,
+        budget: Optional[Budget] = None,
+        run_id: Optional[str] = None,
+    ) -> Response:
+        """Synchronous wrapper around `arun`. Use `arun` inside a running event loop."""
+        return asyncio.run(
+            self.arun(
+                agent=agent,
+                messages=messages,
+                prompt=prompt,
+                context_variables=context_variables,
+                debug=debug,
+                max_turns=max_turns,
+                max_concurrency=max_concurrency,
+                on_event=on_event,
+                bypass_plan_cache=bypass_plan_cache,
+                budget=budget,
+                run_id=run_id,
+            )
+        )
+
+    async def arun_stream(
+        self,
+        agent: Agent,
+        messages: Optional[List[Message]] = None,
+        prompt: Optional[str] = None,
+        context_variables: dict = {},
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        max_queue: int = 64,
+        bypass_plan_cache: bool = False,
+        budget: Optional[Budget] = None,
+    ) -> AsyncIterator[SwarmEvent]:
+        """Run the swarm, yielding events as they happen.
+
+        Events go through a queue of at most `max_queue` events. When it is full, agents
+        wait for the consumer before continuing. The last event is a RunFinishedEvent.
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        closed = threading.Event()
+
+        def on_event(event: SwarmEvent) -> None:
+            if closed.is_set():
+                return
+            future = asyncio.run_coroutine_threadsafe(events.put(event), loop)
+            # Give up on the event if the consumer goes away while we wait for room
+            while True:
+                try:
+                    return future.result(timeout=0.1)
+                except TimeoutError:
+                    if closed.is_set():
+                        future.cancel()
+                        return
+
+        async def produce() -> None:
+            try:
+                await self.arun(
+                    agent=agent,
+                    messages=messages,
+                    prompt=prompt,
+                    context_variables=context_variables,
+                    debug=debug,
+                    max_turns=max_turns,
+                    max_concurrency=max_concurrency,
+                    on_event=on_event,
+                    bypass_plan_cache=bypass_plan_cache,
+                    budget=budget,
+                )
+            finally:
+                await events.put(None)
+
+        task = asyncio.create_task(produce())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            await task  # Raise any error from the run
+        finally:
+            closed.set()
+            if not task.done():
+                task.cancel()
+
+    def run_stream(
+        self,
+        agent: Agent,
+        messages: Optional[List[Message]] = None,
+        prompt: Optional[str] = None,
+        context_variables: dict = {},
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        max_queue: int = 64,
+        bypass_plan_cache: bool = False,
+        budget: Optional[Budget] = None,
+    ) -> Iterator[SwarmEvent]:
+        """Synchronous version of `arun_stream`. The run happens on a background thread, and is
+        cancelled like `arun_stream`'s if the consumer stops early."""
+        events: queue.Queue = queue.Queue(maxsize=max_queue)
+        closed = threading.Event()
+        errors = []
+        lock = threading.Lock()
+        running = {}  # The loop and task of the run while it is going
+
+        def on_event(event: Optional[SwarmEvent]) -> None:
+            # Give up on the event if the consumer goes away while we wait for room
+            while not closed.is_set():
+                try:
+                    return events.put(event, timeout=0.1)
+                except queue.Full:
+                    pass
+
+        async def forward() -> None:
+            with lock:
+                if closed.is_set():
+                    return
+                running["task"] = (asyncio.get_running_loop(), asyncio.current_task())
+            try:
+                async for event in self.arun_stream(
+                    agent=agent,
+                    messages=messages,
+                    prompt=prompt,
+                    context_variables=context_variables,
+                    debug=debug,
+                    max_turns=max_turns,
+                    max_concurrency=max_concurrency,
+                    max_queue=max_queue,
+                    bypass_plan_cache=bypass_plan_cache,
+                    budget=budget,
+                ):
+                    await asyncio.to_thread(on_event, event)
+            finally:
+                with lock:
+                    running.pop("task", None)
+
+        def produce() -> None:
+            try:
+                asyncio.run(forward())
+            except asyncio.CancelledError:
+                pass
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                on_event(None)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while (event := events.get()) is not None:
+                yield event
+        finally:
+            with lock:
+                closed.set()
+                if "task" in running:
+                    # Stops the assignments that haven't started yet
+                    loop, task = running["task"]
+                    loop.call_soon_threadsafe(task.cancel)
+        if errors:
+            raise errors[0]
+
+    def _fork(self) -> "Swarm":
+        """A swarm with copies of the agents that shares this swarm's client, pool and caches,
+        so that a run can change its agents without affecting other runs"""
+        agents = [
+            agent.model_copy(update={"messages": list(agent.messages), "compactions": []})
+            for agent in self.agents
+        ]
+        swarm = Swarm(
+            agents,
+            client=self.client,
+            max_concurrency=self.max_concurrency,
+            pool=self.pool,
+            compactor=self.compactor,
+            image_policy=self.image_policy,
+            plan_cache=self.plan_cache,
+            tool_cache=self.tool_cache,
+            metrics=self.metrics,
+            tracer=self.tracer,
+            budget=self.budget,
+            journal=self.journal,
+            hedge=self.hedge,
+            step_log=self.step_log,
+            convergence=self.convergence,
+            placement=self.placement.spawn() if self.placement else None,
         )
+        # One dispatcher per broker, since each would consume the others' updates
+        swarm.broker, swarm._dispatcher = self.broker, self._dispatcher
+        # List the agents with the roles they joined with, not the prompts of the last plan
+        swarm._roles, swarm._roster = dict(self._roles), None
+        swarm._refresh_roster()
+        return swarm
+
+    async def arun_batch(
+        self,
+        prompts: List[str],
+        concurrency: int = 4,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        bypass_plan_cache: bool = False,
+        budget: Optional[Budget] = None,
+    ) -> AsyncIterator[BatchResult]:
+        """Run each prompt as a separate task of the orchestrator, `concurrency` at a time,
+        yielding a BatchResult as each one finishes.
+
+        Every task runs on its own copies of the agents and leases its own instances from
+        the shared pool, which keeps them warm between tasks. A task that raises is reported
+        in its result's `error` without stopping the others. `budget` applies to each task.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_task(index: int, prompt: str) -> BatchResult:
+            async with semaphore:
+                swarm = self._fork()
+                result = BatchResult(index=index, prompt=prompt)
+                start = time.perf_counter()
+                try:
+                    result.response = await swarm.arun(
+                        swarm.orchestrator,
+                        prompt=prompt,
+                        debug=debug,
+                        max_turns=max_turns,
+                        max_concurrency=max_concurrency,
+                        bypass_plan_cache=bypass_plan_cache,
+                        budget=budget,
+                    )
+                except Exception as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                    self.metrics.inc("swarm_batch_failures_total")
+                finally:
+                    # Returns the task's instances to the shared pool
+                    await asyncio.to_thread(swarm.close)
+                result.seconds = time.perf_counter() - start
+                self.metrics.observe("swarm_batch_task_seconds", result.seconds)
+                return result
+
+        tasks = [asyncio.create_task(run_task(i, prompt)) for i, prompt in enumerate(prompts)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def run_batch(
+        self,
+        prompts: List[str],
+        concurrency: int = 4,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_concurrency: Optional[int] = None,
+        bypass_plan_cache: bool = False,
+        budget: Optional[Budget] = None,
+    ) -> Iterator[BatchResult]:
+        """Synchronous version of `arun_batch`. The batch runs on a background thread."""
+        results: queue.Queue = queue.Queue()
+        closed = threading.Event()
+
+        async def consume() -> None:
+            async for result in self.arun_batch(
+                prompts, concurrency, debug, max_turns, max_concurrency, bypass_plan_cache, budget
+            ):
+                results.put(result)
+                if closed.is_set():
+                    return  # Cancels the remaining tasks
+
+        def produce() -> None:
+            try:
+                asyncio.run(consume())
+            except BaseException as e:
+                results.put(e)
+            finally:
+                results.put(None)
+
+        threading.Thread(target=produce, daemon=True).start()
+        try:
+            while (result := results.get()) is not None:
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            closed.set()
+
+
+async def _emit(on_event: Optional[Callable[[SwarmEvent], None]], event: SwarmEvent) -> None:
+    """Hand an event to a possibly blocking callback without blocking the event loop"""
+    if on_event:
+        await asyncio.to_thread(on_event, event)
@@ -0,0 +1,68 @@
+import time
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel, Field
+from scrapybara.types.act import Step, ToolCallPart, ToolResultPart
+
+from .compaction import Compaction
+from .tools import OrchestratorSchema
+from .usage import Usage
+from .types import Response
+
+class Event(BaseModel):
+    """Base class of the events yielded by Swarm.run_stream"""
+    agent_name: str
+    timestamp: float = Field(default_factory=time.time)
+
+class TextEvent(Event):
+    type: Literal["text"] = "text"
+    text: str
+
+class ToolCallEvent(Event):
+    type: Literal["tool_call"] = "tool_call"
+    tool_call: ToolCallPart
+
+class ToolResultEvent(Event):
+    type: Literal["tool_result"] = "tool_result"
+    tool_result: ToolResultPart
+
+class AgentSwitchEvent(Event):
+    """An agent started working on a task assignment"""
+    type: Literal["agent_switch"] = "agent_switch"
+    task_id: Optional[str] = None
+    prompt: str
+
+class PlanEvent(Event):
+    """The orchestrator emitted a plan that is about to be executed"""
+    type: Literal["plan"] = "plan"
+    plan: OrchestratorSchema
+
+class CompactionEvent(Event):
+    """Old messages were elided from an agent's history before a client.act call"""
+    type: Literal["compaction"] = "compaction"
+    compaction: Compaction
+
+class UsageEvent(Event):
+    """Usage after an agent step"""
+    type: Literal["usage"] = "usage"
+    usage: Usage  # The agent's usage so far
+    total: Usage  # The run's usage so far
+
+class RunFinishedEvent(Event):
+    type: Literal["run_finished"] = "run_finished"
+    response: Response
+
+SwarmEvent = Union[
+    TextEvent, ToolCallEvent, ToolResultEvent, AgentSwitchEvent, PlanEvent, CompactionEvent, UsageEvent,
+    RunFinishedEvent,
+]
+
+def step_events(agent_name: str, step: Step) -> List[SwarmEvent]:
+    """Split a Scrapybara step into text, tool call and tool result events"""
+    events = []
+    if step.text:
+        events.append(TextEvent(agent_name=agent_name, text=step.text))
+    for tool_call in step.tool_calls or []:
+        events.append(ToolCallEvent(agent_name=agent_name, tool_call=tool_call))
+    for tool_result in step.tool_results or []:
+        events.append(ToolResultEvent(agent_name=agent_name, tool_result=tool_result))
+    return events
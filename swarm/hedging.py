@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+class HedgeCancelled(Exception):
+    """Raised from on_step to stop the request that lost a hedge"""
+
+class HedgePolicy:
+    """When to hedge the orchestrator's planning call.
+
+    A second, identical request is sent once the first has been running for the
+    `percentile` of the last `window` planning latencies, or for `initial_delay` seconds
+    (if set) until `min_samples` latencies were seen. The delay is never shorter than
+    `min_delay`, so fast calls are never doubled.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        window: int = 100,
+        min_samples: int = 10,
+        initial_delay: Optional[float] = None,
+        min_delay: float = 0.0,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.calls = 0
+        self.hedges = 0  # Calls that sent a second request
+        self.wins = 0  # Calls the second request answered first
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None to not hedge"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                delay = self.initial_delay
+            else:
+                latencies = sorted(self._latencies)
+                delay = latencies[min(len(latencies) - 1, int(self.percentile * len(latencies)))]
+        return None if delay is None else max(self.min_delay, delay)
+
+    def record(self, latency: float, hedged: bool = False, won: bool = False) -> None:
+        """Count a finished call and its latency"""
+        with self._lock:
+            self._latencies.append(latency)
+            self.calls += 1
+            self.hedges += hedged
+            self.wins += won
+
+    def sample(self, latency: float) -> None:
+        """Add the latency of an attempt that didn't decide the call, e.g. one that failed"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "wins": self.wins,
+                "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            }
+
+def hedged_call(call: Callable[[Callable[[Any], None]], Any], on_step: Callable[[Any], None],
+                policy: HedgePolicy) -> Tuple[Any, bool, bool]:
+    """Run `call(on_step)`, hedged with a second identical call if the first is slow.
+
+    The first call to succeed wins. Its steps are passed to `on_step` once it is done, and
+    the loser is stopped at its next step, which is after that step's tools ran, so only
+    hedge calls without side effects. Returns the response and whether the call was
+    hedged and won by the hedge. Raises the first error if both calls fail.
+
+    Latencies, including those of failed attempts, are measured from the start of the
+    first request, since that is how long the caller waited.
+    """
+    results: queue.Queue = queue.Queue()
+    cancelled = [threading.Event(), threading.Event()]
+    steps: List[List[Any]] = [[], []]
+    started: List[float] = []
+
+    def attempt(i: int) -> None:
+        def record_step(step: Any) -> None:
+            if cancelled[i].is_set():
+                raise HedgeCancelled()
+            steps[i].append(step)
+
+        try:
+            response = call(record_step)
+            results.put((i, response, None, time.monotonic() - started[0]))
+        except Exception as e:
+            results.put((i, None, e, time.monotonic() - started[0]))
+
+    def start(i: int) -> None:
+        started.append(time.monotonic())
+        threading.Thread(target=attempt, args=(i,), daemon=True).start()
+
+    start(0)
+    delay = policy.delay()
+    try:
+        outcome = results.get(timeout=delay) if delay is not None else results.get()
+    except queue.Empty:
+        start(1)
+        outcome = results.get()
+    if outcome[2] is not None and len(started) == 2:
+        # Let the other request make up for a failed one
+        other = results.get()
+        if other[2] is None:
+            policy.sample(outcome[3])
+            outcome = other
+        else:
+            policy.sample(other[3])
+
+    winner, response, error, latency = outcome
+    for i in range(2):
+        if i != winner:
+            cancelled[i].set()
+    hedged = len(started) == 2
+    if error is not None:
+        policy.record(latency, hedged)
+        raise error
+    policy.record(latency, hedged, winner == 1)
+    for step in steps[winner]:
+        on_step(step)
+    return response, hedged, winner == 1
@@ -0,0 +1,108 @@
+import base64
+import io
+from typing import Any, Iterable, List, Optional
+from pydantic import BaseModel
+from scrapybara.types.act import Message, ToolMessage, ToolResultPart
+
+IMAGE_KEYS = ("base_64_image", "base64_image")
+
+class ImagePolicy(BaseModel):
+    """How screenshots in an agent's history are kept. Requires Pillow."""
+    keep_full: int = 2  # Most recent screenshots kept at full resolution
+    max_images: Optional[int] = 8  # Screenshots kept at all, None for no limit
+    max_size: int = 640  # Longest side of older, downscaled screenshots
+    format: str = "PNG"  # Format of downscaled screenshots
+    quality: int = 60  # Quality of downscaled screenshots, for lossy formats
+    dedup_distance: Optional[int] = 2  # Max perceptual hash distance of duplicate frames, None to disable
+
+def _decode(data: str):
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("ImagePolicy requires Pillow: pip install 'capyswarm[images]'") from e
+    return Image.open(io.BytesIO(base64.b64decode(data)))
+
+def dhash(data: str) -> int:
+    """64-bit difference hash of a base64 image, robust to scaling and recompression"""
+    pixels = _decode(data).convert("L").resize((9, 8)).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+def _get_image(result: Any) -> Optional[str]:
+    if isinstance(result, BaseModel):
+        result = result.model_dump()
+    if isinstance(result, dict):
+        return next((result[key] for key in IMAGE_KEYS if result.get(key)), None)
+    return None
+
+def _replace_image(part: ToolResultPart, image: Optional[str], note: Optional[str] = None) -> None:
+    # Scrapybara responses are frozen models, so results are rewritten as dicts
+    result = part.result.model_dump() if isinstance(part.result, BaseModel) else dict(part.result)
+    for key in IMAGE_KEYS:
+        result.pop(key, None)
+    if image:
+        result["base_64_image"] = image
+    if note:
+        result["output"] = f"{result['output']}\n{note}" if result.get("output") else note
+    part.result = result
+
+class ImageHistory:
+    """Applies an ImagePolicy to the screenshots of one conversation as they arrive.
+
+    Frames nearly identical to the previous kept frame lose their image and point back to
+    the tool call that produced it. Kept frames older than `keep_full` are downscaled and
+    frames beyond `max_images` lose their image.
+    """
+
+    def __init__(self, policy: ImagePolicy):
+        self.policy = policy
+        self.frames: List[ToolResultPart] = []  # Results that still carry an image, oldest first
+        self.previous_hash: Optional[int] = None
+        self.previous_id: Optional[str] = None
+        self.bytes_saved = 0
+
+    def add_messages(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                self.add(message.content)
+
+    def add(self, parts: Iterable[ToolResultPart]) -> None:
+        for part in parts:
+            image = _get_image(part.result)
+            if image:
+                self._add_frame(part, image)
+
+    def _add_frame(self, part: ToolResultPart, image: str) -> None:
+        policy = self.policy
+        if policy.dedup_distance is not None:
+            frame_hash = dhash(image)
+            if self.previous_hash is not None and bin(frame_hash ^ self.previous_hash).count("1") <= policy.dedup_distance:
+                _replace_image(part, None, f"[Screen unchanged since tool call {self.previous_id}]")
+                self.bytes_saved += len(image)
+                return
+            self.previous_hash, self.previous_id = frame_hash, part.tool_call_id
+
+        self.frames.append(part)
+        if len(self.frames) > policy.keep_full:
+            self._downscale(self.frames[-policy.keep_full - 1])
+        if policy.max_images is not None and len(self.frames) > policy.max_images:
+            dropped = self.frames.pop(0)
+            self.bytes_saved += len(_get_image(dropped.result))
+            _replace_image(dropped, None)
+
+    def _downscale(self, part: ToolResultPart) -> None:
+        image = _get_image(part.result)
+        img = _decode(image)
+        if max(img.size) <= self.policy.max_size:
+            return  # Already downscaled by an earlier pass
+        img.thumbnail((self.policy.max_size, self.policy.max_size))
+        if self.policy.format.upper() == "JPEG":
+            img = img.convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format=self.policy.format, quality=self.policy.quality, optimize=True)
+        scaled = base64.b64encode(buffer.getvalue()).decode()
+        self.bytes_saved += len(image) - len(scaled)
+        _replace_image(part, scaled)
@@ -0,0 +1,146 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+METRIC_HELP = {
+    "swarm_instance_acquire_seconds": "Time to lease a Scrapybara instance",
+    "swarm_act_seconds": "Latency of client.act calls",
+    "swarm_plan_seconds": "Latency of orchestrator planning calls",
+    "swarm_tool_seconds": "Execution time of tool calls",
+    "swarm_steps_total": "Agent steps",
+    "swarm_turns_total": "Orchestrator turns",
+    "swarm_api_errors_total": "Scrapybara API errors",
+    "swarm_live_instances": "Instances leased or kept warm by the instance pool",
+    "swarm_queued_messages": "Messages waiting in the swarm message queue",
+    "swarm_batch_task_seconds": "Wall time of the tasks of a batch",
+    "swarm_batch_failures_total": "Batch tasks whose run raised",
+    "swarm_stalls_total": "Agents and plans stopped for repeating themselves or making no progress",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class MetricsSink:
+    """Receives swarm metrics. Subclass it to forward metrics to another system."""
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add to a counter"""
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge"""
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record a histogram sample"""
+
+class MetricsRegistry(MetricsSink):
+    """An in-process, thread-safe metrics store that can render the Prometheus text format"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List]] = {}  # [bucket counts, sum, count]
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def get(self, name: str, **labels: str) -> Optional[float]:
+        """Current value of a counter or gauge, or the sample count of a histogram"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            for metrics in (self._counters, self._gauges):
+                if key in metrics.get(name, {}):
+                    return metrics[name][key]
+            histogram = self._histograms.get(name, {}).get(key)
+            return histogram[2] if histogram else None
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    _header(lines, name, kind)
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for name, series in sorted(self._histograms.items()):
+                _header(lines, name, "histogram")
+                for labels, (counts, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+def _header(lines: List[str], name: str, kind: str) -> None:
+    if name in METRIC_HELP:
+        lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+@contextmanager
+def timed(sink: MetricsSink, name: str, **labels: str) -> Iterator[None]:
+    """Observe the duration of the block in seconds, even if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sink.observe(name, time.perf_counter() - start, **labels)
+
+def start_http_server(registry: MetricsRegistry, port: int = 9464, host: str = "") -> "ThreadingHTTPServer":
+    """Serve the registry at /metrics for Prometheus to scrape, on a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Collection, Deque, Dict, List, Optional
+
+from scrapybara.tools import Tool
+
+# Tools whose calls drive the desktop's mouse, keyboard and screen
+GUI_TOOLS = ("computer",)
+
+class FairLock:
+    """A lock that is handed to waiting threads in the order they asked for it"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiting: Deque[object] = deque()
+        self._held = False
+
+    def acquire(self) -> float:
+        """Take the lock. Returns the seconds waited."""
+        start = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            self._waiting.append(ticket)
+            self._cond.wait_for(lambda: not self._held and self._waiting[0] is ticket)
+            self._waiting.popleft()
+            self._held = True
+        return time.perf_counter() - start
+
+    def release(self) -> None:
+        with self._cond:
+            self._held = False
+            self._cond.notify_all()
+
+    def __enter__(self) -> "FairLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+class InstanceSlot:
+    """One instance of a PlacementScheduler: the agents placed on it, its GUI lock and its usage"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.agents: List[str] = []  # Agents placed on the instance in the current run
+        self.gui_agents = 0  # How many of them use GUI tools
+        self.gui_lock = FairLock()
+        self.created = time.monotonic()
+        self.calls = 0
+        self.busy_seconds = 0.0  # Time at least one tool call was running on the instance
+        self.gui_seconds = 0.0  # Time the GUI lock was held
+        self.gui_wait_seconds = 0.0  # Time GUI calls spent waiting for the lock
+        self._running = 0
+        self._busy_since = 0.0
+        self._lock = threading.Lock()
+
+    def start_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            if self._running == 0:
+                self._busy_since = time.monotonic()
+            self._running += 1
+
+    def end_call(self) -> None:
+        with self._lock:
+            self._running -= 1
+            if self._running == 0:
+                self.busy_seconds += time.monotonic() - self._busy_since
+
+    def add_gui_time(self, held: float, waited: float) -> None:
+        with self._lock:
+            self.gui_seconds += held
+            self.gui_wait_seconds += waited
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busy = self.busy_seconds + (time.monotonic() - self._busy_since if self._running else 0.0)
+            elapsed = time.monotonic() - self.created
+            return {
+                "agents": list(self.agents),
+                "calls": self.calls,
+                "busy_seconds": busy,
+                "gui_seconds": self.gui_seconds,
+                "gui_wait_seconds": self.gui_wait_seconds,
+                "utilization": busy / elapsed if elapsed else 0.0,
+            }
+
+class PlacementScheduler:
+    """Spreads agents on the shared instance over up to `instances` instances.
+
+    Agents that use GUI tools (`gui_tools`, or no tools, since the default tools include
+    ComputerTool) go to the instance with the fewest GUI agents, so they get a desktop of
+    their own while there are enough. Other agents go to the least loaded instance. An
+    agent stays on its instance for the rest of the run. On each instance, GUI tool calls
+    take turns through a fair lock, while other tool calls run concurrently.
+    """
+
+    def __init__(self, instances: int = 4, gui_tools: Collection[str] = GUI_TOOLS):
+        if instances < 1:
+            raise ValueError("PlacementScheduler needs at least one instance")
+        self.instances = instances
+        self.gui_tools = set(gui_tools)
+        self.slots: List[InstanceSlot] = []
+        self._placed: Dict[str, InstanceSlot] = {}  # Agent name -> slot, for the current run
+        self._lock = threading.Lock()
+
+    def uses_gui(self, agent: Any) -> bool:
+        if agent.orchestrator:
+            return False  # It plans rather than drives the desktop
+        return not agent.tools or any(tool.name in self.gui_tools for tool in agent.tools)
+
+    def place(self, agent: Any) -> str:
+        """The key of the instance the agent runs on, choosing one on its first call"""
+        with self._lock:
+            slot = self._placed.get(agent.name)
+            if slot is None:
+                gui = self.uses_gui(agent)
+                # Open another instance once every open one has a GUI agent (or, for other agents, any agent)
+                full = all(s.gui_agents if gui else s.agents for s in self.slots)
+                if len(self.slots) < self.instances and full:
+                    self.slots.append(InstanceSlot(f"placed-{len(self.slots)}"))
+                slot = min(self.slots, key=lambda s: (s.gui_agents if gui else 0, len(s.agents)))
+                slot.agents.append(agent.name)
+                slot.gui_agents += gui
+                self._placed[agent.name] = slot
+            return slot.key
+
+    def slot(self, key: str) -> Optional[InstanceSlot]:
+        with self._lock:
+            return next((s for s in self.slots if s.key == key), None)
+
+    def wrap(self, tool: Tool, key: str) -> Tool:
+        """Route the tool's calls through the slot's GUI lock and usage accounting"""
+        return PlacedTool(tool, self.slot(key), tool.name in self.gui_tools)
+
+    def reset(self) -> None:
+        """Forget the placements of the last run, keeping the usage of each instance"""
+        with self._lock:
+            self._placed.clear()
+            for slot in self.slots:
+                slot.agents.clear()
+                slot.gui_agents = 0
+
+    def spawn(self) -> "PlacementScheduler":
+        """An empty scheduler with the same settings, for a swarm with instances of its own"""
+        return PlacementScheduler(self.instances, self.gui_tools)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Placement and utilization of each instance, by key"""
+        with self._lock:
+            slots = list(self.slots)
+        return {slot.key: slot.stats() for slot in slots}
+
+class PlacedTool(Tool):
+    """A tool running on a placed instance. GUI tools hold the instance's GUI lock while they run."""
+    _tool: Tool
+    _slot: InstanceSlot
+    _gui: bool
+
+    def __init__(self, tool: Tool, slot: InstanceSlot, gui: bool) -> None:
+        super().__init__(name=tool.name, description=tool.description, parameters=tool.parameters)
+        self._tool = tool
+        self._slot = slot
+        self._gui = gui
+
+    def __call__(self, **kwargs: Any) -> Any:
+        if not self._gui:
+            self._slot.start_call()
+            try:
+                return self._tool(**kwargs)
+            finally:
+                self._slot.end_call()
+
+        waited = self._slot.gui_lock.acquire()
+        start = time.perf_counter()
+        self._slot.start_call()
+        try:
+            return self._tool(**kwargs)
+        finally:
+            self._slot.end_call()
+            self._slot.gui_lock.release()
+            self._slot.add_gui_time(time.perf_counter() - start, waited)
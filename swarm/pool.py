@@ -0,0 +1,215 @@
+import atexit
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from scrapybara.core.api_error import ApiError
+
+if TYPE_CHECKING:
+    from scrapybara import Scrapybara
+
+class InstancePool:
+    """A pool of warm Scrapybara Ubuntu instances that agents lease and return.
+
+    Instances started by the pool are kept running after they are released so the next
+    lease skips the boot. With `warm`, the pool starts booting that many instances in the
+    background as soon as it is created, and leases wait for them. Idle instances are
+    health checked against a fresh instance list before reuse and stopped once they have
+    been idle for `max_idle_seconds`, except for the `warm` most recent ones. Instance ids
+    are resolved through an index of `client.get_instances()` that is refreshed at most
+    every `index_ttl` seconds.
+
+    Instances are stopped in parallel, on up to `stop_workers` threads. Pools that are
+    still open when the interpreter exits are closed by an `atexit` hook.
+    """
+
+    def __init__(
+        self,
+        client: "Scrapybara",
+        warm: int = 0,
+        max_idle_seconds: float = 600,
+        index_ttl: float = 30,
+        timeout_hours: float = 1,
+        stop_workers: int = 16,
+    ):
+        self.client = client
+        self.warm = warm  # Number of idle instances to keep running
+        self.max_idle_seconds = max_idle_seconds
+        self.index_ttl = index_ttl
+        self.timeout_hours = timeout_hours
+        self.stop_workers = stop_workers
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[Any, float]] = []  # (instance, released at), most recent last
+        self._leased: Dict[str, Any] = {}  # Instances started by the pool that are in use
+        self._index: Dict[str, Any] = {}
+        self._index_time: Optional[float] = None
+        self._prewarm_lock = threading.Lock()  # Held while instances are being prewarmed
+        if warm > 0:
+            threading.Thread(target=self.prewarm, daemon=True).start()
+
+    def get(self, instance_id: str, refresh: bool = False) -> Optional[Any]:
+        """Look up an instance by id in the cached instance index, or in a fresh one"""
+        with self._lock:
+            now = time.monotonic()
+            if refresh or self._index_time is None or now - self._index_time > self.index_ttl:
+                self._index = {inst.id: inst for inst in self.client.get_instances()}
+                self._index_time = now
+            return self._index.get(instance_id)
+
+    def _is_healthy(self, instance: Any) -> bool:
+        # The cached index may predate the instance being stopped remotely
+        entry = self.get(instance.id, refresh=True)
+        return entry is not None and entry.status == "running"
+
+    def _start(self) -> Any:
+        instance = self.client.start_ubuntu(timeout_hours=self.timeout_hours)
+        _open_pools.add(self)
+        with self._lock:
+            self._index[instance.id] = instance
+        return instance
+
+    def _stop(self, instance: Any) -> bool:
+        try:
+            instance.browser.stop()
+            instance.stop()
+            return True
+        except ApiError as e:
+            print(f"Error {e.status_code}: {e.body}")
+            return False
+
+    def _stop_all(self, instances: List[Any], timeout: Optional[float] = None, wait: bool = True) -> int:
+        """Stop instances in parallel, waiting at most `timeout` seconds. Returns how many stopped.
+        With `wait=False`, the instances are stopped in the background and 0 is returned."""
+        # Plain daemon threads rather than an executor, which refuses work once the
+        # interpreter is shutting down, and stragglers must not block the exit
+        pending = list(instances)
+        stopped = []
+
+        def stop_pending() -> None:
+            while True:
+                try:
+                    instance = pending.pop()
+                except IndexError:
+                    return
+                try:
+                    if self._stop(instance):
+                        stopped.append(instance)
+                except Exception as e:
+                    print(f"Error stopping instance {instance.id}: {e}")
+
+        threads = [threading.Thread(target=stop_pending, daemon=True) for _ in range(min(self.stop_workers, len(instances)))]
+        for thread in threads:
+            thread.start()
+        if not wait:
+            return 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if any(thread.is_alive() for thread in threads):
+            print(f"Timed out stopping {len(instances) - len(stopped)} instance(s) after {timeout}s")
+        return len(stopped)
+
+    def prewarm(self) -> None:
+        """Start instances until `warm` of them are idle. Called in the background when the
+        pool is created, and again by anyone who wants to top the warm instances up."""
+        with self._prewarm_lock:
+            with self._lock:
+                missing = self.warm - len(self._idle)
+            if missing <= 0:
+                return
+            with ThreadPoolExecutor(max_workers=missing) as executor:
+                instances = list(executor.map(lambda _: self._start(), range(missing)))
+            now = time.monotonic()
+            with self._lock:
+                self._idle.extend((instance, now) for instance in instances)
+
+    def lease(self, instance_id: Optional[str] = None) -> Optional[Any]:
+        """Lease an instance, reusing a healthy idle one if possible.
+
+        If `instance_id` is given, the existing instance with that id is returned instead,
+        or None if there is no such instance.
+        """
+        if instance_id is not None:
+            return self.get(instance_id)
+
+        # Wait for instances that are still booting for the pool rather than start more
+        with self._prewarm_lock:
+            pass
+        # Stopping instances can be slow, so leases don't wait for it
+        self.reap(wait=False)
+        instance = None
+        unhealthy = []
+        while instance is None:
+            with self._lock:
+                if not self._idle:
+                    break
+                candidate, _ = self._idle.pop()
+            if self._is_healthy(candidate):
+                instance = candidate
+            elif self.get(candidate.id) is not None:
+                unhealthy.append(candidate)
+        self._stop_all(unhealthy, wait=False)
+
+        if instance is None:
+            instance = self._start()
+        with self._lock:
+            self._leased[instance.id] = instance
+        return instance
+
+    def adopt(self, instance_id: str) -> Optional[Any]:
+        """Lease an instance the pool did not start, e.g. one left behind by a process that
+        crashed, and take ownership of it. Returns None if it is no longer running."""
+        with self._lock:
+            self._index_time = None  # The index may predate the instance
+        instance = self.get(instance_id)
+        if instance is None or instance.status != "running":
+            return None
+        _open_pools.add(self)
+        with self._lock:
+            self._leased[instance.id] = instance
+        return instance
+
+    def release(self, instance: Any) -> None:
+        """Return a leased instance to the pool. Instances the pool did not start are left alone."""
+        with self._lock:
+            if self._leased.pop(instance.id, None) is None:
+                return
+            self._idle.append((instance, time.monotonic()))
+        self.reap()
+
+    def reap(self, wait: bool = True) -> int:
+        """Stop instances that have been idle too long, keeping the `warm` most recent ones.
+        Returns how many expired. With `wait=False` they are stopped in the background."""
+        now = time.monotonic()
+        with self._lock:
+            keep = self._idle[-self.warm:] if self.warm > 0 else []
+            candidates = self._idle[:len(self._idle) - len(keep)]
+            expired = [inst for inst, released in candidates if now - released > self.max_idle_seconds]
+            self._idle = [(inst, released) for inst, released in candidates if now - released <= self.max_idle_seconds] + keep
+        self._stop_all(expired, wait=wait)
+        return len(expired)
+
+    def live(self) -> int:
+        """Number of instances started by the pool that are leased or idle"""
+        with self._lock:
+            return len(self._idle) + len(self._leased)
+
+    def close(self, timeout: Optional[float] = 30) -> int:
+        """Stop every instance started by the pool, waiting at most `timeout` seconds.
+        Returns the number of instances stopped."""
+        _open_pools.discard(self)
+        with self._lock:
+            instances = [inst for inst, _ in self._idle] + list(self._leased.values())
+            self._idle.clear()
+            self._leased.clear()
+        return self._stop_all(instances, timeout)
+
+_open_pools: "weakref.WeakSet[InstancePool]" = weakref.WeakSet()
+
+@atexit.register
+def _close_open_pools() -> None:
+    """Safety net for pools nobody closed, so their instances don't run out their timeout"""
+    for pool in list(_open_pools):
+        pool.close()
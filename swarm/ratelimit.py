@@ -0,0 +1,222 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+import httpx
+from scrapybara.core.api_error import ApiError
+
+# Calls per second and burst size of each endpoint
+DEFAULT_RATES: Dict[str, Tuple[float, int]] = {
+    "start_ubuntu": (1.0, 5),
+    "get_instances": (5.0, 10),
+    "act": (10.0, 20),
+}
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, and bursts of up to `burst` calls"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going into debt reserves the next token, so waiting callers are served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+class AIMDLimiter:
+    """A concurrency limit that adapts like TCP congestion control.
+
+    Every successful call raises the limit by `increase / limit`, i.e. by about `increase`
+    per round of calls, and a throttled call, or one slower than `latency_target`, cuts
+    it by `decrease`. Cuts happen at most once per `cooldown` seconds, so a burst of
+    429s from the same overload only counts once.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4,
+        minimum: float = 1,
+        maximum: float = 64,
+        increase: float = 1,
+        decrease: float = 0.5,
+        latency_target: Optional[float] = None,
+        cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_cut = float("-inf")
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < max(self.minimum, int(self.limit)))
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False, latency: Optional[float] = None) -> None:
+        """Return a slot, reporting whether the call was throttled and how long it took"""
+        with self._cond:
+            self.in_flight -= 1
+            slow = self.latency_target is not None and latency is not None and latency > self.latency_target
+            now = time.monotonic()
+            if throttled or slow:
+                if now - self._last_cut >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_cut = now
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+    def cancel(self) -> None:
+        """Return a slot that wasn't used for a call, leaving the limit as it is"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+class RetryPolicy:
+    """Retries throttled and transient failures with jittered exponential backoff.
+
+    The n-th retry waits a random time of up to `base_delay * 2**n` seconds, capped at
+    `max_delay` ("full jitter"), so clients that failed together don't retry together.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retry_statuses: Collection[int] = (408, 429, 500, 502, 503, 504),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+
+    def retryable(self, error: Exception) -> bool:
+        if isinstance(error, ApiError):
+            return error.status_code in self.retry_statuses
+        return isinstance(error, httpx.TransportError)
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class RateLimitedClient:
+    """Wraps a Scrapybara client to throttle, adapt to and retry its API calls.
+
+    `start_ubuntu`, `get_instances` and `act` each go through a token bucket from `rates`.
+    Concurrent model requests are capped by an AIMD limiter that shrinks when the API
+    answers 429 and grows while it keeps up. An `act` call holds a slot from each request
+    until its step is reported, and gives it up while `on_step` runs, so a long session
+    doesn't keep a slot between requests. Throttled and transient failures are retried
+    with backoff, except for `act` calls that already took a step, since their tool calls
+    have run. Everything else is passed through to the wrapped client.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        rates: Optional[Dict[str, Tuple[float, int]]] = None,
+        concurrency: Optional[AIMDLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        rates = {**DEFAULT_RATES, **(rates or {})}
+        self.buckets = {endpoint: TokenBucket(rate, burst) for endpoint, (rate, burst) in rates.items()}
+        self.concurrency = concurrency if concurrency is not None else AIMDLimiter()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.sleep = sleep
+        self.retries = 0
+        self.throttled = 0  # Calls the API answered with 429
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _call(self, endpoint: str, call: Callable[[], Any], retryable: Callable[[], bool] = lambda: True) -> Any:
+        attempt = 0
+        while True:
+            self.buckets[endpoint].acquire()
+            try:
+                return call()
+            except Exception as e:
+                if isinstance(e, ApiError) and e.status_code == 429:
+                    with self._lock:
+                        self.throttled += 1
+                attempt += 1
+                if attempt >= self.retry.max_attempts or not self.retry.retryable(e) or not retryable():
+                    raise
+                with self._lock:
+                    self.retries += 1
+                self.sleep(self.retry.delay(attempt - 1))
+
+    def start_ubuntu(self, **kwargs) -> Any:
+        return self._call("start_ubuntu", lambda: self.client.start_ubuntu(**kwargs))
+
+    def get_instances(self, **kwargs) -> Any:
+        return self._call("get_instances", lambda: self.client.get_instances(**kwargs))
+
+    def act(self, *args, on_step: Optional[Callable[[Any], None]] = None, **kwargs) -> Any:
+        steps = 0
+        held = False  # Whether this call holds a concurrency slot
+        start = 0.0  # When the slot was taken
+
+        def acquire() -> None:
+            nonlocal held, start
+            self.concurrency.acquire()
+            held, start = True, time.monotonic()
+
+        def release(throttled: bool = False) -> None:
+            nonlocal held
+            held = False
+            self.concurrency.release(throttled, time.monotonic() - start)
+
+        def count_step(step: Any) -> None:
+            nonlocal steps
+            steps += 1
+            # The request for this step is done, so others may make theirs while it's handled
+            release()
+            if on_step:
+                on_step(step)
+            acquire()  # For the next request, if there is one
+
+        def call() -> Any:
+            acquire()
+            try:
+                response = self.client.act(*args, on_step=count_step, **kwargs)
+            except Exception as e:
+                if held:
+                    release(isinstance(e, ApiError) and e.status_code == 429)
+                raise
+            if held:
+                # Taken after the last step for a request act didn't make
+                self.concurrency.cancel()
+            return response
+
+        return self._call("act", call, retryable=lambda: steps == 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "act_limit": self.concurrency.limit,
+            "act_in_flight": self.concurrency.in_flight,
+        }
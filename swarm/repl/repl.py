@@ -1,62 +1,39 @@
 import json
 from swarm import Swarm
-
-def process_and_print_streaming_response(response):
-    content = ""
-    last_sender = ""
-
-    for chunk in response:
-        if "sender" in chunk:
-            last_sender = chunk["sender"]
-
-        if "content" in chunk and chunk["content"] is not None:
-            if not content and last_sender:
-                print(f"\033[94m{last_sender}:\033[0m", end=" ", flush=True)
-                last_sender = ""
-            print(chunk["content"], end="", flush=True)
-            content += chunk["content"]
-
-        if "tool_calls" in chunk and chunk["tool_calls"] is not None:
-            for tool_call in chunk["tool_calls"]:
-                f = tool_call["function"]
-                name = f["name"]
-                if not name:
-                    continue
-                print(f"\033[94m{last_sender}: \033[95m{name}\033[0m()")
-
-        if "delim" in chunk and chunk["delim"] == "end" and content:
-            print()  # End of response message
-            content = ""
-
-        if "response" in chunk:
-            return chunk["response"]
+from swarm.types import Response
+
+def process_and_print_streaming_response(response) -> Response:
+    for event in response:
+        match event.type:
+            case "text":
+                print(f"\033[94m{event.agent_name}:\033[0m {event.text}")
+            case "tool_call":
+                args_str = json.dumps(event.tool_call.args).replace(":", "=")
+                print(f"\033[94m{event.agent_name}: \033[95m{event.tool_call.tool_name}\033[0m({args_str[1:-1]})")
+            case "agent_switch":
+                print(f"\033[90m{event.agent_name} started {event.task_id}\033[0m")
+            case "run_finished":
+                return event.response
 
 def pretty_print_messages(messages) -> None:
     for message in messages:
-        if message["role"] != "assistant":
+        if message.role != "assistant":
             continue
 
-        # print agent name in blue
-        print(f"\033[94m{message['sender']}\033[0m:", end=" ")
+        for part in message.content:
+            # print response, if any
+            if part.type == "text":
+                print(f"\033[94mAssistant\033[0m: {part.text}")
 
-        # print response, if any
-        if message["content"]:
-            print(message["content"])
-
-        # print tool calls in purple, if any
-        tool_calls = message.get("tool_calls") or []
-        if len(tool_calls) > 1:
-            print()
-        for tool_call in tool_calls:
-            f = tool_call["function"]
-            name, args = f["name"], f["arguments"]
-            arg_str = json.dumps(json.loads(args)).replace(":", "=")
-            print(f"\033[95m{name}\033[0m({arg_str[1:-1]})")
+            # print tool calls in purple, if any
+            if part.type == "tool-call":
+                arg_str = json.dumps(part.args).replace(":", "=")
+                print(f"\033[95m{part.tool_name}\033[0m({arg_str[1:-1]})")
 
 def run_demo_loop(
-    starting_agent, context_variables=None, debug=False
+    starting_agent, agents=None, context_variables=None, stream=False, debug=False
 ) -> None:
-    client = Swarm()
+    client = Swarm(agents or [starting_agent])
     print("Starting Baraswarm CLI ₍ᐢ•(ܫ)•ᐢ₎")
 
     messages = []
@@ -65,16 +42,24 @@ def run_demo_loop(
     while True:
         user_input = input("\033[90mUser\033[0m: ")
 
-        response = client.run(
-            agent=agent,
-            messages=user_input,
-            context_variables=context_variables or {},
-            debug=debug,
-        )
-
         if stream:
-            response = process_and_print_streaming_response(response)
+            response = process_and_print_streaming_response(
+                client.run_stream(
+                    agent=agent,
+                    messages=messages,
+                    prompt=user_input,
+                    context_variables=context_variables or {},
+                    debug=debug,
+                )
+            )
         else:
+            response = client.run(
+                agent=agent,
+                messages=messages,
+                prompt=user_input,
+                context_variables=context_variables or {},
+                debug=debug,
+            )
             pretty_print_messages(response.messages)
 
         messages.extend(response.messages)
@@ -0,0 +1,128 @@
+import asyncio
+import heapq
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+from .tools import OrchestratorSchema
+from .types import TaskResult
+
+TaskAssignment = OrchestratorSchema.TaskAssignment
+
+class PlanError(ValueError):
+    """Raised when an orchestrator plan cannot be scheduled"""
+
+def order_plan(assignments: List[TaskAssignment], agent_names: Iterable[str]) -> List[TaskAssignment]:
+    """Validate a plan and return its assignments in topological order.
+
+    Among tasks whose dependencies are satisfied, higher priority comes first.
+    Raises PlanError for duplicate ids, unknown agents, unknown dependencies and cycles.
+    """
+    agent_names = set(agent_names)
+    by_id: Dict[str, TaskAssignment] = {}
+    for assignment in assignments:
+        if assignment.id in by_id:
+            raise PlanError(f"Duplicate task id {assignment.id}")
+        if assignment.agent_name not in agent_names:
+            raise PlanError(f"Task {assignment.id} is assigned to unknown agent {assignment.agent_name}")
+        by_id[assignment.id] = assignment
+
+    index = {a.id: i for i, a in enumerate(assignments)}
+    indegree = {a.id: 0 for a in assignments}
+    dependents = defaultdict(list)
+    for assignment in assignments:
+        for dep in set(assignment.depends_on):
+            if dep not in by_id:
+                raise PlanError(f"Task {assignment.id} depends on unknown task {dep}")
+            indegree[assignment.id] += 1
+            dependents[dep].append(assignment.id)
+
+    # Kahn's algorithm with a priority queue of ready tasks
+    ready = [(-a.priority, index[a.id], a.id) for a in assignments if indegree[a.id] == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, _, task_id = heapq.heappop(ready)
+        order.append(by_id[task_id])
+        for child in dependents[task_id]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                heapq.heappush(ready, (-by_id[child].priority, index[child], child))
+
+    if len(order) != len(assignments):
+        cycle = sorted(task_id for task_id, degree in indegree.items() if degree > 0)
+        raise PlanError(f"Plan has a dependency cycle between tasks {', '.join(cycle)}")
+    return order
+
+async def run_plan(
+    assignments: List[TaskAssignment],
+    run_task: Callable[[TaskAssignment, List[TaskResult]], Awaitable[TaskResult]],
+    max_concurrency: int,
+) -> List[TaskResult]:
+    """Run a validated plan, launching each task as soon as its dependencies finish.
+
+    `run_task` is called with the assignment and the results of its dependencies.
+    At most `max_concurrency` tasks run at once and an agent only works on one task at a
+    time. Tasks whose dependencies failed are skipped. Results are returned in plan order.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+    by_id = {a.id: a for a in assignments}
+    index = {a.id: i for i, a in enumerate(assignments)}
+    remaining = {a.id: set(a.depends_on) for a in assignments}
+    dependents = defaultdict(list)
+    for assignment in assignments:
+        for dep in remaining[assignment.id]:
+            dependents[dep].append(assignment.id)
+
+    results: Dict[str, TaskResult] = {}
+    ready = [(-a.priority, index[a.id], a.id) for a in assignments if not remaining[a.id]]
+    heapq.heapify(ready)
+    running: Dict[asyncio.Task, TaskAssignment] = {}
+    busy_agents = set()
+
+    def complete(task_id: str, result: TaskResult) -> None:
+        results[task_id] = result
+        for child in dependents[task_id]:
+            remaining[child].discard(task_id)
+            if not remaining[child]:
+                heapq.heappush(ready, (-by_id[child].priority, index[child], child))
+
+    try:
+        while ready or running:
+            deferred = []
+            while ready and len(running) < max_concurrency:
+                item = heapq.heappop(ready)
+                assignment = by_id[item[2]]
+                if assignment.agent_name in busy_agents:
+                    deferred.append(item)
+                    continue
+
+                upstream = [results[dep] for dep in assignment.depends_on]
+                failed = next((r for r in upstream if r.error), None)
+                if failed:
+                    complete(assignment.id, TaskResult(
+                        task_id=assignment.id,
+                        agent_name=assignment.agent_name,
+                        prompt=assignment.prompt,
+                        error=f"Skipped because dependency {failed.task_id} failed",
+                    ))
+                    continue
+
+                task = asyncio.create_task(run_task(assignment, upstream))
+                running[task] = assignment
+                busy_agents.add(assignment.agent_name)
+            for item in deferred:
+                heapq.heappush(ready, item)
+
+            if not running:
+                continue
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                assignment = running.pop(task)
+                busy_agents.discard(assignment.agent_name)
+                complete(assignment.id, task.result())
+    finally:
+        for task in running:
+            task.cancel()
+
+    return [results[a.id] for a in assignments]
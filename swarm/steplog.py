@@ -0,0 +1,232 @@
+import abc
+import atexit
+import functools
+import json
+import queue
+import sys
+import threading
+import time
+from typing import IO, Any, Dict, List, NamedTuple, Optional, Union
+
+from .util import format_step
+
+POLICIES = ("block", "drop", "sample")
+FLUSH_SECONDS = 5  # How long the end of a run and interpreter exit wait for steps to be written
+
+class StepRecord(NamedTuple):
+    """A step as it was logged. Rendering happens on the writer thread, so this is all the agent pays for."""
+    timestamp: float
+    agent_name: str
+    instance_id: Optional[str]
+    color: Optional[str]
+    step: Any
+
+class Sink(abc.ABC):
+    """Writes step records. Called on the logger's writer thread only."""
+
+    @abc.abstractmethod
+    def write(self, record: StepRecord) -> None:
+        """Write a single record"""
+
+    def flush(self) -> None:
+        """Called whenever the queue runs empty"""
+
+    def close(self) -> None:
+        self.flush()
+
+class ConsoleSink(Sink):
+    """Colored, human-readable steps, in the format of pretty_print_step"""
+
+    def __init__(self, stream: Optional[IO[str]] = None):
+        self.stream = stream
+
+    def write(self, record: StepRecord) -> None:
+        text = format_step(record.step, record.color or "0")
+        if text:
+            # Looked up on every write, so redirected stdout is respected
+            (self.stream or sys.stdout).write(text + "\n")
+
+    def flush(self) -> None:
+        (self.stream or sys.stdout).flush()
+
+class JSONLSink(Sink):
+    """One compact JSON object per step, with the agent, instance, time and tool calls"""
+
+    def __init__(self, file: Union[str, IO[str]]):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, "a", encoding="utf-8") if isinstance(file, str) else file
+
+    def write(self, record: StepRecord) -> None:
+        self.file.write(json.dumps(step_record_json(record), separators=(",", ":"), default=str) + "\n")
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._owns_file:
+            self.file.close()
+
+def step_record_json(record: StepRecord) -> Dict[str, Any]:
+    step = record.step
+    data: Dict[str, Any] = {"ts": round(record.timestamp, 6), "agent": record.agent_name, "instance": record.instance_id}
+    if step.text:
+        data["text"] = step.text
+    if step.tool_calls:
+        data["tool_calls"] = [
+            {"id": call.tool_call_id, "name": call.tool_name, "args": call.args} for call in step.tool_calls
+        ]
+    if step.tool_results:
+        data["tool_results"] = [
+            {"id": result.tool_call_id, "name": result.tool_name, "error": bool(result.is_error)}
+            for result in step.tool_results
+        ]
+    if step.usage:
+        data["usage"] = step.usage.model_dump(exclude_none=True)
+    return data
+
+class StepLogger:
+    """Hands agent steps to sinks through a bounded queue drained by a background thread.
+
+    Agents only enqueue a record. When the queue is full, `policy` decides what happens:
+    "drop" (the default) discards the record, and "sample" starts keeping only every
+    `sample_every`-th record once the queue is half full and drops the rest, so logging
+    can't slow the agents down. "block" waits for room instead, for logs that must be
+    complete. `stats()` counts what was logged and lost.
+    """
+
+    def __init__(
+        self,
+        sinks: Optional[List[Sink]] = None,
+        max_queue: int = 10000,
+        policy: str = "drop",
+        sample_every: int = 10,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}, got {policy!r}")
+        self.sinks = sinks if sinks is not None else [ConsoleSink()]
+        self.policy = policy
+        self.sample_every = sample_every
+        self.logged = 0
+        self.dropped = 0  # Records lost to a full queue
+        self.sampled_out = 0  # Records skipped by sampling
+        self.errors = 0  # Sink writes that raised
+        self._pressured = 0  # Records logged while the queue was half full
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def log(self, agent_name: str, step: Any, instance_id: Optional[str] = None, color: Optional[str] = None) -> None:
+        """Queue a step for the sinks"""
+        if self._closed:
+            return
+        self._start()
+        record = StepRecord(time.time(), agent_name, instance_id, color, step)
+        if self.policy == "block":
+            self._queue.put(record)
+        else:
+            if self.policy == "sample" and self._queue.qsize() >= self._queue.maxsize // 2:
+                with self._lock:
+                    self._pressured += 1
+                    keep = self._pressured % self.sample_every == 0
+                    if not keep:
+                        self.sampled_out += 1
+                if not keep:
+                    return
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                return
+        with self._lock:
+            self.logged += 1
+
+    def _start(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._drain, name="swarm-step-log", daemon=True)
+                    self._thread.start()
+
+    def _drain(self) -> None:
+        while True:
+            record = self._queue.get()
+            if isinstance(record, StepRecord):
+                for sink in self.sinks:
+                    try:
+                        sink.write(record)
+                    except Exception:
+                        with self._lock:
+                            self.errors += 1
+                if not self._queue.empty():
+                    continue
+            for sink in self.sinks:
+                try:
+                    sink.flush()
+                except Exception:
+                    with self._lock:
+                        self.errors += 1
+            if isinstance(record, threading.Event):
+                record.set()
+            elif record is None:
+                return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the records queued so far were written, but not for ones queued later.
+        Gives up after `timeout` seconds and returns whether everything was written."""
+        if self._thread is None or self._closed:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Write the queued records, stop the writer thread and close the sinks. Later steps are ignored.
+
+        Gives up after `timeout` seconds and returns whether everything was written. The
+        sinks of a writer that is still stuck are left open, since it may still use them.
+        """
+        if self._closed:
+            return True
+        self._closed = True
+        if self._thread is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return False
+            self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if self._thread.is_alive():
+                return False
+        for sink in self.sinks:
+            sink.close()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "logged": self.logged,
+                "dropped": self.dropped,
+                "sampled_out": self.sampled_out,
+                "errors": self.errors,
+                "queued": self._queue.qsize(),
+            }
+
+_default: Optional[StepLogger] = None
+_default_lock = threading.Lock()
+
+def default_step_logger() -> StepLogger:
+    """The console logger shared by swarms that weren't given one, flushed at exit for at
+    most FLUSH_SECONDS"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = StepLogger()
+            atexit.register(functools.partial(_default.close, timeout=FLUSH_SECONDS))
+        return _default
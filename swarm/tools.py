@@ -1,78 +1,132 @@
-from typing import Any, Optional, List
+import time
+from typing import Any, Callable, Dict, Literal, Optional, List
 from pydantic import BaseModel
 from scrapybara.tools import Tool
-from scrapybara.client import UbuntuInstance
+
+from .bus import BROADCAST, AgentMessage, MessageBus
 
 class OrchestratorSchema(BaseModel):
     """The orchestrator's structured plan for task distribution"""
     class TaskAssignment(BaseModel):
+        id: str  # Unique id of the task within the plan
         agent_name: str
         prompt: str
         priority: int = 1  # Higher number = higher priority
+        depends_on: List[str] = []  # Ids of tasks that must finish before this one starts
     overall_task: str  # The original task being broken down
     task_assignments: List[TaskAssignment]  # List of assignments for each agent
     execution_notes: str  # Any additional notes about task execution or coordination
 
-# class HandoffParameters(BaseModel):
-#     reason: str  # Why the agent wants to hand off the task
-#     suggested_agent: Optional[str] = None  # Name of suggested agent to handle the task
-#     task_description: str  # Description of the task to be handed off
-#     requires_response: bool = False  # Whether the agent needs a response from the task
-#     context: Optional[dict] = None  # Any additional context needed for the task
-
-# class HandoffTool(Tool):
-#     _instance: UbuntuInstance
-#     _swarm: Any  # Reference to the Swarm instance
-#     _agent: Any  # Reference to the current agent
-
-#     def __init__(self, instance: UbuntuInstance, swarm: Any, agent: Any) -> None:
-#         super().__init__(
-#             name="handoff",
-#             description="Hand off a task to another agent or notify the orchestrator agent about task status. Use this when you think another agent would be better suited for the current task, or when you need to coordinate with other agents.",
-#             parameters=HandoffParameters,
-#         )
-#         self._instance = instance
-#         self._swarm = swarm
-#         self._agent = agent
-
-#     def __call__(self, **kwargs: Any) -> Any:
-#         params = HandoffParameters(**kwargs)
-        
-#         # If this is the orchestrator agent, we shouldn't allow handoffs
-#         if self._agent.orchestrator:
-#             return {
-#                 "status": "error",
-#                 "message": "Orchestrator agent cannot hand off tasks"
-#             }
-
-#         # Find the orchestrator agent
-#         orchestrator_agent = next(
-#             (agent for agent in self._swarm.agents if agent.orchestrator),
-#             None
-#         )
-        
-#         if not orchestrator_agent:
-#             return {
-#                 "status": "error",
-#                 "message": "No orchestrator agent found in the swarm"
-#             }
-
-#         # Create a handoff request message
-#         handoff_request = {
-#             "type": "handoff_request",
-#             "from_agent": self._agent.name,
-#             "reason": params.reason,
-#             "suggested_agent": params.suggested_agent,
-#             "task_description": params.task_description,
-#             "requires_response": params.requires_response,
-#             "context": params.context or {}
-#         }
-
-#         # Add the request to the swarm's message queue
-#         self._swarm.message_queue.append(handoff_request)
-
-#         return {
-#             "status": "success",
-#             "message": f"Task handoff request sent to orchestrator agent",
-#             "request": handoff_request
-#         } 
\ No newline at end of file
+class ObservedTool(Tool):
+    """A tool that reports every call to an observer.
+
+    The observer receives the tool name, the call arguments, the perf_counter time the call
+    started and its duration in seconds, even if the call raised.
+    """
+    _tool: Tool
+    _observer: Callable[[str, Dict[str, Any], float, float], None]
+
+    def __init__(self, tool: Tool, observer: Callable[[str, Dict[str, Any], float, float], None]) -> None:
+        super().__init__(name=tool.name, description=tool.description, parameters=tool.parameters)
+        self._tool = tool
+        self._observer = observer
+
+    def __call__(self, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._tool(**kwargs)
+        finally:
+            self._observer(self._tool.name, kwargs, start, time.perf_counter() - start)
+
+class HandoffParameters(BaseModel):
+    reason: str  # Why the agent wants to hand off the task
+    suggested_agent: Optional[str] = None  # Name of suggested agent to handle the task
+    task_description: str  # Description of the task to be handed off
+    context: Optional[dict] = None  # Any additional context needed for the task
+
+class HandoffTool(Tool):
+    """Lets an agent ask the orchestrator to hand a task to another agent.
+
+    Requests go to the orchestrator's mailbox with the priority of the sender's current
+    task, and repeated requests for the same task are coalesced while pending.
+    """
+    _bus: MessageBus
+    _agent_name: str
+    _orchestrator_name: str
+    _assignment: Optional[OrchestratorSchema.TaskAssignment]
+
+    def __init__(
+        self,
+        bus: MessageBus,
+        agent_name: str,
+        orchestrator_name: str,
+        assignment: Optional[OrchestratorSchema.TaskAssignment] = None,
+    ) -> None:
+        super().__init__(
+            name="handoff",
+            description="Hand off a task to another agent through the orchestrator. Use this when you think another agent would be better suited for a task, or when you need to coordinate with other agents.",
+            parameters=HandoffParameters,
+        )
+        self._bus = bus
+        self._agent_name = agent_name
+        self._orchestrator_name = orchestrator_name
+        self._assignment = assignment
+
+    def __call__(self, **kwargs: Any) -> Any:
+        params = HandoffParameters(**kwargs)
+        message = AgentMessage(
+            sender=self._agent_name,
+            recipient=self._orchestrator_name,
+            type="handoff_request",
+            content=params.model_dump(),
+            priority=self._assignment.priority if self._assignment else 1,
+            task_id=self._assignment.id if self._assignment else None,
+            key=f"handoff:{self._agent_name}:{' '.join(params.task_description.lower().split())}",
+        )
+        if not self._bus.send(message):
+            return {"status": "success", "message": "The same handoff request is already pending with the orchestrator"}
+        return {"status": "success", "message": "Task handoff request sent to the orchestrator"}
+
+MAX_RECEIVE_SECONDS = 300  # Longest an agent may block waiting for a message
+
+class MessageParameters(BaseModel):
+    action: Literal["send", "receive"]
+    to: Optional[str] = None  # Name of the receiving agent, or None to message every agent
+    text: Optional[str] = None  # Message to send
+    timeout: float = 30  # Seconds to wait for a message when receiving
+
+class MessageTool(Tool):
+    """Lets agents that run at the same time message each other through the bus"""
+    _bus: MessageBus
+    _agent_name: str
+    _assignment: Optional[OrchestratorSchema.TaskAssignment]
+
+    def __init__(self, bus: MessageBus, agent_name: str, assignment: Optional[OrchestratorSchema.TaskAssignment] = None) -> None:
+        super().__init__(
+            name="message",
+            description="Send a message to another agent (or to every agent by leaving out `to`), or wait for the next message sent to you.",
+            parameters=MessageParameters,
+        )
+        self._bus = bus
+        self._agent_name = agent_name
+        self._assignment = assignment
+
+    def __call__(self, **kwargs: Any) -> Any:
+        params = MessageParameters(**kwargs)
+        if params.action == "receive":
+            timeout = min(params.timeout, MAX_RECEIVE_SECONDS)
+            message = self._bus.receive(self._agent_name, timeout=timeout)
+            if message is None:
+                return {"status": "timeout", "message": f"No message within {timeout} seconds"}
+            return {"status": "success", "from": message.sender, "type": message.type, "content": message.content}
+
+        if not params.text:
+            raise ValueError("text is required to send a message")
+        self._bus.send(AgentMessage(
+            sender=self._agent_name,
+            recipient=params.to or BROADCAST,
+            content={"text": params.text},
+            priority=self._assignment.priority if self._assignment else 1,
+            task_id=self._assignment.id if self._assignment else None,
+        ))
+        return {"status": "success", "message": f"Message sent to {params.to or 'every agent'}"}
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Chrome trace processes that group the tracks
+TRACK_GROUPS = {"swarm": 1, "agent": 2, "instance": 3}
+
+class Tracer:
+    """Records spans of swarm runs and exports them as Chrome Trace Event JSON.
+
+    Every span belongs to a track: the swarm itself, an agent or an instance. The exported
+    trace shows one row per track, so it can be opened in Perfetto or chrome://tracing
+    to see where agents sharing an instance wait on each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._tracks: Dict[Tuple[str, str], int] = {}
+
+    def _track(self, group: str, name: str) -> Tuple[int, int]:
+        if group not in TRACK_GROUPS:
+            raise ValueError(f"group must be one of {', '.join(TRACK_GROUPS)}, got {group!r}")
+        pid = TRACK_GROUPS[group]
+        key = (group, name)
+        if key not in self._tracks:
+            self._tracks[key] = tid = len(self._tracks) + 1
+            self._events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}})
+        return pid, self._tracks[key]
+
+    def add(self, name: str, group: str, track: str, start: float, duration: float, **args: Any) -> None:
+        """Add a span that started at perf_counter time `start` and lasted `duration` seconds"""
+        if duration < 0:
+            raise ValueError(f"duration must not be negative, got {duration}")
+        with self._lock:
+            pid, tid = self._track(group, track)
+            self._events.append({
+                "ph": "X",
+                "name": name,
+                "cat": group,
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self._origin) * 1e6,
+                "dur": duration * 1e6,
+                "args": {key: value if isinstance(value, (int, float, bool)) else str(value) for key, value in args.items()},
+            })
+
+    @contextmanager
+    def span(self, name: str, group: str, track: str, **args: Any) -> Iterator[None]:
+        """Record the block as a span, even if it raises, in which case the span gets the error's type"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.add(name, group, track, start, time.perf_counter() - start, **args)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        with self._lock:
+            processes = [
+                {"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": f"{group}s"}}
+                for group, pid in TRACK_GROUPS.items()
+            ]
+            return {"traceEvents": processes + list(self._events), "displayTimeUnit": "ms"}
+
+    def save(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+def span(tracer: Optional[Tracer], name: str, group: str, track: str, **args: Any):
+    """A span on `tracer`, or a no-op if tracing is disabled"""
+    return tracer.span(name, group, track, **args) if tracer else nullcontext()
@@ -1,9 +1,12 @@
 from typing import List, Callable, Optional, Any
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field
 from scrapybara.anthropic import Anthropic
 from scrapybara.prompts import UBUNTU_SYSTEM_PROMPT
 from scrapybara.types.act import Message
-from .util import pretty_print_step
+from .compaction import Compaction
+from .images import ImagePolicy
+from .usage import Budget
+from .convergence import ConvergencePolicy
 import random
 
 AGENT_COLORS = ["91", "92", "93", "94", "95", "96"]  # red, green, yellow, blue, purple, cyan
@@ -19,34 +22,61 @@ class Agent(BaseModel):
     # client.act parameters
     model: Anthropic = Field(default_factory=Anthropic)
     tools: List[Any] = Field(default_factory=list)  # List of tool instances
+    default_tools: bool = True  # Use the Ubuntu tools when `tools` is empty
     system: str = UBUNTU_SYSTEM_PROMPT
     prompt: Optional[str] = None
     messages: List[Message] = Field(default_factory=list)  # Agent's conversation history
     schema: Optional[Any] = None  # Type for structured output
-    on_step: Optional[Callable] = None
-    
-    @model_validator(mode='after')
-    def setup_defaults(self) -> 'Agent':
-        """Set up default on_step function and orchestrator system prompt"""
-        if self.on_step is None:
-            self.on_step = lambda step: pretty_print_step(step, self.color)
-            
-        return self
+    on_step: Optional[Callable] = None  # Called with every step instead of logging it to the swarm's step_log
+
+    # Context compaction
+    context_budget: Optional[int] = None  # Max estimated tokens of history sent to client.act
+    compactor: Optional[Any] = None  # Overrides the swarm's compactor for this agent
+    compactions: List[Compaction] = Field(default_factory=list)  # What was elided from the history
+    image_policy: Optional[ImagePolicy] = None  # Overrides the swarm's screenshot policy for this agent
+    budget: Optional[Budget] = None  # Limits on this agent's usage within a run
+    convergence: Optional[ConvergencePolicy] = None  # Overrides the swarm's stall detection for this agent
+
+class TaskResult(BaseModel):
+    """The outcome of one orchestrator task assignment"""
+    agent_name: str
+    prompt: str
+    task_id: Optional[str] = None  # Id of the assignment in the orchestrator plan
+    steps: List = []  # Scrapybara execution steps taken by the agent
+    text: Optional[str] = None  # Final text of the agent
+    output: Optional[Any] = None  # Structured output, if the agent has a schema
+    usage: Optional[Any] = None  # Token usage of the assignment
+    error: Optional[str] = None  # Set if the assignment could not be completed
 
 class Response(BaseModel):
     messages: List[Message] = []
     agent: Optional[Agent] = None
     context_variables: dict = {}
     steps: List = []  # Track Scrapybara execution steps
-    usage: Optional[dict] = None  # Track token usage
+    usage: Optional[Any] = None  # RunUsage with totals and per-agent usage
     output: Optional[Any] = None  # For schema-based structured output
+    results: List[TaskResult] = []  # Outcome of every task assignment
+    stop_reason: Optional[str] = None  # Why the run stopped early, if it did
+    run_id: Optional[str] = None  # Id of the run in the swarm's journal, for resume()
+
+class BatchResult(BaseModel):
+    """The outcome of one task of a batch"""
+    index: int  # Position of the task's prompt in the batch
+    prompt: str
+    response: Optional[Response] = None
+    error: Optional[str] = None  # Set if the run raised
+    seconds: float = 0.0  # Wall time of the run, not counting the wait for a free slot
 
-def get_orchestrator_prompt(agents: List['Agent']) -> str:
+def get_orchestrator_prompt(agents: List['Agent'], roles: Optional[dict] = None) -> str:
+    """The orchestrator's system prompt. `roles` maps agent names to the description to
+    list instead of their current prompt. The roster comes last, so the instructions
+    before it are the same for every swarm and can be served from the prompt cache."""
+    roles = roles or {}
     agent_info = "\n".join([
-        f"  - {a.name}: {a.prompt}"
+        f"  - {a.name}: {roles.get(a.name, a.prompt)}"
         for a in agents if not a.orchestrator
     ])
-    
+
     return f"""You are the Orchestrator Agent, the central coordinator of a swarm of AI agents working together on computer tasks. You will be given a task and a list of agents with their capabilities. Your role is to:
 
 1. TASK ANALYSIS & DELEGATION
@@ -80,15 +110,68 @@ def get_orchestrator_prompt(agents: List['Agent']) -> str:
 - Suggest alternative approaches when agents face difficulties
 - Adapt the task distribution based on agent feedback
 
-<AGENTS>
-{agent_info}
-</AGENTS>
-
 For each task, you must output a structured plan using the Orchestrator schema, which includes:
 - The overall task description
 - Specific task assignments for each agent, including:
+  * A unique task id
   * The exact prompt/instructions
   * Priority level
+  * The ids of the tasks it depends on, if any. A task starts as soon as all of its dependencies are done, and independent tasks run in parallel
 - Any additional execution notes or coordination requirements
 
-Remember: You are the orchestrator of the swarm. Your decisions should optimize for efficient task completion while maintaining clear communication and coordination between all agents."""
+After the agents finish their assignments you will receive their results. If the task is not yet complete, output a new plan for the remaining work. Once the task is complete, output a plan with no task assignments.
+
+Remember: You are the orchestrator of the swarm. Your decisions should optimize for efficient task completion while maintaining clear communication and coordination between all agents.
+
+<AGENTS>
+{agent_info}
+</AGENTS>"""
+
+
+def get_results_prompt(results: List[TaskResult], handoffs: List[Any] = ()) -> str:
+    results_info = "\n".join([
+        f"  - {r.task_id} ({r.agent_name}): {r.error if r.error else r.text}"
+        for r in results
+    ])
+    prompt = f"""The agents have finished their assignments:
+
+<RESULTS>
+{results_info}
+</RESULTS>"""
+    if not handoffs:
+        return prompt
+
+    handoffs_info = "\n".join([
+        f"  - From {h.sender} (task {h.task_id}, priority {h.priority}): {h.content['task_description']}"
+        f" Reason: {h.content['reason']}"
+        + (f" Suggested agent: {h.content['suggested_agent']}" if h.content.get("suggested_agent") else "")
+        for h in handoffs
+    ])
+    return f"""{prompt}
+
+Some agents asked to hand off work, most urgent first. Reassign it in your next plan if appropriate:
+
+<HANDOFF_REQUESTS>
+{handoffs_info}
+</HANDOFF_REQUESTS>"""
+
+
+def get_task_prompt(prompt: str, upstream: List[TaskResult]) -> str:
+    if not upstream:
+        return prompt
+
+    upstream_info = "\n".join([
+        f"  - {r.task_id} ({r.agent_name}): {r.text}"
+        for r in upstream
+    ])
+
+    return f"""{prompt}
+
+This task builds on the results of these earlier tasks:
+
+<UPSTREAM_RESULTS>
+{upstream_info}
+</UPSTREAM_RESULTS>"""
+
+
+RESUME_PROMPT = "You were interrupted while working on this task. Continue from where you left off."
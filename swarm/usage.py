@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+class Usage(BaseModel):
+    """Token, call and instance usage of an agent or a whole run"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0  # Input tokens served from the provider's prompt cache
+    cache_creation_tokens: int = 0  # Input tokens written to the provider's prompt cache
+    cache_hits: int = 0  # Steps whose prompt was partly served from the cache
+    act_calls: int = 0
+    # Instance time: for an agent, time spent in client.act; for a run, time instances were leased
+    instance_seconds: float = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+class RunUsage(BaseModel):
+    total: Usage = Field(default_factory=Usage)
+    agents: Dict[str, Usage] = {}
+
+class Budget(BaseModel):
+    """Limits on the usage of a run or an agent. None means unlimited."""
+    max_tokens: Optional[int] = None
+    max_act_calls: Optional[int] = None
+    max_instance_minutes: Optional[float] = None
+
+    def check(self, usage: Usage, starting_act: bool = False) -> Optional[str]:
+        """The reason the usage exceeds the budget, or None"""
+        if self.max_tokens is not None and usage.total_tokens > self.max_tokens:
+            return f"token budget of {self.max_tokens} exceeded"
+        if self.max_act_calls is not None and usage.act_calls + starting_act > self.max_act_calls:
+            return f"budget of {self.max_act_calls} act calls exceeded"
+        if self.max_instance_minutes is not None and usage.instance_seconds > self.max_instance_minutes * 60:
+            return f"budget of {self.max_instance_minutes} instance minutes exceeded"
+        return None
+
+class BudgetExceeded(Exception):
+    """Raised inside an agent's act call to stop it once a budget is exhausted"""
+
+    def __init__(self, reason: str, agent_name: Optional[str] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.agent_name = agent_name  # Set if only this agent's budget is exhausted
+        self.steps: List = []  # Steps the agent completed before it was stopped
+
+class UsageTracker:
+    """Aggregates the usage of one run and enforces the run's and the agents' budgets"""
+
+    def __init__(self, budget: Optional[Budget] = None, instance_seconds: Callable[[], float] = lambda: 0.0):
+        self.budget = budget
+        self.instance_seconds = instance_seconds  # Current instance time of the run
+        self.usage = RunUsage()
+        self.stop_reason: Optional[str] = None  # Set once the run budget is exhausted
+        self._lock = threading.Lock()
+        self._acts_started: Dict[str, List[float]] = {}
+
+    def _agent(self, name: str) -> Usage:
+        return self.usage.agents.setdefault(name, Usage())
+
+    def check(self, agent, starting_act: bool = False) -> None:
+        """Raise BudgetExceeded if the run's or the agent's budget is exhausted"""
+        with self._lock:
+            now = time.monotonic()
+            self.usage.total.instance_seconds = self.instance_seconds()
+            usage = self._agent(agent.name)
+            ongoing = sum(now - start for start in self._acts_started.get(agent.name, []))
+            usage = usage.model_copy(update={"instance_seconds": usage.instance_seconds + ongoing})
+
+            if self.stop_reason is None and self.budget:
+                self.stop_reason = self.budget.check(self.usage.total, starting_act)
+            if self.stop_reason:
+                raise BudgetExceeded(f"Run stopped: {self.stop_reason}")
+            reason = agent.budget.check(usage, starting_act) if agent.budget else None
+            if reason:
+                raise BudgetExceeded(f"{agent.name} stopped: {reason}", agent.name)
+
+    def stop(self, reason: str) -> None:
+        """Stop the run: running agents are stopped at their next step"""
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+
+    def start_act(self, agent) -> None:
+        self.check(agent, starting_act=True)
+        with self._lock:
+            self.usage.total.act_calls += 1
+            self._agent(agent.name).act_calls += 1
+            self._acts_started.setdefault(agent.name, []).append(time.monotonic())
+
+    def end_act(self, agent) -> None:
+        with self._lock:
+            start = self._acts_started[agent.name].pop(0)
+            self._agent(agent.name).instance_seconds += time.monotonic() - start
+
+    def add_step(self, agent, step) -> None:
+        """Count the tokens of a step, then enforce the budgets"""
+        if step.usage:
+            with self._lock:
+                for usage in (self.usage.total, self._agent(agent.name)):
+                    usage.input_tokens += step.usage.prompt_tokens
+                    usage.output_tokens += step.usage.completion_tokens
+                    cache_read = getattr(step.usage, "cache_read_input_tokens", 0) or 0
+                    usage.cache_read_tokens += cache_read
+                    usage.cache_creation_tokens += getattr(step.usage, "cache_creation_input_tokens", 0) or 0
+                    usage.cache_hits += cache_read > 0
+        self.check(agent)
+
+    def snapshot(self, agent_name: str) -> Tuple[Usage, Usage]:
+        """Copies of the agent's usage and the run's total usage"""
+        with self._lock:
+            return self._agent(agent_name).model_copy(), self.usage.total.model_copy()
@@ -1,19 +1,31 @@
 import json
 from datetime import datetime
+from typing import Any, List
 
-def pretty_print_step(step, color: str) -> None:
-    # Print the step text if available
+from pydantic import BaseModel, TypeAdapter
+from scrapybara.types.act import AssistantMessage, Message, Step, TextPart, ToolMessage
+
+def format_step(step, color: str) -> str:
+    """The step's text and tool calls, colored for a terminal"""
+    lines = []
+    # The step text if available
     if step.text:
-        print(f"\033[{color}mAssistant\033[0m: {step.text}")
-    
-    # Print any tool calls
+        lines.append(f"\033[{color}mAssistant\033[0m: {step.text}")
+
+    # Any tool calls
     if step.tool_calls:
         if len(step.tool_calls) > 1:
-            print()
+            lines.append("")
         for tool_call in step.tool_calls:
             name = tool_call.tool_name
             args_str = json.dumps(tool_call.args).replace(":", "=")
-            print(f"\033[{color}m{name}\033[0m({args_str[1:-1]})")
+            lines.append(f"\033[{color}m{name}\033[0m({args_str[1:-1]})")
+    return "\n".join(lines)
+
+def pretty_print_step(step, color: str) -> None:
+    text = format_step(step, color)
+    if text:
+        print(text)
 
 def debug_print(debug: bool, *args: str) -> None:
     if not debug:
@@ -21,3 +33,33 @@ def debug_print(debug: bool, *args: str) -> None:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     message = " ".join(map(str, args))
     print(f"\033[97m[\033[90m{timestamp}\033[97m]\033[90m {message}\033[0m")
+
+def to_json(value: Any) -> Any:
+    """Convert models, including ones nested in lists and dicts, to JSON-compatible values"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    return value
+
+_messages = TypeAdapter(List[Message])
+
+def messages_from_json(data: List[Any]) -> List[Message]:
+    """Rebuild messages serialized with to_json"""
+    return _messages.validate_python(data)
+
+def step_messages(steps: List[Step]) -> List[Message]:
+    """The messages client.act adds to a conversation for the given steps"""
+    messages: List[Message] = []
+    for step in steps:
+        messages.append(AssistantMessage(
+            content=([TextPart(text=step.text)] if step.text else [])
+            + (step.reasoning_parts or [])
+            + (step.tool_calls or []),
+            response_id=step.response_id,
+        ))
+        if step.tool_results:
+            messages.append(ToolMessage(content=step.tool_results))
+    return messages
@@ -0,0 +1,86 @@
+import os
+import socket
+import threading
+from typing import Any, Dict, Optional
+
+from scrapybara.core.api_error import ApiError
+
+from .broker import Broker, WorkItem, WorkUpdate
+from .core import Swarm
+from .convergence import Stalled
+from .usage import BudgetExceeded, UsageTracker
+from .util import messages_from_json, to_json
+
+class Worker:
+    """Runs task assignments from a broker on the agents of a swarm in this process.
+
+    Start workers with the same agents as the coordinator's swarm, which assigns work to
+    them through a swarm created with `broker=`. The worker's orchestrator is never run.
+    Steps are streamed back as they happen and handoff requests are sent back with the
+    result, but the `message` tool only reaches agents on the same worker.
+    """
+
+    def __init__(self, swarm: Swarm, broker: Broker, name: Optional[str] = None):
+        self.swarm = swarm
+        self.broker = broker
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+
+    def process(self, item: WorkItem) -> None:
+        """Run one item and publish its steps and result"""
+        agent = self.swarm._get_agent(item.agent_name)
+        if agent is None:
+            self._publish(item, "result", {"error": {"type": "exception", "message": f"Unknown agent: {item.agent_name}"}})
+            return
+
+        def checkpoint(kind: str, data: Dict[str, Any]) -> None:
+            if kind == "step":
+                self._publish(item, "step", data)
+
+        agent.messages = messages_from_json(item.messages)
+        try:
+            completion = self.swarm.get_act_completion(
+                agent=agent,
+                messages=agent.messages,
+                prompt=item.prompt,
+                usage=UsageTracker(None, self.swarm._instance_seconds),  # Enforces the agent's own budget
+                assignment=item.assignment,
+                checkpoint=checkpoint,
+            )
+            data = {
+                "messages": to_json(completion.messages),
+                "text": completion.text,
+                "output": to_json(completion.output),
+                "usage": to_json(completion.usage),
+            }
+        except ApiError as e:
+            data = {"error": {"type": "api", "status_code": e.status_code, "body": to_json(e.body)}}
+        except BudgetExceeded as e:
+            data = {"error": {"type": "budget", "reason": e.reason}}
+        except Stalled as e:
+            data = {"error": {"type": "stalled", "reason": e.reason, "kind": e.kind, "stop_run": e.stop_run}}
+        except Exception as e:
+            # Fail the assignment rather than the worker
+            data = {"error": {"type": "exception", "message": f"{type(e).__name__}: {e}"}}
+        orchestrator = self.swarm.orchestrator.name
+        data["handoffs"] = [to_json(m) for m in self.swarm.bus.drain(orchestrator) if m.type == "handoff_request"]
+        self._publish(item, "result", data)
+
+    def _publish(self, item: WorkItem, kind: str, data: Dict[str, Any]) -> None:
+        self.broker.publish(WorkUpdate(item_id=item.id, kind=kind, data=data, worker=self.name, lease=item.lease))
+
+    def run(self, stop: Optional[threading.Event] = None, max_items: Optional[int] = None, poll: float = 1.0) -> int:
+        """Process items until `stop` is set or `max_items` were processed. Returns the number processed.
+
+        The agents keep their instances between items, and return them to the pool when the
+        worker stops.
+        """
+        processed = 0
+        try:
+            while not (stop and stop.is_set()) and (max_items is None or processed < max_items):
+                item = self.broker.fetch(timeout=poll)
+                if item is not None:
+                    self.process(item)
+                    processed += 1
+        finally:
+            self.swarm._release_instances()
+        return processed
@@ -1,96 +1,235 @@
-from unittest.mock import MagicMock
-from swarm.types import ChatCompletionMessage, ChatCompletionMessageToolCall, Function
-from openai import OpenAI
-from openai.types.chat.chat_completion import ChatCompletion, Choice
-import json
-
-
-def create_mock_response(message, function_calls=[], model="gpt-4o"):
-    role = message.get("role", "assistant")
-    content = message.get("content", "")
-    tool_calls = (
-        [
-            ChatCompletionMessageToolCall(
-                id="mock_tc_id",
-                type="function",
-                function=Function(
-                    name=call.get("name", ""),
-                    arguments=json.dumps(call.get("args", {})),
-                ),
-            )
-            for call in function_calls
-        ]
-        if function_calls
-        else None
-    )
-
-    return ChatCompletion(
-        id="mock_cc_id",
-        created=1234567890,
-        model=model,
-        object="chat.completion",
-        choices=[
-            Choice(
-                message=ChatCompletionMessage(
-                    role=role, content=content, tool_calls=tool_calls
+"""In-process stand-in for the Scrapybara client, for tests and benchmarks without network access"""
+import random
+import shlex
+import threading
+import time
+import uuid
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from scrapybara.core.api_error import ApiError
+from scrapybara.types import BashResponse, ComputerResponse, EditResponse
+from scrapybara.types.act import (
+    ActResponse,
+    AssistantMessage,
+    Step,
+    TextPart,
+    TokenUsage,
+    ToolCallPart,
+    ToolMessage,
+    ToolResultPart,
+    UserMessage,
+)
+
+from swarm.compaction import estimate_tokens
+from swarm.tools import OrchestratorSchema
+
+# A 1x1 white PNG
+SCREENSHOT = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGP4//8/AAX+Av4N70a4AAAAAElFTkSuQmCC"
+
+
+class FakeStep(BaseModel):
+    """One scripted model response: some text and the tool calls to run"""
+    text: str = ""
+    tool_calls: List[Tuple[str, Dict[str, Any]]] = []  # (tool name, args)
+
+
+class FakeBrowser:
+    def stop(self) -> None:
+        pass
+
+
+class FakeInstance:
+    """Ubuntu instance with an in-memory filesystem behind the Bash, Computer and Edit tools"""
+
+    def __init__(self, instance_id: str):
+        self.id = instance_id
+        self.status = "running"
+        self.browser = FakeBrowser()
+        self.files: Dict[str, str] = {}
+        self.commands: List[str] = []  # Every bash command, in order
+        self.actions: List[str] = []  # Every computer action, in order
+
+    def bash(self, command: Optional[str] = None, **kwargs) -> BashResponse:
+        self.commands.append(command)
+        args = shlex.split(command or "")
+        if args[:1] == ["echo"]:
+            return BashResponse(output=" ".join(args[1:]) + "\n")
+        if args[:1] == ["cat"]:
+            missing = [path for path in args[1:] if path not in self.files]
+            if missing:
+                return BashResponse(error=f"cat: {missing[0]}: No such file or directory")
+            return BashResponse(output="".join(self.files[path] for path in args[1:]))
+        if args[:1] == ["ls"]:
+            return BashResponse(output="".join(f"{path}\n" for path in sorted(self.files)))
+        return BashResponse(output="")
+
+    def computer(self, action: str, **kwargs) -> ComputerResponse:
+        self.actions.append(action)
+        if action == "take_screenshot":
+            return ComputerResponse(base_64_image=SCREENSHOT)
+        return ComputerResponse(output=f"{action} ok")
+
+    def edit(self, command: str, path: str, file_text: Optional[str] = None, old_str: Optional[str] = None,
+             new_str: Optional[str] = None, **kwargs) -> EditResponse:
+        if command == "create":
+            self.files[path] = file_text or ""
+            return EditResponse(output=f"File created at {path}")
+        if path not in self.files:
+            raise ValueError(f"The path {path} does not exist")
+        if command == "view":
+            return EditResponse(output=self.files[path])
+        if command == "str_replace":
+            if self.files[path].count(old_str) != 1:
+                raise ValueError(f"old_str must appear exactly once in {path}")
+            self.files[path] = self.files[path].replace(old_str, new_str or "")
+            return EditResponse(output=f"The file {path} has been edited")
+        raise ValueError(f"Unsupported command: {command}")
+
+    def stop(self) -> None:
+        self.status = "terminated"
+
+
+def echo_script(prompt: str) -> List[FakeStep]:
+    """Default script: answer every prompt with a single step of text"""
+    return [FakeStep(text=f"done: {prompt}")]
+
+
+class FakeScrapybara:
+    """Drop-in replacement for `scrapybara.Scrapybara` as used by `Swarm`.
+
+    The orchestrator (any act call with `OrchestratorSchema`) gets `plans` in order, then
+    an empty plan that ends the run. Other act calls run the steps `script` returns for
+    the latest prompt, calling the real tools against a `FakeInstance`, and get their
+    structured output from `outputs`.
+
+    `latency` is slept per model call and `start_latency` per started instance. Each model
+    call fails with an ApiError of `failure_status` with probability `failure_rate`, and
+    always for prompts in `fail_on`.
+    """
+
+    def __init__(
+        self,
+        plans: List[OrchestratorSchema] = (),
+        script: Callable[[str], List[FakeStep]] = echo_script,
+        outputs: List[Any] = (),
+        latency: float = 0.0,
+        start_latency: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_status: int = 500,
+        fail_on: Collection[str] = (),
+        seed: int = 0,
+    ):
+        self.plans = list(plans)
+        self.script = script
+        self.outputs = list(outputs)
+        self.latency = latency
+        self.start_latency = start_latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.fail_on = set(fail_on)
+        self.random = random.Random(seed)
+        self.instances: List[FakeInstance] = []
+        self.prompts: List[str] = []  # Latest prompt of every worker act call
+        self.act_calls = 0
+        self.model_calls = 0
+        self._lock = threading.Lock()
+
+    def start_ubuntu(self, **kwargs) -> FakeInstance:
+        time.sleep(self.start_latency)
+        instance = FakeInstance(f"fake-{uuid.uuid4().hex[:8]}")
+        with self._lock:
+            self.instances.append(instance)
+        return instance
+
+    def get_instances(self, **kwargs) -> List[FakeInstance]:
+        with self._lock:
+            return list(self.instances)
+
+    def _model_call(self, prompt: str) -> None:
+        """Simulate the latency and failures of one request to the model"""
+        with self._lock:
+            self.model_calls += 1
+            failed = self.random.random() < self.failure_rate or prompt in self.fail_on
+        time.sleep(self.latency)
+        if failed:
+            raise ApiError(status_code=self.failure_status, body="injected failure")
+
+    def _output(self, prompt: str, schema: Any) -> Any:
+        with self._lock:
+            if schema is OrchestratorSchema:
+                if self.plans:
+                    return self.plans.pop(0)
+                return OrchestratorSchema(overall_task=prompt, task_assignments=[], execution_notes="")
+            return self.outputs.pop(0) if self.outputs else None
+
+    def act(self, model, tools, system, prompt=None, messages=None, schema=None, on_step=None, **kwargs) -> ActResponse:
+        messages = list(messages or [])
+        if prompt is not None and not messages:
+            messages.append(UserMessage(content=[TextPart(text=prompt)]))
+        user_messages = [m for m in messages if isinstance(m, UserMessage)]
+        prompt = user_messages[-1].content[0].text if user_messages else ""
+        with self._lock:
+            self.act_calls += 1
+            if schema is not OrchestratorSchema:
+                self.prompts.append(prompt)
+
+        scripted = [FakeStep(text="plan")] if schema is OrchestratorSchema else list(self.script(prompt))
+        output = None
+
+        tools_by_name = {tool.name: tool for tool in tools}
+        steps = []
+        for i, scripted_step in enumerate(scripted):
+            self._model_call(prompt)
+            if schema and i == len(scripted) - 1:
+                # Taken only once the call gets this far, so a failed call doesn't use up a plan
+                output = self._output(prompt, schema)
+                scripted_step = scripted_step.model_copy(update={
+                    "tool_calls": scripted_step.tool_calls + [("structured_output", output.model_dump() if output else {})]
+                })
+            prompt_tokens = estimate_tokens(messages)
+            completion_tokens = len(scripted_step.text) // 4 + 1
+            tool_calls = [
+                ToolCallPart(tool_call_id=f"call-{uuid.uuid4().hex[:8]}", tool_name=name, args=args)
+                for name, args in scripted_step.tool_calls
+            ]
+            step = Step(
+                text=scripted_step.text,
+                tool_calls=tool_calls or None,
+                usage=TokenUsage(
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    total_tokens=prompt_tokens + completion_tokens,
                 ),
-                finish_reason="stop",
-                index=0,
             )
-        ],
-    )
-
-
-class MockOpenAIClient:
-    def __init__(self):
-        self.chat = MagicMock()
-        self.chat.completions = MagicMock()
-
-    def set_response(self, response: ChatCompletion):
-        """
-        Set the mock to return a specific response.
-        :param response: A ChatCompletion response to return.
-        """
-        self.chat.completions.create.return_value = response
-
-    def set_sequential_responses(self, responses: list[ChatCompletion]):
-        """
-        Set the mock to return different responses sequentially.
-        :param responses: A list of ChatCompletion responses to return in order.
-        """
-        self.chat.completions.create.side_effect = responses
-
-    def assert_create_called_with(self, **kwargs):
-        self.chat.completions.create.assert_called_with(**kwargs)
-
-
-# Initialize the mock client
-client = MockOpenAIClient()
-
-# Set a sequence of mock responses
-client.set_sequential_responses(
-    [
-        create_mock_response(
-            {"role": "assistant", "content": "First response"},
-            [
-                {
-                    "name": "process_refund",
-                    "args": {"item_id": "item_123", "reason": "too expensive"},
-                }
-            ],
-        ),
-        create_mock_response({"role": "assistant", "content": "Second"}),
-    ]
-)
+            messages.append(AssistantMessage(
+                content=([TextPart(text=step.text)] if step.text else []) + tool_calls
+            ))
+            if tool_calls:
+                step.tool_results = [self._call_tool(tools_by_name, part) for part in tool_calls]
+                messages.append(ToolMessage(content=step.tool_results))
+            if on_step:
+                on_step(step)
+            steps.append(step)
+
+        return ActResponse(
+            messages=messages,
+            steps=steps,
+            text=steps[-1].text if steps else None,
+            output=output,
+            usage=TokenUsage(
+                prompt_tokens=sum(s.usage.prompt_tokens for s in steps),
+                completion_tokens=sum(s.usage.completion_tokens for s in steps),
+                total_tokens=sum(s.usage.total_tokens for s in steps),
+            ),
+        )
 
-# This should return the first mock response
-first_response = client.chat.completions.create()
-print(
-    first_response.choices[0].message
-)  # Outputs: role='agent' content='First response'
-
-# This should return the second mock response
-second_response = client.chat.completions.create()
-print(
-    second_response.choices[0].message
-)  # Outputs: role='agent' content='Second response'
+    @staticmethod
+    def _call_tool(tools_by_name: Dict[str, Any], part: ToolCallPart) -> ToolResultPart:
+        if part.tool_name == "structured_output":
+            return ToolResultPart(tool_call_id=part.tool_call_id, tool_name=part.tool_name, result=part.args)
+        try:
+            result = tools_by_name[part.tool_name](**part.args)
+            return ToolResultPart(tool_call_id=part.tool_call_id, tool_name=part.tool_name, result=result)
+        except Exception as e:
+            return ToolResultPart(tool_call_id=part.tool_call_id, tool_name=part.tool_name, result=str(e), is_error=True)
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from scrapybara.types.act import ActResponse, AssistantMessage, Step, TextPart
+
+from swarm import Swarm, Agent
+from swarm.tools import OrchestratorSchema
+
+
+class FakeClient:
+    """Returns scripted orchestrator plans and echoes prompts for worker agents"""
+
+    def __init__(self, plans, barrier=None):
+        self.plans = list(plans)
+        self.barrier = barrier
+        self.instance = MagicMock(id="instance-1", status="running")
+        self.start_ubuntu = MagicMock(return_value=self.instance)
+        self.get_instances = MagicMock(return_value=[self.instance])
+        self.prompts = []
+
+    def act(self, model, tools, system, messages, schema=None, on_step=None, **kwargs):
+        prompt = messages[-1].content[0].text
+        if schema is OrchestratorSchema:
+            output = self.plans.pop(0) if self.plans else OrchestratorSchema(
+                overall_task=prompt, task_assignments=[], execution_notes=""
+            )
+            text = "plan"
+        else:
+            self.prompts.append(prompt)
+            if self.barrier:
+                self.barrier.wait()
+            output, text = None, f"done: {prompt}"
+        step = Step(text=text)
+        if on_step:
+            on_step(step)
+        return ActResponse(
+            messages=list(messages) + [AssistantMessage(content=[TextPart(text=text)])],
+            steps=[step],
+            text=text,
+            output=output,
+        )
+
+
+def make_plan(*assignments):
+    return OrchestratorSchema(
+        overall_task="task",
+        task_assignments=[
+            OrchestratorSchema.TaskAssignment(
+                id=f"t{i}", agent_name=name, prompt=prompt, priority=priority
+            )
+            for i, (name, prompt, priority) in enumerate(assignments)
+        ],
+        execution_notes="",
+    )
+
+
+def make_swarm(client, names=("Alice", "Bob"), **kwargs):
+    agents = [Agent(name="Orchestrator", orchestrator=True, on_step=lambda step: None)]
+    agents += [Agent(name=name, on_step=lambda step: None) for name in names]
+    return Swarm(agents, client=client, **kwargs), agents[0]
+
+
+def test_assignments_run_concurrently():
+    # Both workers must be inside client.act at the same time to pass the barrier
+    client = FakeClient(
+        [make_plan(("Alice", "open firefox", 1), ("Bob", "open terminal", 1))],
+        barrier=threading.Barrier(2, timeout=5),
+    )
+    swarm, orchestrator = make_swarm(client)
+
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert sorted(r.text for r in response.results) == ["done: open firefox", "done: open terminal"]
+    assert all(r.error is None for r in response.results)
+    # plan, two workers, final empty plan
+    assert len(response.steps) == 4
+    # Every agent shares one instance, which must only be started once
+    client.start_ubuntu.assert_called_once()
+    assert swarm.instances == {}
+
+    # The instance stays warm for the next run
+    swarm.run(orchestrator, prompt="do more things")
+    client.start_ubuntu.assert_called_once()
+    client.instance.stop.assert_not_called()
+
+
+def test_more_agents_than_default_executor_threads_run_at_once():
+    from tests.mock_client import FakeScrapybara
+
+    # asyncio's default executor has min(32, cpus + 4) threads
+    n = min(32, (os.cpu_count() or 1) + 4) + 3
+    names = [f"Agent{i}" for i in range(n)]
+    client = FakeScrapybara([make_plan(*((name, name, 1) for name in names))], latency=0.3)
+    swarm, orchestrator = make_swarm(client, names=names, max_concurrency=n)
+
+    start = time.perf_counter()
+    response = swarm.run(orchestrator, prompt="do things")
+    elapsed = time.perf_counter() - start
+    swarm.close()
+
+    assert len(response.results) == n and not any(r.error for r in response.results)
+    # Two planning calls and one round of agents, rather than two rounds of agents
+    assert elapsed < 3 * 0.3 + 0.25
+
+
+def test_concurrency_cap_orders_by_priority():
+    client = FakeClient([make_plan(("Alice", "low", 1), ("Bob", "high", 5))])
+    swarm, orchestrator = make_swarm(client)
+
+    response = swarm.run(orchestrator, prompt="do things", max_concurrency=1)
+
+    assert client.prompts == ["high", "low"]
+    assert response.output.task_assignments == []
+
+
+def test_arun_rejects_invalid_plan_and_respects_max_turns():
+    client = FakeClient([
+        make_plan(("Mallory", "hack", 1)),
+        make_plan(("Alice", "fixed", 1)),
+        make_plan(("Alice", "never", 1)),
+    ])
+    swarm, orchestrator = make_swarm(client)
+
+    response = asyncio.run(swarm.arun(orchestrator, prompt="do things", max_turns=2))
+
+    # The rejected plan never reaches a worker and is sent back to the orchestrator
+    assert "unknown agent Mallory" in response.messages[2].content[0].text
+    assert client.prompts == ["fixed"]
+    assert [r.task_id for r in response.results] == ["t0"]
+    assert "t0 (Alice): done: fixed" in response.messages[-1].content[0].text
+
+
+def test_run_requires_orchestrator():
+    swarm, _ = make_swarm(FakeClient([]))
+    with pytest.raises(ValueError):
+        swarm.run(swarm.agents[1], prompt="do things")
+
+
+@pytest.mark.parametrize("max_concurrency", [0, -1])
+def test_max_concurrency_must_be_positive(max_concurrency):
+    with pytest.raises(ValueError):
+        make_swarm(FakeClient([]), max_concurrency=max_concurrency)
+
+    client = FakeClient([make_plan(("Alice", "open firefox", 1))])
+    swarm, orchestrator = make_swarm(client)
+    with pytest.raises(ValueError):
+        swarm.run(orchestrator, prompt="do things", max_concurrency=max_concurrency)
+    # Rejected before anything was sent
+    assert client.prompts == []
+
+
+def test_orchestrator_prompt_is_stable_until_the_roster_changes():
+    client = FakeClient([make_plan(("Alice", "open firefox", 1))])
+    swarm, orchestrator = make_swarm(client)
+    system = orchestrator.system
+    assert system.endswith("<AGENTS>\n  - Alice: None\n  - Bob: None\n</AGENTS>")
+
+    # Plans overwrite agent prompts, which must not change the prompt the orchestrator is sent
+    swarm.run(orchestrator, prompt="do things")
+    assert swarm._get_agent("Alice").prompt == "open firefox"
+    assert orchestrator.system is system
+
+    swarm.agents.append(Agent(name="Carol", prompt="Writes reports", on_step=lambda step: None))
+    swarm.run(orchestrator, prompt="do more things")
+    assert orchestrator.system.endswith("  - Alice: None\n  - Bob: None\n  - Carol: Writes reports\n</AGENTS>")
+    assert swarm.bus.pending("Carol") == 0
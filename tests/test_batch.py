@@ -0,0 +1,72 @@
+import asyncio
+
+from swarm.tools import OrchestratorSchema
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import make_plan, make_swarm
+
+
+class PlanPerPrompt(FakeScrapybara):
+    """Plans one assignment for Alice per task prompt, then ends the task"""
+
+    def _output(self, prompt, schema):
+        if schema is not None and prompt.startswith("task"):
+            return make_plan(("Alice", f"work on {prompt}", 1))
+        return super()._output(prompt, schema)
+
+
+def test_batch_isolates_tasks_and_shares_instances():
+    client = PlanPerPrompt(latency=0.01)
+    swarm, orchestrator = make_swarm(client)
+    prompts = [f"task {i}" for i in range(8)]
+
+    results = list(swarm.run_batch(prompts, concurrency=3))
+
+    assert sorted(r.index for r in results) == list(range(8))
+    for result in results:
+        assert result.error is None and result.seconds > 0
+        assert [r.text for r in result.response.results] == [f"done: work on {result.prompt}"]
+    # The swarm's own agents were never touched
+    assert orchestrator.prompt is None
+    assert swarm._get_agent("Alice").messages == []
+    # At most one instance per concurrent task, reused by later tasks
+    assert len(client.instances) <= 3
+    assert swarm.metrics.to_prometheus().count("swarm_batch_task_seconds_count") == 1
+
+
+def test_batch_orchestrators_keep_the_roles_of_earlier_runs():
+    systems = []
+
+    class RecordingSystems(PlanPerPrompt):
+        def act(self, model, tools, system, schema=None, **kwargs):
+            if schema is OrchestratorSchema:
+                systems.append(system)
+            return super().act(model, tools, system, schema=schema, **kwargs)
+
+    client = RecordingSystems(plans=[make_plan(("Alice", "open hn", 1))])
+    swarm, orchestrator = make_swarm(client)
+    swarm.run(orchestrator, prompt="browse")
+    assert swarm._get_agent("Alice").prompt == "open hn"
+
+    list(swarm.run_batch(["task 0", "task 1"], concurrency=2))
+    assert set(systems) == {orchestrator.system}
+    assert "Alice: None" in orchestrator.system
+
+
+def test_batch_reports_failures_without_aborting():
+    client = PlanPerPrompt(fail_on={"task 1"}, failure_status=500)
+    swarm, _ = make_swarm(client)
+
+    results = sorted(swarm.run_batch(["task 0", "task 1", "task 2"], concurrency=2), key=lambda r: r.index)
+
+    assert [r.error for r in results] == [None, "ApiError: status_code: 500, body: injected failure", None]
+    assert results[1].response is None
+    assert 'swarm_batch_failures_total 1' in swarm.metrics.to_prometheus()
+
+
+def test_async_batch_yields_results_as_they_finish():
+    swarm, _ = make_swarm(PlanPerPrompt())
+
+    async def collect():
+        return [r.index async for r in swarm.arun_batch([f"task {i}" for i in range(4)], concurrency=4)]
+
+    assert sorted(asyncio.run(collect())) == [0, 1, 2, 3]
@@ -0,0 +1,18 @@
+from benchmarks.bench_import import FORBIDDEN, measure
+from benchmarks.bench_orchestration import bench_memory, bench_overhead, bench_throughput
+
+
+def test_benchmarks_run():
+    # Tiny sizes, just to keep the suite from rotting
+    assert bench_overhead(tasks=4, agents=2)["act_calls"] == 6
+    rows = bench_throughput(sizes=(1, 2), tasks_per_agent=1, latency=0.0)
+    assert [row["tasks"] for row in rows] == [1, 2]
+    unbounded, compacted = bench_memory(turns=5), bench_memory(turns=5, context_budget=200)
+    assert unbounded["history_messages"] == 20
+    assert compacted["history_messages"] < unbounded["history_messages"]
+
+
+def test_imports_stay_lazy():
+    # Timings are too noisy for the suite, but which modules get loaded is not
+    for statement in FORBIDDEN:
+        assert measure(statement, runs=1)["forbidden_loaded"] == []
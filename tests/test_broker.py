@@ -0,0 +1,144 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from swarm.broker import Broker, QueueBroker, SQLiteBroker, WorkItem, WorkUpdate
+from swarm.tools import OrchestratorSchema
+from swarm.worker import Worker
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan, make_swarm
+
+
+def script(prompt):
+    if prompt == "hand off":
+        handoff = {"reason": "needs a browser", "task_description": "Open the docs", "suggested_agent": "Bob"}
+        return [FakeStep(tool_calls=[("handoff", handoff)]), FakeStep(text="handed off")]
+    return [
+        FakeStep(text="looking", tool_calls=[("bash", {"command": f"echo {prompt}"})]),
+        FakeStep(text=f"done: {prompt}"),
+    ]
+
+
+def start_workers(path, count):
+    stop = threading.Event()
+    clients, threads = [], []
+    for _ in range(count):
+        client = FakeScrapybara(script=script)
+        swarm, _ = make_swarm(client)
+        worker = Worker(swarm, SQLiteBroker(path))
+        thread = threading.Thread(target=worker.run, kwargs={"stop": stop, "poll": 0.05}, daemon=True)
+        thread.start()
+        clients.append(client)
+        threads.append(thread)
+    return stop, clients, threads
+
+
+def test_sqlite_broker_hands_out_highest_priority_first_and_requeues_expired_leases(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "broker.sqlite"), lease_seconds=0.2)
+    for i, priority in enumerate([1, 3, 2]):
+        assignment = OrchestratorSchema.TaskAssignment(id=f"t{i}", agent_name="Alice", prompt="p", priority=priority)
+        broker.submit(WorkItem(id=f"t{i}", agent_name="Alice", assignment=assignment))
+
+    assert [broker.fetch(timeout=0).id for _ in range(3)] == ["t1", "t2", "t0"]
+    assert broker.fetch(timeout=0) is None
+    broker.publish(WorkUpdate(item_id="t1", kind="result"))
+    time.sleep(0.25)
+    # t1 has its result, the workers of the others may have died
+    assert sorted(broker.fetch(timeout=0).id for _ in range(2)) == ["t0", "t2"]
+    assert [u.item_id for u in broker.updates(timeout=0)] == ["t1"]
+    assert broker.updates(timeout=0) == []
+
+
+def test_sqlite_broker_drops_updates_under_an_expired_lease(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "broker.sqlite"), lease_seconds=0.4)
+    broker.submit(WorkItem(id="t0", agent_name="Alice"))
+    slow = broker.fetch(timeout=0)
+
+    # Steps renew the lease of a slow but healthy worker
+    time.sleep(0.25)
+    broker.publish(WorkUpdate(item_id="t0", kind="step", lease=slow.lease))
+    time.sleep(0.25)
+    assert broker.fetch(timeout=0) is None
+
+    # Once it expires, the item goes to another worker and the slow worker's updates are stale
+    time.sleep(0.3)
+    fast = broker.fetch(timeout=0)
+    assert fast.lease != slow.lease
+    broker.publish(WorkUpdate(item_id="t0", kind="result", data={"text": "fast"}, lease=fast.lease))
+    broker.publish(WorkUpdate(item_id="t0", kind="result", data={"text": "slow"}, lease=slow.lease))
+    assert [(u.kind, u.data.get("text")) for u in broker.updates(timeout=0)] == [("step", None), ("result", "fast")]
+    broker.close()
+
+
+def test_brokers_must_implement_the_transport():
+    class Partial(Broker):
+        def submit(self, item):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_workers_run_assignments_and_stream_steps_back(tmp_path):
+    path = str(tmp_path / "broker.sqlite")
+    coordinator_client = FakeScrapybara([make_plan(("Alice", "a", 1), ("Bob", "b", 1), ("Alice", "hand off", 1))])
+    swarm, orchestrator = make_swarm(coordinator_client, broker=SQLiteBroker(path))
+    steps = []
+    swarm._get_agent("Alice").on_step = steps.append
+    stop, clients, threads = start_workers(path, 2)
+    try:
+        response = swarm.run(orchestrator, prompt="do things")
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(5)
+
+    assert [r.text for r in response.results] == ["done: a", "done: b", "handed off"]
+    assert [s.text for s in response.results[0].steps] == ["looking", "done: a"]
+    assert response.results[0].steps[0].tool_results[0].result["output"] == "a\n"
+    assert [s.text for s in steps] == ["looking", "done: a", "", "handed off"]
+    # The workers did all the agent work, the coordinator only planned
+    assert coordinator_client.prompts == []
+    assert sorted(p for client in clients for p in client.prompts) == ["a", "b", "hand off"]
+    # Worker-side history and handoffs come back to the coordinator
+    assert len(swarm._get_agent("Alice").messages) > 2
+    results_prompt = next(
+        m.content[0].text for m in response.messages if m.role == "user" and "<RESULTS>" in m.content[0].text
+    )
+    assert "Open the docs" in results_prompt
+    assert response.usage.agents["Bob"].output_tokens > 0
+
+
+def test_worker_errors_fail_the_assignment(tmp_path):
+    path = str(tmp_path / "broker.sqlite")
+    swarm, orchestrator = make_swarm(FakeScrapybara([make_plan(("Alice", "a", 1))]), broker=SQLiteBroker(path))
+    client = FakeScrapybara(script=script, fail_on={"a"}, failure_status=429)
+    worker_swarm, _ = make_swarm(client)
+    thread = threading.Thread(target=Worker(worker_swarm, SQLiteBroker(path)).run, kwargs={"max_items": 1, "poll": 0.05})
+    thread.start()
+    response = swarm.run(orchestrator, prompt="do things")
+    thread.join(5)
+
+    assert response.results[0].error == "Error 429: injected failure"
+
+
+def worker_process(broker):
+    swarm, _ = make_swarm(FakeScrapybara(script=script))
+    Worker(swarm, broker).run(max_items=2, poll=0.1)
+
+
+def test_queue_broker_with_worker_process():
+    broker = QueueBroker(multiprocessing.get_context("spawn"))
+    process = multiprocessing.get_context("spawn").Process(target=worker_process, args=(broker,))
+    process.start()
+    swarm, orchestrator = make_swarm(FakeScrapybara([make_plan(("Alice", "a", 1), ("Bob", "b", 1))]), broker=broker)
+    try:
+        response = swarm.run(orchestrator, prompt="do things")
+    finally:
+        process.join(30)
+        broker.close()
+
+    assert [r.text for r in response.results] == ["done: a", "done: b"]
+    assert process.exitcode == 0
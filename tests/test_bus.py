@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from swarm.bus import BROADCAST, AgentMessage, MessageBus
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan, make_swarm
+
+
+def message(sender="Alice", recipient="Bob", priority=1, key=None, text=""):
+    return AgentMessage(sender=sender, recipient=recipient, priority=priority, key=key, content={"text": text})
+
+
+def test_messages_are_received_by_priority_then_order():
+    bus = MessageBus(["Alice", "Bob"])
+    for priority, text in [(1, "low"), (5, "high"), (1, "low again"), (3, "medium")]:
+        bus.send(message(priority=priority, text=text))
+
+    assert [m.content["text"] for m in bus.drain("Bob")] == ["high", "medium", "low", "low again"]
+    assert bus.pending() == 0
+
+
+def test_duplicates_are_coalesced_and_keep_the_highest_priority():
+    bus = MessageBus(["Alice", "Bob"])
+    assert bus.send(message(key="k", text="first")) == 1
+    bus.send(message(priority=2, text="other"))
+    assert bus.send(message(key="k", priority=3, text="again")) == 0
+
+    received = bus.drain("Bob")
+    assert [(m.content["text"], m.priority) for m in received] == [("first", 3), ("other", 2)]
+    assert bus.coalesced == 1
+    # Once received, the same key can be sent again
+    assert bus.send(message(key="k")) == 1
+
+
+def test_broadcast_reaches_everyone_but_the_sender():
+    bus = MessageBus(["Alice", "Bob", "Carol"])
+    assert bus.send(message(recipient=BROADCAST)) == 2
+    assert (bus.pending("Alice"), bus.pending("Bob"), bus.pending("Carol")) == (0, 1, 1)
+    with pytest.raises(ValueError):
+        bus.send(message(recipient="Dave"))
+
+
+def test_receive_blocks_until_a_message_arrives():
+    bus = MessageBus(["Alice", "Bob"])
+    assert bus.receive("Bob", timeout=0.05) is None
+
+    timer = threading.Timer(0.05, bus.send, [message(text="hi")])
+    timer.start()
+    start = time.monotonic()
+    assert bus.receive("Bob", timeout=5).content["text"] == "hi"
+    assert time.monotonic() - start < 1
+
+
+def test_areceive_waits_without_blocking_the_loop():
+    bus = MessageBus(["Alice", "Bob"])
+
+    async def main():
+        assert await bus.areceive("Bob", timeout=0.05) is None
+        receiver = asyncio.create_task(bus.areceive("Bob", timeout=5))
+        await asyncio.sleep(0.01)
+        # Sent from another thread while the loop keeps running
+        await asyncio.to_thread(bus.send, message(text="hi"))
+        return await receiver
+
+    assert asyncio.run(main()).content["text"] == "hi"
+
+
+def test_handoff_requests_reach_the_orchestrator():
+    def script(prompt):
+        handoff = {"reason": "needs a browser", "task_description": "Open the docs", "suggested_agent": "Bob"}
+        # Asking twice only queues one request
+        return [FakeStep(tool_calls=[("handoff", handoff), ("handoff", handoff)]), FakeStep(text="handed off")]
+
+    client = FakeScrapybara([make_plan(("Alice", "read the docs", 4))], script=script)
+    swarm, orchestrator = make_swarm(client)
+
+    response = swarm.run(orchestrator, prompt="read the docs")
+
+    results_prompt = next(m.content[0].text for m in response.messages if m.role == "user" and "<RESULTS>" in m.content[0].text)
+    assert "<HANDOFF_REQUESTS>" in results_prompt
+    assert results_prompt.count("From Alice (task t0, priority 4): Open the docs") == 1
+    assert "Suggested agent: Bob" in results_prompt
+    assert swarm.bus.pending() == 0
+
+
+def test_agents_message_each_other():
+    scripts = {
+        "ping": [FakeStep(tool_calls=[("message", {"action": "send", "to": "Bob", "text": "ping"})]), FakeStep(text="sent")],
+        "pong": [FakeStep(tool_calls=[("message", {"action": "receive", "timeout": 5})]), FakeStep(text="received")],
+    }
+    client = FakeScrapybara([make_plan(("Alice", "ping", 1), ("Bob", "pong", 1))], script=lambda prompt: scripts[prompt])
+    swarm, orchestrator = make_swarm(client)
+
+    response = swarm.run(orchestrator, prompt="play")
+
+    received = response.results[1].steps[0].tool_results[0].result
+    assert received == {"status": "success", "from": "Alice", "type": "message", "content": {"text": "ping"}}
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from scrapybara.anthropic import Anthropic
+from scrapybara.tools import Tool
+
+from swarm.cache import CachedTool, PlanCache, ToolCallCache, is_read_only_command
+from swarm.tools import HandoffTool, MessageTool
+from tests.test_arun import FakeClient, make_plan, make_swarm
+
+
+def test_plan_cache_lru_and_ttl(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), max_entries=2, ttl=60)
+    plan = make_plan(("Alice", "a", 1))
+    for key in ("a", "b"):
+        cache.put(key, plan)
+    assert cache.get("a") == plan
+    cache.put("c", plan)
+
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 2}
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_plan_cache_key_depends_on_task_roster_and_model():
+    key = PlanCache.key("task", "roster", Anthropic())
+    assert key == PlanCache.key("task", "roster", Anthropic())
+    assert key != PlanCache.key("other task", "roster", Anthropic())
+    assert key != PlanCache.key("task", "other roster", Anthropic())
+    assert key != PlanCache.key("task", "roster", Anthropic(name="claude-3-5-sonnet-20241022"))
+
+
+def test_repeated_task_skips_planning(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite"))
+    client = FakeClient([make_plan(("Alice", "open firefox", 1))])
+    swarm, orchestrator = make_swarm(client, plan_cache=cache)
+
+    first = swarm.run(orchestrator, prompt="do things")
+    # A second run plans nothing new: the only orchestrator call is the final check
+    client.plans = []
+    second = swarm.run(orchestrator, prompt="do things")
+
+    assert cache.stats()["hits"] == 1
+    assert second.results[0].text == first.results[0].text == "done: open firefox"
+    assert len(second.steps) == len(first.steps) - 1
+
+    swarm.run(orchestrator, prompt="do things", bypass_plan_cache=True)
+    assert cache.stats()["hits"] == 1
+
+
+class CountingTool(Tool):
+    calls: int = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        return f"{self.name} {self.calls}"
+
+
+@pytest.mark.parametrize(
+    "command, read_only",
+    [
+        ("ls -la /tmp", True),
+        ("cat a.txt | grep foo | wc -l", True),
+        ("git status && git log -n 3", True),
+        ("git checkout main", False),
+        ("ls > files.txt", False),
+        ("cat $(which python)", False),
+        ("find . -name '*.pyc' -delete", False),
+        ("rm -rf build", False),
+        ("sleep 5; cat log.txt", False),
+        ("grep 'unterminated", False),
+        ("env rm -rf /tmp/x", False),
+        ("find . -fprint0 out", False),
+        ("git diff --output=/tmp/p", False),
+        ("git log -p --output x", False),
+        ("git diff --stat", True),
+    ],
+)
+def test_is_read_only_command(command, read_only):
+    assert is_read_only_command(command) is read_only
+
+
+def test_tool_cache_memoizes_reads_and_invalidates_on_writes():
+    cache = ToolCallCache()
+    bash = CountingTool(name="bash")
+    tool = cache.wrap(bash, "i-1")
+
+    assert tool(command="ls") == tool(command="ls") == "bash 1"
+    # Another instance has its own cache
+    assert cache.wrap(bash, "i-2")(command="ls") == "bash 2"
+
+    tool(command="touch new.txt")
+    assert tool(command="ls") == "bash 4"
+    assert cache.stats() == {"hits": 1, "misses": 3, "hit_rate": 0.25, "invalidations": 1}
+
+
+def test_tool_cache_classifies_editor_computer_and_declared_tools():
+    cache = ToolCallCache(read_only={"lookup"})
+    assert cache.classify("str_replace_editor", {"command": "view", "path": "a"}) == "read"
+    assert cache.classify("str_replace_editor", {"command": "create", "path": "a"}) == "write"
+    assert cache.classify("computer", {"action": "take_screenshot"}) == "volatile"
+    assert cache.classify("computer", {"action": "left_click"}) == "write"
+    assert cache.classify("lookup", {}) == "read"
+    assert cache.classify("custom", {}) == "write"
+
+
+def test_swarm_wraps_agent_tools():
+    swarm, _ = make_swarm(FakeClient([]), tool_cache=ToolCallCache())
+    tools = swarm._setup_agent_tools(swarm.agents[1], swarm.pool.lease())
+    # Coordination tools don't touch the instance, so they bypass the cache
+    assert [type(t._tool) for t in tools] == [CachedTool] * 3 + [HandoffTool, MessageTool]
+    assert [t.name for t in tools] == ["bash", "computer", "str_replace_editor", "handoff", "message"]
@@ -0,0 +1,90 @@
+import pytest
+from scrapybara.types.act import TextPart, ToolMessage, ToolResultPart, UserMessage
+
+from swarm.cassette import CassetteMiss, RecordingClient, ReplayClient, request_key
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan, make_swarm
+
+
+def script(prompt):
+    return [
+        FakeStep(text="looking", tool_calls=[("bash", {"command": f"echo {prompt}"}), ("computer", {"action": "take_screenshot"})]),
+        FakeStep(text=f"done: {prompt}"),
+    ]
+
+
+def record(path, **client_kwargs):
+    client = FakeScrapybara(
+        [make_plan(("Alice", "a", 1), ("Bob", "b", 1)), make_plan(("Alice", "c", 1))], script=script, **client_kwargs
+    )
+    with RecordingClient(client, str(path)) as recorder:
+        swarm, orchestrator = make_swarm(recorder)
+        response = swarm.run(orchestrator, prompt="do things")
+    return client, response
+
+
+def test_replay_serves_recorded_session(tmp_path):
+    path = tmp_path / "run.jsonl"
+    live_client, live = record(path)
+
+    replay = ReplayClient(str(path))
+    swarm, orchestrator = make_swarm(replay)
+    steps = []
+    swarm._get_agent("Alice").on_step = steps.append
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert [(r.agent_name, r.text) for r in response.results] == [(r.agent_name, r.text) for r in live.results]
+    assert [s.text for s in steps] == ["looking", "done: a", "looking", "done: c"]
+    assert steps[0].tool_results[0].result["output"] == "a\n"
+    assert response.usage.total.total_tokens == live.usage.total.total_tokens
+    assert replay.remaining() == 0
+    # Nothing reached a live client or instance
+    assert live_client.act_calls == 6
+    assert all(instance.id.startswith("replay-") for instance in replay.instances)
+
+
+def test_replay_raises_on_unrecorded_requests(tmp_path):
+    path = tmp_path / "run.jsonl"
+    record(path)
+
+    swarm, orchestrator = make_swarm(ReplayClient(str(path)))
+    with pytest.raises(CassetteMiss):
+        swarm.run(orchestrator, prompt="do other things")
+
+
+def test_api_errors_are_replayed(tmp_path):
+    path = tmp_path / "run.jsonl"
+    _, live = record(path, fail_on={"b"}, failure_status=429)
+
+    swarm, orchestrator = make_swarm(ReplayClient(str(path)))
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert [r.error for r in response.results] == [r.error for r in live.results]
+    assert response.results[1].error == "Error 429: injected failure"
+
+
+def test_request_key_ignores_screenshots_and_api_keys():
+    def messages(image):
+        return [
+            UserMessage(content=[TextPart(text="hi")]),
+            ToolMessage(content=[ToolResultPart(tool_call_id="1", tool_name="computer", result={"base_64_image": image})]),
+        ]
+
+    class Model:
+        provider, name = "anthropic", "claude"
+
+        def __init__(self, api_key):
+            self.api_key = api_key
+
+    assert request_key(Model("k1"), [], "system", messages("AAAA")) == request_key(Model("k2"), [], "system", messages("BBBB"))
+    assert request_key(Model("k1"), [], "system", messages("AAAA")) != request_key(Model("k1"), [], "other", messages("AAAA"))
+
+
+def test_zstd_cassettes(tmp_path):
+    pytest.importorskip("zstandard")
+    path = tmp_path / "run.jsonl.zst"
+    _, live = record(path)
+
+    swarm, orchestrator = make_swarm(ReplayClient(str(path)))
+    response = swarm.run(orchestrator, prompt="do things")
+    assert [r.text for r in response.results] == [r.text for r in live.results]
@@ -0,0 +1,95 @@
+import pytest
+from scrapybara.types.act import AssistantMessage
+
+from swarm.checkpoint import Journal, RunState
+from swarm.types import RESUME_PROMPT
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan, make_swarm
+
+
+class Crash(Exception):
+    """Stands in for the process dying mid-run"""
+
+
+def script(prompt):
+    if prompt == RESUME_PROMPT:
+        return [FakeStep(text="picked up where I left off")]
+    return [
+        FakeStep(text="looking", tool_calls=[("bash", {"command": f"echo {prompt}"})]),
+        FakeStep(text=f"done: {prompt}"),
+    ]
+
+
+def crash_on(text):
+    def on_step(step):
+        if step.text == text:
+            raise Crash()
+    return on_step
+
+
+def crashed_run(journal, client):
+    """Alice finishes "a", then the process dies while Bob is halfway through "b" """
+    swarm, orchestrator = make_swarm(client, journal=journal, max_concurrency=1)
+    swarm._get_agent("Bob").on_step = crash_on("done: b")
+    with pytest.raises(Crash):
+        swarm.run(orchestrator, prompt="do things", run_id="run-1")
+    return swarm
+
+
+def test_resume_continues_from_last_checkpoint(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    client = FakeScrapybara([make_plan(("Alice", "a", 2), ("Bob", "b", 1)), make_plan(("Alice", "c", 1))], script=script)
+    crashed = crashed_run(Journal(path), client)
+    journal = Journal(path)
+    assert journal.unfinished() == ["run-1"]
+
+    state = RunState.load(journal, "run-1")
+    assert state.turns == 1
+    assert list(state.finished_tasks) == ["t0"]
+    assert [s.text for s in state.partial_steps["t1"]] == ["looking", "done: b"]
+    client.prompts.clear()
+
+    swarm, _ = make_swarm(client, journal=journal)
+    response = swarm.resume("run-1")
+
+    # "a" is not run again and "b" continues after the steps it had journaled
+    assert client.prompts == [RESUME_PROMPT, "c"]
+    assert [(r.task_id, r.text) for r in response.results] == [
+        ("t0", "done: a"), ("t1", "picked up where I left off"), ("t0", "done: c"),
+    ]
+    assert [s.text for s in response.results[1].steps] == ["looking", "done: b", "picked up where I left off"]
+    bob = swarm._get_agent("Bob")
+    assert any(isinstance(m, AssistantMessage) and m.content[0].text == "done: b" for m in bob.messages)
+    assert response.run_id == "run-1"
+    assert journal.unfinished() == []
+    # The shared instance was reattached rather than started again
+    assert len(client.instances) == 1
+    crashed.close()
+
+
+def test_resume_after_crash_before_first_plan(tmp_path):
+    journal = Journal(str(tmp_path / "journal.sqlite"))
+    client = FakeScrapybara([make_plan(("Alice", "a", 1))], script=script)
+    swarm, orchestrator = make_swarm(client, journal=journal)
+    orchestrator.on_step = crash_on("plan")
+    with pytest.raises(Crash):
+        swarm.run(orchestrator, prompt="do things", run_id="run-1")
+
+    client.plans = [make_plan(("Alice", "a", 1))]
+    swarm, _ = make_swarm(client, journal=journal)
+    response = swarm.resume("run-1")
+    assert [r.text for r in response.results] == ["done: a"]
+
+
+def test_resume_rejects_finished_runs_and_swarms_without_journal(tmp_path):
+    journal = Journal(str(tmp_path / "journal.sqlite"))
+    swarm, orchestrator = make_swarm(FakeScrapybara(script=script), journal=journal)
+    run_id = swarm.run(orchestrator, prompt="do things").run_id
+
+    with pytest.raises(ValueError, match="already finished"):
+        swarm.resume(run_id)
+    with pytest.raises(ValueError, match="No journal records"):
+        swarm.resume("missing")
+    swarm, _ = make_swarm(FakeScrapybara())
+    with pytest.raises(ValueError, match="journal"):
+        swarm.resume(run_id)
@@ -0,0 +1,73 @@
+import pytest
+from scrapybara.types.act import AssistantMessage, TextPart, ToolCallPart, ToolMessage, ToolResultPart, UserMessage
+
+from swarm.compaction import IMAGE_TOKENS, Compactor, SummarizingCompactor, TruncatingCompactor, estimate_tokens
+from swarm.events import CompactionEvent
+from tests.test_arun import FakeClient, make_swarm
+
+
+def turn(i, output="x" * 400):
+    call = ToolCallPart(tool_call_id=f"c{i}", tool_name="bash", args={"command": f"echo {i}"})
+    result = ToolResultPart(tool_call_id=f"c{i}", tool_name="bash", result={"output": output})
+    return [AssistantMessage(content=[call]), ToolMessage(content=[result])]
+
+
+def history(turns):
+    messages = [UserMessage(content=[TextPart(text="the task")])]
+    for i in range(turns):
+        messages += turn(i)
+    return messages
+
+
+def test_estimate_tokens_counts_screenshots():
+    result = ToolResultPart(tool_call_id="c", tool_name="computer", result={"base_64_image": "a" * 100000})
+    assert estimate_tokens([ToolMessage(content=[result])]) < IMAGE_TOKENS + 10
+    assert estimate_tokens([UserMessage(content=[TextPart(text="a" * 400)])]) == 104
+
+
+def test_history_within_budget_is_untouched():
+    messages = history(2)
+    assert TruncatingCompactor().compact(messages, budget=10000) == (messages, None)
+
+
+def test_truncation_keeps_task_and_recent_turns():
+    messages = history(10)
+    compacted, compaction = TruncatingCompactor(keep_recent=4).compact(messages, budget=500)
+
+    assert compaction.tokens_before > 500 >= compaction.tokens_after
+    assert compaction.elided_messages == len(messages) - len(compacted)
+    assert compaction.summary == f"Tool calls made in them: bash x{compaction.elided_messages // 2}."
+    # The original task survives and the tail starts with a tool call, not an orphaned result
+    assert compacted[0].content[0].text == "the task"
+    assert "earlier messages were removed" in compacted[0].content[1].text
+    assert isinstance(compacted[1], AssistantMessage)
+    assert compacted[-4:] == messages[-4:]
+
+
+def test_keep_recent_wins_over_budget():
+    messages = history(10)
+    compacted, _ = SummarizingCompactor(lambda elided: "summary", keep_recent=6).compact(messages, budget=1)
+    assert compacted[-6:] == messages[-6:]
+    assert compacted[0].content[1].text.endswith("summary]")
+
+
+
+def test_compactors_must_implement_summarize():
+    class NoSummary(Compactor):
+        pass
+
+    with pytest.raises(TypeError):
+        NoSummary()
+
+
+def test_agents_compact_before_act():
+    client = FakeClient([])
+    swarm, orchestrator = make_swarm(client)
+    events = []
+    alice = swarm.agents[1]
+    alice.context_budget = 500
+
+    swarm.get_act_completion(alice, messages=history(10), prompt="next", on_event=events.append)
+
+    assert len(alice.compactions) == 1 and alice.compactions[0].agent_name == "Alice"
+    assert isinstance(events[0], CompactionEvent)
@@ -0,0 +1,74 @@
+from scrapybara.types.act import Step, ToolCallPart, ToolResultPart
+
+from swarm.convergence import ConvergenceMonitor, ConvergencePolicy
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan, make_swarm
+
+
+def looping_script(prompt):
+    """Alice keeps taking a screenshot and clicking the same spot, Bob gets his work done"""
+    if prompt == "loop":
+        cycle = [
+            FakeStep(tool_calls=[("computer", {"action": "take_screenshot"})]),
+            FakeStep(tool_calls=[("computer", {"action": "click_mouse", "button": "left", "coordinates": [10, 10]})]),
+        ]
+        return cycle * 20 + [FakeStep(text="gave up")]
+    return [FakeStep(text=f"done: {prompt}")]
+
+
+def step(command, output):
+    call = ToolCallPart(tool_call_id="c", tool_name="bash", args={"command": command})
+    return Step(text="", tool_calls=[call], tool_results=[ToolResultPart(tool_call_id="c", tool_name="bash", result={"output": output})])
+
+
+def test_monitor_detects_cycles_and_stalls():
+    monitor = ConvergenceMonitor(ConvergencePolicy(max_repeats=3, stall_steps=None))
+    outcomes = [monitor.check(step(command, "x")) for command in ["a", "b", "a", "b", "a", "b"]]
+    assert outcomes[:-1] == [None] * 5
+    assert outcomes[-1] == ("repeat", "repeated the same 2 steps 3 times")
+
+    # Different commands that keep producing the same output make no progress
+    monitor = ConvergenceMonitor(ConvergencePolicy(max_repeats=None, stall_steps=3))
+    outcomes = [monitor.check(step(f"poll {i}", "pending")) for i in range(4)]
+    assert outcomes == [None, None, None, ("no_progress", "no new results in 3 steps")]
+
+    # Steps that make progress and final text steps never count
+    monitor = ConvergenceMonitor(ConvergencePolicy(max_repeats=2, stall_steps=2))
+    assert all(monitor.check(step(f"ls {i}", str(i))) is None for i in range(10))
+    assert monitor.check(Step(text="done")) is None
+
+
+def test_looping_agent_is_escalated_to_the_orchestrator():
+    client = FakeScrapybara(plans=[make_plan(("Alice", "loop", 1), ("Bob", "b", 1))], script=looping_script)
+    swarm, orchestrator = make_swarm(client, convergence=ConvergencePolicy())
+
+    response = swarm.run(orchestrator, prompt="task")
+
+    alice, bob = response.results
+    assert alice.error == "Alice stopped: repeated the same 2 steps 4 times"
+    assert len(alice.steps) == 8
+    assert bob.error is None and response.stop_reason is None
+    # The orchestrator was told why
+    assert any("Alice stopped: repeated" in m.content[0].text for m in response.messages if m.role == "user")
+    assert swarm.metrics.get("swarm_stalls_total", agent="Alice", kind="repeat") == 1
+
+
+def test_stop_action_ends_the_run():
+    client = FakeScrapybara(plans=[make_plan(("Alice", "loop", 1)), make_plan(("Bob", "b", 1))], script=looping_script)
+    swarm, orchestrator = make_swarm(client, convergence=ConvergencePolicy(action="stop"))
+
+    response = swarm.run(orchestrator, prompt="task")
+
+    assert response.stop_reason == "Run stopped: Alice stopped: repeated the same 2 steps 4 times"
+    assert [r.agent_name for r in response.results] == ["Alice"]
+
+
+def test_repeated_plans_stop_the_run():
+    plan = make_plan(("Bob", "b", 1))
+    client = FakeScrapybara(plans=[plan] * 10)
+    swarm, orchestrator = make_swarm(client, convergence=ConvergencePolicy(max_plan_repeats=3))
+
+    response = swarm.run(orchestrator, prompt="task")
+
+    assert response.stop_reason == "Run stopped: the orchestrator emitted the same plan 3 times in a row"
+    assert len(response.results) == 2
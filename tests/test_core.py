@@ -1,145 +1,119 @@
-import pytest
+from pydantic import BaseModel
+from scrapybara.core.api_error import ApiError
+
 from swarm import Swarm, Agent
-from tests.mock_client import MockOpenAIClient, create_mock_response
-from unittest.mock import Mock
-import json
-
-DEFAULT_RESPONSE_CONTENT = "sample response content"
-
-
-@pytest.fixture
-def mock_openai_client():
-    m = MockOpenAIClient()
-    m.set_response(
-        create_mock_response({"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT})
-    )
-    return m
-
-
-def test_run_with_simple_message(mock_openai_client: MockOpenAIClient):
-    agent = Agent()
-    # set up client and run
-    client = Swarm(client=mock_openai_client)
-    messages = [{"role": "user", "content": "Hello, how are you?"}]
-    response = client.run(agent=agent, messages=messages)
-
-    # assert response content
-    assert response.messages[-1]["role"] == "assistant"
-    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
-
-
-def test_tool_call(mock_openai_client: MockOpenAIClient):
-    expected_location = "San Francisco"
-
-    # set up mock to record function calls
-    get_weather_mock = Mock()
-
-    def get_weather(location):
-        get_weather_mock(location=location)
-        return "It's sunny today."
-
-    agent = Agent(name="Test Agent", functions=[get_weather])
-    messages = [
-        {"role": "user", "content": "What's the weather like in San Francisco?"}
-    ]
-
-    # set mock to return a response that triggers function call
-    mock_openai_client.set_sequential_responses(
-        [
-            create_mock_response(
-                message={"role": "assistant", "content": ""},
-                function_calls=[
-                    {"name": "get_weather", "args": {"location": expected_location}}
-                ],
-            ),
-            create_mock_response(
-                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
-            ),
-        ]
-    )
-
-    # set up client and run
-    client = Swarm(client=mock_openai_client)
-    response = client.run(agent=agent, messages=messages)
-
-    get_weather_mock.assert_called_once_with(location=expected_location)
-    assert response.messages[-1]["role"] == "assistant"
-    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
-
-
-def test_execute_tools_false(mock_openai_client: MockOpenAIClient):
-    expected_location = "San Francisco"
-
-    # set up mock to record function calls
-    get_weather_mock = Mock()
-
-    def get_weather(location):
-        get_weather_mock(location=location)
-        return "It's sunny today."
-
-    agent = Agent(name="Test Agent", functions=[get_weather])
-    messages = [
-        {"role": "user", "content": "What's the weather like in San Francisco?"}
-    ]
-
-    # set mock to return a response that triggers function call
-    mock_openai_client.set_sequential_responses(
-        [
-            create_mock_response(
-                message={"role": "assistant", "content": ""},
-                function_calls=[
-                    {"name": "get_weather", "args": {"location": expected_location}}
-                ],
-            ),
-            create_mock_response(
-                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
-            ),
-        ]
-    )
-
-    # set up client and run
-    client = Swarm(client=mock_openai_client)
-    response = client.run(agent=agent, messages=messages, execute_tools=False)
-    print(response)
-
-    # assert function not called
-    get_weather_mock.assert_not_called()
-
-    # assert tool call is present in last response
-    tool_calls = response.messages[-1].get("tool_calls")
-    assert tool_calls is not None and len(tool_calls) == 1
-    tool_call = tool_calls[0]
-    assert tool_call["function"]["name"] == "get_weather"
-    assert json.loads(tool_call["function"]["arguments"]) == {
-        "location": expected_location
-    }
-
-
-def test_handoff(mock_openai_client: MockOpenAIClient):
-    def transfer_to_agent2():
-        return agent2
-
-    agent1 = Agent(name="Test Agent 1", functions=[transfer_to_agent2])
-    agent2 = Agent(name="Test Agent 2")
-
-    # set mock to return a response that triggers the handoff
-    mock_openai_client.set_sequential_responses(
-        [
-            create_mock_response(
-                message={"role": "assistant", "content": ""},
-                function_calls=[{"name": "transfer_to_agent2"}],
-            ),
-            create_mock_response(
-                {"role": "assistant", "content": DEFAULT_RESPONSE_CONTENT}
-            ),
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan
+
+
+def make_agents(*names):
+    agents = [Agent(name="Orchestrator", orchestrator=True, on_step=lambda step: None)]
+    return agents + [Agent(name=name, on_step=lambda step: None) for name in names]
+
+
+def test_run_with_simple_prompt():
+    client = FakeScrapybara([make_plan(("Alice", "say hello", 1))])
+    agents = make_agents("Alice")
+    swarm = Swarm(agents, client=client)
+
+    response = swarm.run(agents[0], prompt="greet the user")
+
+    assert client.prompts == ["say hello"]
+    assert response.results[0].text == "done: say hello"
+    assert response.output.task_assignments == []
+    # plan, the task, and the final empty plan
+    assert client.act_calls == 3
+    assert response.usage.total.act_calls == 3
+
+
+def test_tool_calls_run_against_the_instance():
+    def script(prompt):
+        return [
+            FakeStep(text="writing", tool_calls=[
+                ("str_replace_editor", {"command": "create", "path": "/tmp/a.txt", "file_text": "hi\n"}),
+                ("bash", {"command": "cat /tmp/a.txt"}),
+                ("computer", {"action": "take_screenshot"}),
+            ]),
+            FakeStep(text="checking", tool_calls=[("bash", {"command": "cat /tmp/missing"})]),
+            FakeStep(text="done"),
         ]
-    )
 
-    # set up client and run
-    client = Swarm(client=mock_openai_client)
-    messages = [{"role": "user", "content": "I want to talk to agent 2"}]
-    response = client.run(agent=agent1, messages=messages)
+    client = FakeScrapybara([make_plan(("Alice", "write a file", 1))], script=script)
+    agents = make_agents("Alice")
+    swarm = Swarm(agents, client=client)
+
+    response = swarm.run(agents[0], prompt="write a file")
+
+    instance = client.instances[0]
+    assert instance.files == {"/tmp/a.txt": "hi\n"}
+    assert instance.commands == ["cat /tmp/a.txt", "cat /tmp/missing"]
+    assert instance.actions == ["take_screenshot"]
+
+    steps = response.results[0].steps
+    assert [s.text for s in steps] == ["writing", "checking", "done"]
+    assert steps[0].tool_results[1].result.output == "hi\n"
+    assert steps[0].tool_results[2].result.base_64_image
+    assert steps[1].tool_results[0].result.error.startswith("cat: /tmp/missing")
+
+
+def test_tool_errors_are_returned_to_the_agent():
+    def script(prompt):
+        return [FakeStep(tool_calls=[("str_replace_editor", {"command": "view", "path": "/nope"})]), FakeStep(text="ok")]
+
+    client = FakeScrapybara([make_plan(("Alice", "look", 1))], script=script)
+    agents = make_agents("Alice")
+    response = Swarm(agents, client=client).run(agents[0], prompt="look")
+
+    result = response.results[0].steps[0].tool_results[0]
+    assert result.is_error
+    assert "/nope does not exist" in result.result
+
+
+def test_structured_output_for_worker_agents():
+    class Answer(BaseModel):
+        value: int
+
+    client = FakeScrapybara([make_plan(("Alice", "compute", 1))], outputs=[Answer(value=42)])
+    agents = make_agents("Alice")
+    agents[1].schema = Answer
+    response = Swarm(agents, client=client).run(agents[0], prompt="compute")
+
+    assert response.results[0].output == Answer(value=42)
+    assert response.results[0].steps[-1].tool_calls[-1].tool_name == "structured_output"
+
+
+def test_injected_failures_become_task_errors():
+    client = FakeScrapybara([make_plan(("Alice", "a", 1), ("Bob", "b", 1))], fail_on={"a"}, failure_status=503)
+    agents = make_agents("Alice", "Bob")
+    swarm = Swarm(agents, client=client)
+
+    response = swarm.run(agents[0], prompt="do a and b")
+
+    errors = {r.agent_name: r.error for r in response.results}
+    assert errors == {"Alice": "Error 503: injected failure", "Bob": None}
+    assert swarm.metrics.get("swarm_api_errors_total", agent="Alice", status="503") == 1
+
+
+def test_failure_rate_is_seeded():
+    def failures(seed):
+        client = FakeScrapybara(failure_rate=0.5, seed=seed)
+        outcomes = []
+        for _ in range(20):
+            try:
+                client.act(model=None, tools=[], system="", prompt="x")
+                outcomes.append(True)
+            except ApiError:
+                outcomes.append(False)
+        return outcomes
+
+    assert failures(1) == failures(1)
+    assert 0 < failures(1).count(False) < 20
+
+
+def test_histories_carry_over_between_tasks():
+    client = FakeScrapybara([make_plan(("Alice", "first", 1)), make_plan(("Alice", "second", 1))])
+    agents = make_agents("Alice")
+    Swarm(agents, client=client).run(agents[0], prompt="two steps")
 
-    assert response.agent == agent2
-    assert response.messages[-1]["role"] == "assistant"
-    assert response.messages[-1]["content"] == DEFAULT_RESPONSE_CONTENT
+    texts = [part.text for m in agents[1].messages for part in m.content]
+    assert texts == ["first", "done: first", "second", "done: second"]
@@ -0,0 +1,145 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from scrapybara.core.api_error import ApiError
+from scrapybara.tools import BashTool
+from scrapybara.types.act import Step
+
+from swarm.hedging import HedgePolicy, hedged_call
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import make_plan, make_swarm
+
+
+def scripted_call(latencies, errors=()):
+    """A call whose n-th invocation takes latencies[n] seconds and fails if n is in `errors`"""
+    calls = []
+    lock = threading.Lock()
+
+    def call(on_step):
+        with lock:
+            n = len(calls)
+            calls.append(n)
+        time.sleep(latencies[n])
+        if n in errors:
+            raise ApiError(status_code=500, body=f"call {n} failed")
+        on_step(f"step {n}")
+        return f"response {n}"
+
+    return call, calls
+
+
+def test_fast_calls_are_not_hedged():
+    policy = HedgePolicy(initial_delay=0.2)
+    call, calls = scripted_call([0.0])
+    steps = []
+    assert hedged_call(call, steps.append, policy) == ("response 0", False, False)
+    assert calls == [0] and steps == ["step 0"]
+
+
+def test_slow_call_is_hedged_and_the_loser_is_cancelled():
+    policy = HedgePolicy(initial_delay=0.05)
+    call, calls = scripted_call([0.5, 0.0])
+    steps = []
+    assert hedged_call(call, steps.append, policy) == ("response 1", True, True)
+    # Only the winner's steps get through
+    assert steps == ["step 1"]
+    assert policy.stats() == {"calls": 1, "hedges": 1, "wins": 1, "hedge_rate": 1.0}
+
+
+def test_hedge_covers_a_failed_request():
+    call, _ = scripted_call([0.1, 0.0, 0.0], errors={1})
+    assert hedged_call(call, lambda step: None, HedgePolicy(initial_delay=0.05))[0] == "response 0"
+
+    call, _ = scripted_call([0.1, 0.0], errors={0, 1})
+    with pytest.raises(ApiError):
+        hedged_call(call, lambda step: None, HedgePolicy(initial_delay=0.05))
+
+
+def test_latency_is_measured_from_the_first_request():
+    policy = HedgePolicy(initial_delay=0.1, min_samples=1)
+    call, _ = scripted_call([0.5, 0.05])
+    hedged_call(call, lambda step: None, policy)
+    # The hedge answered 0.05s after it started, but the caller waited for 0.15s
+    assert policy.delay() >= 0.14
+
+    # A failed attempt that a hedge made up for counts as a sample, but not as a call
+    policy = HedgePolicy(percentile=0.0, initial_delay=0.05, min_samples=2)
+    call, _ = scripted_call([0.1, 0.1], errors={0})
+    assert hedged_call(call, lambda step: None, policy)[0] == "response 1"
+    assert policy.stats()["calls"] == 1
+    assert 0.09 <= policy.delay() < 0.14
+
+    # So does a call that failed altogether
+    policy = HedgePolicy(initial_delay=0.05, min_samples=1)
+    call, _ = scripted_call([0.1, 0.1], errors={0, 1})
+    with pytest.raises(ApiError):
+        hedged_call(call, lambda step: None, policy)
+    assert policy.stats()["calls"] == 1 and policy.delay() >= 0.14
+
+
+def test_delay_follows_recent_latency_percentile():
+    policy = HedgePolicy(percentile=0.9, min_samples=10, min_delay=0.5)
+    assert policy.delay() is None
+    for latency in range(1, 11):
+        policy.record(latency)
+    assert policy.delay() == 10
+    for _ in range(10):
+        policy.record(0.1)
+    assert policy.delay() == 9
+
+
+class SlowPlanner(FakeScrapybara):
+    """Every first orchestrator request stalls, the hedge answers at once"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.orchestrator_calls = 0
+        self.orchestrator_tools = []  # Names of the tools of every orchestrator request
+
+    def act(self, model, tools, system, messages=None, schema=None, on_step=None, **kwargs):
+        if schema is None:
+            return super().act(model, tools, system, messages=messages, schema=schema, on_step=on_step, **kwargs)
+        with self._lock:
+            self.orchestrator_calls += 1
+            self.orchestrator_tools.append([tool.name for tool in tools])
+            stall = self.orchestrator_calls % 2 == 1
+        if stall:
+            time.sleep(0.5)
+            on_step(Step(text="too late"))
+        return super().act(model, tools, system, messages=messages, schema=schema, on_step=on_step, **kwargs)
+
+
+def test_swarm_hedges_planning_but_not_workers():
+    client = SlowPlanner([make_plan(("Alice", "a", 1))])
+    swarm, orchestrator = make_swarm(client, hedge=HedgePolicy(initial_delay=0.05))
+    orchestrator.default_tools = False
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert [r.text for r in response.results] == ["done: a"]
+    assert client.orchestrator_calls == 4
+    assert client.prompts == ["a"]
+    metrics = swarm.metrics.to_prometheus()
+    assert 'swarm_plan_hedges_total{agent="Orchestrator"} 2' in metrics
+    assert 'swarm_plan_hedge_wins_total{agent="Orchestrator"} 2' in metrics
+    assert "too late" not in [s.text for s in response.steps]
+    # Hedged requests carry no tools that could run twice
+    assert client.orchestrator_tools == [[]] * 4
+
+
+def test_orchestrator_with_tools_is_not_hedged():
+    client = SlowPlanner([make_plan(("Alice", "a", 1))])
+    swarm, orchestrator = make_swarm(client, hedge=HedgePolicy(initial_delay=0.05))
+    swarm.run(orchestrator, prompt="do things")
+
+    # Hedging doesn't take the default tools away from the orchestrator
+    assert client.orchestrator_tools == [["bash", "computer", "str_replace_editor"]] * 2
+    assert swarm.metrics.get("swarm_plan_hedges_total", agent="Orchestrator") is None
+
+    client = SlowPlanner([make_plan(("Alice", "a", 1))])
+    swarm, orchestrator = make_swarm(client, hedge=HedgePolicy(initial_delay=0.05))
+    orchestrator.default_tools = False
+    orchestrator.tools = [BashTool(MagicMock())]
+    swarm.run(orchestrator, prompt="do things")
+    assert client.orchestrator_calls == 2
@@ -0,0 +1,66 @@
+import base64
+import io
+
+import pytest
+from scrapybara.types.act import ToolMessage, ToolResultPart
+from scrapybara.core.pydantic_utilities import parse_obj_as
+from scrapybara.types.computer_response import ComputerResponse
+
+from swarm.images import ImageHistory, ImagePolicy, dhash
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def screenshot(seed, size=(1024, 768)):
+    img = Image.new("RGB", size)
+    # A blocky gradient whose direction depends on the seed, so frames differ perceptually
+    img.putdata([
+        (((x // 64) * 16 + seed * 40) % 256, ((y // 64) * 16 * (seed % 3)) % 256, 0)
+        for y in range(size[1]) for x in range(size[0])
+    ])
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def result(i, image):
+    return ToolResultPart(
+        tool_call_id=f"c{i}",
+        tool_name="computer",
+        result=parse_obj_as(ComputerResponse, {"base64_image": image}),
+    )
+
+
+def test_dhash_ignores_scale():
+    image = screenshot(1)
+    small = Image.open(io.BytesIO(base64.b64decode(image))).resize((256, 192))
+    buffer = io.BytesIO()
+    small.save(buffer, format="PNG")
+    assert bin(dhash(image) ^ dhash(base64.b64encode(buffer.getvalue()).decode())).count("1") <= 2
+
+
+def test_duplicate_frames_point_to_the_earlier_frame():
+    frame = screenshot(1)
+    parts = [result(0, frame), result(1, frame), result(2, screenshot(2))]
+    history = ImageHistory(ImagePolicy())
+    history.add_messages([ToolMessage(content=parts)])
+
+    assert parts[1].result == {"output": "[Screen unchanged since tool call c0]", "error": None, "system": None}
+    assert parts[0].result.base_64_image == frame
+    assert history.bytes_saved == len(frame)
+
+
+def test_old_frames_are_downscaled_then_dropped():
+    parts = [result(i, screenshot(i)) for i in range(4)]
+    history = ImageHistory(ImagePolicy(keep_full=1, max_images=3, max_size=128))
+    history.add(parts)
+
+    assert "base_64_image" not in parts[0].result
+    for part in parts[1:3]:
+        assert Image.open(io.BytesIO(base64.b64decode(part.result["base_64_image"]))).size == (128, 96)
+    assert isinstance(parts[3].result, ComputerResponse)
+
+    # Re-applying the policy to an already processed history changes nothing
+    before = [part.result for part in parts]
+    ImageHistory(ImagePolicy(keep_full=1, max_images=3, max_size=128)).add(parts)
+    assert [part.result for part in parts] == before
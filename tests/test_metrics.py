@@ -0,0 +1,78 @@
+import urllib.request
+
+from scrapybara.core.api_error import ApiError
+
+from swarm.metrics import MetricsRegistry, start_http_server, timed
+from tests.test_arun import FakeClient, make_plan, make_swarm
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.inc("swarm_steps_total", agent="Alice")
+    registry.inc("swarm_steps_total", 2, agent="Alice")
+    registry.set("swarm_live_instances", 3)
+    registry.observe("swarm_act_seconds", 0.5, agent='Al"ice')
+    registry.observe("swarm_act_seconds", 5, agent='Al"ice')
+
+    assert registry.to_prometheus() == """\
+# HELP swarm_steps_total Agent steps
+# TYPE swarm_steps_total counter
+swarm_steps_total{agent="Alice"} 3
+# HELP swarm_live_instances Instances leased or kept warm by the instance pool
+# TYPE swarm_live_instances gauge
+swarm_live_instances 3
+# HELP swarm_act_seconds Latency of client.act calls
+# TYPE swarm_act_seconds histogram
+swarm_act_seconds_bucket{agent="Al\\"ice",le="0.1"} 0
+swarm_act_seconds_bucket{agent="Al\\"ice",le="1"} 1
+swarm_act_seconds_bucket{agent="Al\\"ice",le="+Inf"} 2
+swarm_act_seconds_sum{agent="Al\\"ice"} 5.5
+swarm_act_seconds_count{agent="Al\\"ice"} 2
+"""
+
+
+def test_timed_and_http_exporter():
+    registry = MetricsRegistry()
+    try:
+        with timed(registry, "swarm_plan_seconds", agent="Orchestrator"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert registry.get("swarm_plan_seconds", agent="Orchestrator") == 1
+
+    server = start_http_server(registry, port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        assert "swarm_plan_seconds_count" in urllib.request.urlopen(url).read().decode()
+    finally:
+        server.shutdown()
+
+
+def test_swarm_run_records_metrics():
+    client = FakeClient([make_plan(("Alice", "open firefox", 1))])
+    swarm, orchestrator = make_swarm(client)
+    swarm.run(orchestrator, prompt="do things")
+
+    metrics = swarm.metrics
+    assert metrics.get("swarm_turns_total", agent="Orchestrator") == 2
+    assert metrics.get("swarm_plan_seconds", agent="Orchestrator") == 2
+    assert metrics.get("swarm_act_seconds", agent="Alice") == 1
+    assert metrics.get("swarm_steps_total", agent="Alice") == 1
+    # The shared instance is leased once per run, by whichever agent needs it first
+    assert metrics.get("swarm_instance_acquire_seconds", agent="Orchestrator") == 1
+    assert metrics.get("swarm_live_instances") == 1
+
+
+def test_api_errors_are_counted():
+    def act(**kwargs):
+        raise ApiError(status_code=429, body="slow down")
+
+    client = FakeClient([])
+    client.act = act
+    swarm, orchestrator = make_swarm(client)
+
+    try:
+        swarm.run(orchestrator, prompt="do things")
+    except ApiError:
+        pass
+    assert swarm.metrics.get("swarm_api_errors_total", agent="Orchestrator", status="429") == 1
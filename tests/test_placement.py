@@ -0,0 +1,80 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from pydantic import BaseModel
+from scrapybara.tools import BashTool, Tool
+
+from swarm import Agent
+from swarm.placement import PlacedTool, InstanceSlot, PlacementScheduler
+from tests.mock_client import FakeScrapybara, FakeStep
+from tests.test_arun import make_plan, make_swarm
+
+
+class SlowTool(Tool):
+    _active: list
+
+    def __init__(self, name):
+        super().__init__(name=name, description="", parameters=BaseModel)
+        self._active = [0, 0]  # Running calls, most running at once
+
+    def __call__(self, **kwargs):
+        self._active[0] += 1
+        self._active[1] = max(self._active)
+        time.sleep(0.02)
+        self._active[0] -= 1
+
+
+def call_concurrently(tool, n=4):
+    threads = [threading.Thread(target=tool) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_agents_are_spread_by_gui_needs():
+    scheduler = PlacementScheduler(instances=2)
+    bash_only = Agent(name="Dave", tools=[BashTool(MagicMock())], on_step=lambda step: None)
+    agents = [Agent(name=n, orchestrator=n == "Orchestrator", on_step=lambda step: None) for n in ("Orchestrator", "Alice", "Bob", "Carol")]
+
+    placed = {agent.name: scheduler.place(agent) for agent in agents + [bash_only]}
+
+    # The orchestrator doesn't use the desktop, so Alice shares its instance and Bob gets the next one
+    assert placed == {"Orchestrator": "placed-0", "Alice": "placed-0", "Bob": "placed-1", "Carol": "placed-1", "Dave": "placed-0"}
+    assert scheduler.place(agents[2]) == "placed-1"  # Placements stick
+    scheduler.reset()
+    assert scheduler.stats()["placed-0"]["agents"] == []
+
+
+def test_gui_calls_take_turns_but_others_run_concurrently():
+    slot = InstanceSlot("placed-0")
+    computer, bash = SlowTool("computer"), SlowTool("bash")
+    call_concurrently(PlacedTool(computer, slot, gui=True))
+    call_concurrently(PlacedTool(bash, slot, gui=False))
+
+    assert computer._active[1] == 1 and bash._active[1] > 1
+    stats = slot.stats()
+    assert stats["calls"] == 8 and stats["gui_wait_seconds"] > 0
+    assert 0 < stats["utilization"] <= 1 and stats["gui_seconds"] >= 0.08
+
+
+def test_swarm_places_gui_agents_on_their_own_instances():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def script(prompt):
+        barrier.wait()  # Both agents hold their instance at the same time
+        return [FakeStep(tool_calls=[("computer", {"action": "take_screenshot"})]), FakeStep(text=f"done: {prompt}")]
+
+    client = FakeScrapybara(plans=[make_plan(("Alice", "a", 1), ("Bob", "b", 1))], script=script)
+    swarm, orchestrator = make_swarm(client, placement=PlacementScheduler(instances=2))
+
+    response = swarm.run(orchestrator, prompt="task")
+
+    assert [r.error for r in response.results] == [None, None]
+    assert len(client.instances) == 2
+    stats = swarm.placement.stats()
+    assert stats["placed-0"]["agents"] == ["Orchestrator", "Alice"]
+    assert stats["placed-1"]["agents"] == ["Bob"]
+    assert stats["placed-1"]["calls"] == 1
+    assert [i.actions for i in client.instances] == [["take_screenshot"], ["take_screenshot"]]
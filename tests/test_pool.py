@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+from swarm.pool import InstancePool
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import make_plan, make_swarm
+
+
+class FakeInstance:
+    def __init__(self, id):
+        self.id = id
+        self.status = "running"
+        self.browser = MagicMock()
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        self.status = "terminated"
+
+
+class FakeClient:
+    def __init__(self):
+        self.ids = itertools.count()
+        self.instances = {}
+        self.get_instances_calls = 0
+
+    def start_ubuntu(self, timeout_hours=None):
+        instance = FakeInstance(f"i-{next(self.ids)}")
+        self.instances[instance.id] = instance
+        return instance
+
+    def get_instances(self):
+        self.get_instances_calls += 1
+        return list(self.instances.values())
+
+
+def test_released_instances_are_reused():
+    client = FakeClient()
+    pool = InstancePool(client)
+
+    first = pool.lease()
+    pool.release(first)
+    assert pool.lease() is first
+    assert len(client.instances) == 1
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_warm_instances_boot_when_the_pool_is_created():
+    client = FakeClient()
+    pool = InstancePool(client, warm=2)
+    assert wait_until(lambda: len(client.instances) == 2)
+    # Topping up again starts nothing new
+    pool.prewarm()
+    assert len(client.instances) == 2
+    pool.close()
+
+
+def test_unhealthy_idle_instances_are_skipped_despite_the_cached_index():
+    client = FakeClient()
+    pool = InstancePool(client, warm=2, index_ttl=60)
+    pool.prewarm()
+    assert len(client.instances) == 2
+    pool.get("i-0")
+
+    # The most recently warmed instance died while idle, after the index was cached
+    client.instances["i-1"].status = "error"
+    assert pool.lease().id == "i-0"
+    assert wait_until(lambda: client.instances["i-1"].stopped)
+
+
+def test_idle_instances_beyond_warm_are_reaped():
+    client = FakeClient()
+    pool = InstancePool(client, warm=1, max_idle_seconds=0)
+    a, b = pool.lease(), pool.lease()
+    pool.release(a)
+    pool.release(b)
+
+    assert a.stopped and not b.stopped
+    pool.close()
+    assert b.stopped
+
+
+def test_leases_do_not_wait_for_expired_instances_to_stop():
+    client = FakeClient()
+    pool = InstancePool(client, max_idle_seconds=60)
+    slow = SlowInstance("slow", 0.5)
+    pool._idle.append((slow, time.monotonic() - 120))
+
+    start = time.monotonic()
+    pool.lease()
+    assert time.monotonic() - start < 0.4
+    assert wait_until(lambda: slow.stopped)
+
+
+def test_instance_index_is_cached():
+    client = FakeClient()
+    existing = client.start_ubuntu()
+    pool = InstancePool(client, index_ttl=60)
+
+    assert pool.lease(existing.id) is existing
+    assert pool.lease("missing") is None
+    assert client.get_instances_calls == 1
+
+    # Instances the pool did not start are never stopped by it
+    pool.release(existing)
+    pool.close()
+    assert not existing.stopped
+
+
+class SlowInstance(FakeInstance):
+    def __init__(self, id, delay):
+        super().__init__(id)
+        self.delay = delay
+
+    def stop(self):
+        time.sleep(self.delay)
+        super().stop()
+
+
+def test_close_stops_instances_in_parallel():
+    client = FakeClient()
+    client.start_ubuntu = lambda timeout_hours=None: SlowInstance(f"i-{next(client.ids)}", 0.2)
+    pool = InstancePool(client)
+    for instance in [pool.lease() for _ in range(8)]:
+        pool.release(instance)
+
+    start = time.monotonic()
+    assert pool.close() == 8
+    assert time.monotonic() - start < 1
+    assert pool.live() == 0
+
+
+def test_close_gives_up_after_timeout():
+    hung = threading.Event()
+    instance = FakeInstance("i-0")
+    instance.stop = lambda: hung.wait(5)
+    client = FakeClient()
+    client.start_ubuntu = lambda timeout_hours=None: instance
+    pool = InstancePool(client)
+    pool.lease()
+
+    start = time.monotonic()
+    assert pool.close(timeout=0.1) == 0
+    assert time.monotonic() - start < 1
+    hung.set()
+
+
+def test_swarm_context_manager_stops_its_instances():
+    client = FakeScrapybara([make_plan(("Alice", "a", 1))])
+    with make_swarm(client)[0] as swarm:
+        swarm.run(swarm.agents[0], prompt="do a")
+        assert client.instances[0].status == "running"
+    assert client.instances[0].status == "terminated"
+    # Closing again is harmless
+    swarm.close()
+
+
+def test_swarm_async_context_manager():
+    client = FakeScrapybara([make_plan(("Alice", "a", 1))])
+
+    async def main():
+        async with make_swarm(client)[0] as swarm:
+            await swarm.arun(swarm.agents[0], prompt="do a")
+
+    asyncio.run(main())
+    assert client.instances[0].status == "terminated"
+
+
+def test_open_pools_are_closed_at_exit(tmp_path):
+    marker = tmp_path / "stopped"
+    script = f"""
+from unittest.mock import MagicMock
+from swarm.pool import InstancePool
+
+instance = MagicMock(id="i-0", status="running")
+instance.stop = lambda: open({str(marker)!r}, "w").close()
+client = MagicMock()
+client.start_ubuntu.return_value = instance
+pool = InstancePool(client)
+pool.lease()
+"""
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert marker.exists()
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+from scrapybara.core.api_error import ApiError
+
+from swarm.ratelimit import AIMDLimiter, RateLimitedClient, RetryPolicy, TokenBucket
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import make_plan, make_swarm
+
+
+class FlakyClient:
+    """Fails the first `failures` act calls with `status`, after taking `steps_before_failure` steps"""
+
+    def __init__(self, failures, status=429, steps_before_failure=0):
+        self.failures = failures
+        self.status = status
+        self.steps_before_failure = steps_before_failure
+        self.calls = 0
+
+    def act(self, on_step=None, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            for _ in range(self.steps_before_failure):
+                on_step("step")
+            raise ApiError(status_code=self.status, body="try again")
+        on_step("step")
+        return "response"
+
+
+def no_sleep(seconds):
+    pass
+
+
+def test_token_bucket_allows_bursts_then_paces_calls():
+    bucket = TokenBucket(rate=50, burst=2)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    start = time.monotonic()
+    assert bucket.acquire() > 0
+    assert time.monotonic() - start >= 0.015
+
+
+def test_aimd_limiter_cuts_on_throttling_and_grows_on_success():
+    limiter = AIMDLimiter(initial=8, cooldown=60)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4  # Same overload, within the cooldown
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert 4.9 < limiter.limit < 5
+
+    slow = AIMDLimiter(initial=8, latency_target=1.0)
+    slow.acquire()
+    slow.release(latency=2.0)
+    assert slow.limit == 4
+
+
+def test_aimd_limiter_caps_concurrency():
+    limiter = AIMDLimiter(initial=2)
+    limiter.acquire()
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release()
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_act_is_retried_on_throttling_and_shrinks_concurrency():
+    client = RateLimitedClient(FlakyClient(failures=2), concurrency=AIMDLimiter(initial=8, cooldown=0), sleep=no_sleep)
+    steps = []
+    assert client.act(model="m", on_step=steps.append) == "response"
+    assert client.stats()["retries"] == 2 and client.stats()["throttled"] == 2
+    assert client.concurrency.limit < 8
+    assert steps == ["step"]
+
+
+def test_act_holds_a_concurrency_slot_per_model_request_not_per_session():
+    limiter = AIMDLimiter(initial=1)
+    in_flight = []
+
+    class ThreeStepClient:
+        def act(self, on_step=None, **kwargs):
+            for _ in range(3):
+                in_flight.append(limiter.in_flight)
+                on_step("step")
+            return "response"
+
+    def other_request():
+        limiter.acquire()
+        limiter.release()
+
+    def on_step(step):
+        # With a limit of one, another agent gets the slot while this one handles its step
+        other = threading.Thread(target=other_request)
+        other.start()
+        other.join(1)
+        others.append(other.is_alive())
+
+    others = []
+    client = RateLimitedClient(ThreeStepClient(), concurrency=limiter, sleep=no_sleep)
+    assert client.act(on_step=on_step) == "response"
+    assert others == [False, False, False]
+    assert in_flight == [1, 1, 1]
+    assert limiter.in_flight == 0
+    # Grown once per request, by the three of this call and the three of the others
+    assert 3.5 < limiter.limit < 4
+
+
+def test_act_is_not_retried_after_a_step_or_for_client_errors():
+    client = RateLimitedClient(FlakyClient(failures=1, status=503, steps_before_failure=1), sleep=no_sleep)
+    with pytest.raises(ApiError):
+        client.act(on_step=lambda step: None)
+    assert client.retries == 0
+
+    client = RateLimitedClient(FlakyClient(failures=1, status=400), sleep=no_sleep)
+    with pytest.raises(ApiError):
+        client.act(on_step=lambda step: None)
+    assert client.retries == 0
+
+
+def test_retries_give_up_after_max_attempts():
+    flaky = FlakyClient(failures=10, status=503)
+    client = RateLimitedClient(flaky, retry=RetryPolicy(max_attempts=3), sleep=no_sleep)
+    with pytest.raises(ApiError):
+        client.act(on_step=lambda step: None)
+    assert flaky.calls == 3
+
+
+def test_retry_delays_are_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    delays = [policy.delay(10) for _ in range(100)]
+    assert all(0 <= d <= 5 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_swarm_survives_transient_errors():
+    plan = make_plan(*[(name, f"task {i}", 1) for i in range(10) for name in ("Alice", "Bob")])
+    client = FakeScrapybara([plan], failure_rate=0.3, failure_status=503, seed=1)
+    swarm, orchestrator = make_swarm(RateLimitedClient(client, sleep=no_sleep))
+
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert [r.error for r in response.results] == [None] * 20
+    assert client.act_calls > 22  # Two plans and 20 tasks, plus the retries
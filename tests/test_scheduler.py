@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from swarm.scheduler import PlanError, order_plan, run_plan
+from swarm.tools import OrchestratorSchema
+from swarm.types import TaskResult
+
+AGENTS = ["Alice", "Bob", "Carol"]
+
+
+def task(id, agent="Alice", priority=1, depends_on=()):
+    return OrchestratorSchema.TaskAssignment(
+        id=id, agent_name=agent, prompt=f"do {id}", priority=priority, depends_on=list(depends_on)
+    )
+
+
+def test_order_plan_is_topological_and_prioritized():
+    plan = [
+        task("report", depends_on=["scrape", "search"]),
+        task("scrape", priority=1),
+        task("search", priority=5),
+    ]
+    assert [t.id for t in order_plan(plan, AGENTS)] == ["search", "scrape", "report"]
+
+
+@pytest.mark.parametrize(
+    "plan, message",
+    [
+        ([task("a", depends_on=["b"]), task("b", depends_on=["a"])], "cycle between tasks a, b"),
+        ([task("a", depends_on=["a"])], "cycle"),
+        ([task("a", depends_on=["missing"])], "unknown task missing"),
+        ([task("a", agent="Mallory")], "unknown agent Mallory"),
+        ([task("a"), task("a")], "Duplicate task id a"),
+    ],
+)
+def test_order_plan_rejects_invalid_plans(plan, message):
+    with pytest.raises(PlanError, match=message):
+        order_plan(plan, AGENTS)
+
+
+def run(plan, max_concurrency=4, fail=()):
+    events = []
+
+    async def run_task(assignment, upstream):
+        events.append(("start", assignment.id, [r.task_id for r in upstream]))
+        await asyncio.sleep(0)
+        events.append(("end", assignment.id))
+        return TaskResult(
+            task_id=assignment.id,
+            agent_name=assignment.agent_name,
+            prompt=assignment.prompt,
+            text=assignment.id,
+            error="boom" if assignment.id in fail else None,
+        )
+
+    results = asyncio.run(run_plan(order_plan(plan, AGENTS), run_task, max_concurrency))
+    return results, events
+
+
+def test_run_plan_starts_tasks_when_dependencies_finish():
+    plan = [
+        task("a", agent="Alice"),
+        task("b", agent="Bob"),
+        task("c", agent="Carol", depends_on=["a", "b"]),
+    ]
+    results, events = run(plan)
+
+    # Independent tasks overlap, the dependent one waits for both and sees their results
+    assert events[:2] == [("start", "a", []), ("start", "b", [])]
+    assert ("start", "c", ["a", "b"]) in events
+    assert events.index(("start", "c", ["a", "b"])) > events.index(("end", "b"))
+    assert [r.task_id for r in results] == ["a", "b", "c"]
+
+
+def test_run_plan_serializes_tasks_of_one_agent():
+    results, events = run([task("a", priority=2), task("b", priority=1)])
+    assert events == [("start", "a", []), ("end", "a"), ("start", "b", []), ("end", "b")]
+
+
+def test_run_plan_skips_dependents_of_failed_tasks():
+    plan = [task("a", agent="Alice"), task("b", agent="Bob", depends_on=["a"]), task("c", agent="Carol")]
+    results, events = run(plan, fail={"a"})
+
+    assert results[1].error == "Skipped because dependency a failed"
+    assert not any(e[1] == "b" for e in events)
+    assert results[2].error is None
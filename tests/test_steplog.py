@@ -0,0 +1,173 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from scrapybara.types.act import Step, TokenUsage, ToolCallPart, ToolResultPart
+
+from swarm import Agent, Swarm
+from swarm.steplog import ConsoleSink, JSONLSink, Sink, StepLogger
+from swarm.util import format_step
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import make_plan
+
+
+class ListSink(Sink):
+    def __init__(self, gate=None):
+        self.records = []
+        self.gate = gate
+
+    def write(self, record):
+        if self.gate:
+            self.gate.wait(5)
+        self.records.append(record)
+
+
+def tool_step():
+    call = ToolCallPart(tool_call_id="call-1", tool_name="bash", args={"command": "ls"})
+    return Step(
+        text="listing",
+        tool_calls=[call],
+        tool_results=[ToolResultPart(tool_call_id="call-1", tool_name="bash", result="a\n", is_error=False)],
+        usage=TokenUsage(prompt_tokens=10, completion_tokens=2, total_tokens=12),
+    )
+
+
+def test_jsonl_and_console_sinks(tmp_path):
+    console = io.StringIO()
+    logger = StepLogger([JSONLSink(str(tmp_path / "steps.jsonl")), ConsoleSink(console)])
+    logger.log("Alice", tool_step(), "instance-1", "92")
+    logger.close()
+
+    (line,) = (tmp_path / "steps.jsonl").read_text().splitlines()
+    record = json.loads(line)
+    assert record["agent"] == "Alice" and record["instance"] == "instance-1" and record["ts"] > 0
+    assert record["tool_calls"] == [{"id": "call-1", "name": "bash", "args": {"command": "ls"}}]
+    assert record["tool_results"] == [{"id": "call-1", "name": "bash", "error": False}]
+    assert record["usage"]["total_tokens"] == 12
+    assert console.getvalue() == format_step(tool_step(), "92") + "\n"
+
+
+@pytest.mark.parametrize("policy", ["drop", "sample"])
+def test_full_queue_never_blocks_the_agent(policy):
+    gate = threading.Event()
+    sink = ListSink(gate)
+    logger = StepLogger([sink], max_queue=4, policy=policy, sample_every=3)
+
+    # The writer is stuck on the first record, so the queue fills up
+    for _ in range(50):
+        logger.log("Alice", Step(text="step"))
+    stats = logger.stats()
+    gate.set()
+    logger.close()
+
+    assert stats["logged"] == len(sink.records) < 50
+    assert stats["logged"] + stats["dropped"] + stats["sampled_out"] == 50
+    assert (stats["sampled_out"] > 0) == (policy == "sample")
+
+
+def test_block_policy_keeps_every_step():
+    sink = ListSink()
+    logger = StepLogger([sink], max_queue=2, policy="block")
+    for i in range(100):
+        logger.log("Alice", Step(text=str(i)))
+    logger.flush()
+    assert [r.step.text for r in sink.records] == [str(i) for i in range(100)]
+    logger.close()
+
+
+def test_drop_is_the_default_and_flush_gives_up_on_a_stuck_sink():
+    gate = threading.Event()
+    logger = StepLogger([ListSink(gate)], max_queue=1)
+    for _ in range(5):
+        logger.log("Alice", Step(text="step"))
+    assert logger.stats()["dropped"] > 0
+
+    assert logger.flush(timeout=0.1) is False
+    gate.set()
+    assert logger.flush(timeout=5) is True
+    logger.close()
+
+
+def test_close_gives_up_on_a_stuck_sink():
+    gate = threading.Event()
+    sink = ListSink(gate)
+    sink.closed = False
+    sink.close = lambda: setattr(sink, "closed", True)
+    logger = StepLogger([sink])
+    logger.log("Alice", Step(text="step"))
+
+    assert logger.close(timeout=0.1) is False
+    assert not sink.closed
+    gate.set()
+    logger._thread.join(5)
+
+
+def test_exit_does_not_wait_for_a_stuck_default_logger():
+    script = """
+import threading
+from scrapybara.types.act import Step
+from swarm import steplog
+
+class Stuck(steplog.Sink):
+    def write(self, record):
+        threading.Event().wait()
+
+steplog.FLUSH_SECONDS = 0.2
+logger = steplog.default_step_logger()
+logger.sinks = [Stuck()]
+logger.log("Alice", Step(text="step"))
+"""
+    start = time.monotonic()
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert time.monotonic() - start < 10
+
+
+def test_sinks_must_implement_write():
+    class Silent(Sink):
+        pass
+
+    with pytest.raises(TypeError):
+        Silent()
+
+
+def test_failing_sink_does_not_stop_the_logger():
+    class Broken(Sink):
+        def write(self, record):
+            raise OSError("disk full")
+
+    sink = ListSink()
+    logger = StepLogger([Broken(), sink])
+    logger.log("Alice", Step(text="step"))
+    logger.close()
+    assert len(sink.records) == 1 and logger.stats()["errors"] == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        StepLogger(policy="wait")
+
+
+def test_swarm_logs_steps_of_agents_without_on_step():
+    sink = ListSink()
+    custom = []
+    client = FakeScrapybara(plans=[make_plan(("Alice", "a", 1), ("Bob", "b", 1))])
+    agents = [
+        Agent(name="Orchestrator", orchestrator=True),
+        Agent(name="Alice"),
+        Agent(name="Bob", on_step=custom.append),
+    ]
+    swarm = Swarm(agents, client=client, step_log=StepLogger([sink]))
+
+    swarm.run(agents[0], prompt="task")
+    # Steps are written by the time the run returns
+    records = list(sink.records)
+    swarm.step_log.close()
+
+    assert {r.agent_name for r in records} == {"Orchestrator", "Alice"}
+    assert all(r.instance_id == client.instances[0].id for r in records if r.agent_name == "Alice")
+    assert [step.text for step in custom] == ["done: b"]
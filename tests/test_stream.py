@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+from swarm.events import AgentSwitchEvent, PlanEvent, RunFinishedEvent, TextEvent
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import FakeClient, make_plan, make_swarm
+
+
+def test_run_stream_yields_events_in_order():
+    client = FakeClient([make_plan(("Alice", "open firefox", 1))])
+    swarm, orchestrator = make_swarm(client)
+
+    events = list(swarm.run_stream(orchestrator, prompt="do things"))
+
+    assert [e.type for e in events] == ["text", "plan", "agent_switch", "text", "text", "run_finished"]
+    assert events[2] == AgentSwitchEvent(
+        agent_name="Alice", task_id="t0", prompt="open firefox", timestamp=events[2].timestamp
+    )
+    assert events[3].text == "done: open firefox"
+    assert events[-1].response.results[0].text == "done: open firefox"
+
+
+def test_arun_stream_applies_backpressure():
+    client = FakeClient([make_plan(("Alice", "a", 1), ("Bob", "b", 1))])
+    swarm, orchestrator = make_swarm(client)
+
+    async def consume():
+        events = []
+        async for event in swarm.arun_stream(orchestrator, prompt="do things", max_queue=1):
+            # Producers can never run more than one event ahead of us
+            await asyncio.sleep(0.01)
+            events.append(event)
+        return events
+
+    events = asyncio.run(consume())
+    assert isinstance(events[1], PlanEvent)
+    assert isinstance(events[-1], RunFinishedEvent)
+    assert sum(isinstance(e, TextEvent) for e in events) == 4
+
+
+def test_run_stream_consumer_can_stop_early():
+    client = FakeClient([make_plan(("Alice", "a", 1))])
+    swarm, orchestrator = make_swarm(client)
+
+    stream = swarm.run_stream(orchestrator, prompt="do things", max_queue=1)
+    assert next(stream).type == "text"
+    stream.close()
+
+    # The abandoned run must still finish instead of blocking on a full queue
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+
+
+def test_run_stream_cancels_the_run_when_the_consumer_stops_early():
+    plan = make_plan(*[("Alice" if i % 2 else "Bob", f"task {i}", 1) for i in range(6)])
+    client = FakeScrapybara([plan], latency=0.05)
+    swarm, orchestrator = make_swarm(client)
+
+    for event in swarm.run_stream(orchestrator, prompt="do things", max_concurrency=1):
+        break
+    time.sleep(0.5)
+
+    # The orchestrator planned, and at most the assignment already running finished
+    assert client.act_calls <= 2
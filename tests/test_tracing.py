@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from swarm.tracing import Tracer, span
+from tests.mock_client import FakeScrapybara
+from tests.test_arun import FakeClient, make_plan, make_swarm
+
+
+def test_chrome_trace_has_a_track_per_agent_and_instance(tmp_path):
+    tracer = Tracer()
+    with tracer.span("act", "agent", "Alice"):
+        pass
+    tracer.add("bash", "instance", "i-1", tracer._origin + 1, 0.5, agent="Alice", command=["ls"])
+
+    path = tmp_path / "trace.json"
+    tracer.save(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+
+    threads = {(e["pid"], e["args"]["name"]) for e in events if e["name"] == "thread_name"}
+    assert threads == {(2, "Alice"), (3, "i-1")}
+    bash = next(e for e in events if e["name"] == "bash")
+    assert (bash["ts"], bash["dur"], bash["args"]) == (1e6, 0.5e6, {"agent": "Alice", "command": "['ls']"})
+
+
+def test_swarm_run_is_traced():
+    tracer = Tracer()
+    client = FakeClient([make_plan(("Alice", "open firefox", 1))])
+    swarm, orchestrator = make_swarm(client, tracer=tracer)
+    swarm.run(orchestrator, prompt="do things")
+
+    spans = [(e["name"], e["cat"]) for e in tracer.to_chrome_trace()["traceEvents"] if e["ph"] == "X"]
+    assert ("run", "swarm") in spans
+    assert spans.count(("act", "agent")) == 3
+    assert spans.count(("acquire instance", "agent")) == 3
+
+
+def test_spans_that_raise_are_recorded_with_the_error():
+    tracer = Tracer()
+    with pytest.raises(RuntimeError):
+        with tracer.span("act", "agent", "Alice", step=1):
+            raise RuntimeError("boom")
+
+    (act,) = [e for e in tracer.to_chrome_trace()["traceEvents"] if e["ph"] == "X"]
+    assert act["args"] == {"step": 1, "error": "RuntimeError"} and act["dur"] >= 0
+
+
+def test_invalid_spans_are_rejected():
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        tracer.add("bash", "process", "i-1", tracer._origin, 0.1)
+    with pytest.raises(ValueError):
+        tracer.add("bash", "instance", "i-1", tracer._origin, -1)
+    # Nothing was recorded, not even the track
+    assert [e["name"] for e in tracer.to_chrome_trace()["traceEvents"]] == ["process_name"] * 3
+
+
+def test_disabled_tracing_and_empty_traces(tmp_path):
+    with span(None, "act", "agent", "Alice"):
+        pass
+
+    path = tmp_path / "traces" / "empty.json"
+    Tracer().save(str(path))
+    trace = json.loads(path.read_text())
+    assert {e["ph"] for e in trace["traceEvents"]} == {"M"} and trace["displayTimeUnit"] == "ms"
+
+
+def test_failed_assignments_are_traced():
+    tracer = Tracer()
+    client = FakeScrapybara([make_plan(("Alice", "a", 1), ("Bob", "b", 1))], fail_on={"a"}, failure_status=400)
+    swarm, orchestrator = make_swarm(client, tracer=tracer)
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert [r.error is not None for r in response.results] == [True, False]
+    acts = [e for e in tracer.to_chrome_trace()["traceEvents"] if e["ph"] == "X" and e["name"] == "act"]
+    errors = {e["args"].get("error") for e in acts if e["cat"] == "agent" and e["args"].get("error")}
+    assert errors == {"ApiError"}
+    assert any(e["name"] == "run" for e in tracer.to_chrome_trace()["traceEvents"])
@@ -0,0 +1,106 @@
+from scrapybara.types.act import ActResponse, AssistantMessage, Step, TextPart, TokenUsage
+
+from swarm.events import UsageEvent
+from swarm.usage import Budget, Usage
+from tests.test_arun import FakeClient, make_plan, make_swarm
+
+
+class MeteredClient(FakeClient):
+    """Reports `steps` steps of 100 prompt and 10 completion tokens per worker act call"""
+
+    def __init__(self, plans, steps=1):
+        super().__init__(plans)
+        self.steps = steps
+
+    def act(self, model, tools, system, messages, schema=None, on_step=None, **kwargs):
+        response = super().act(model, tools, system, messages, schema=schema, **kwargs)
+        steps = [
+            Step(text=response.text, usage=TokenUsage(prompt_tokens=100, completion_tokens=10, total_tokens=110))
+            for _ in range(1 if schema else self.steps)
+        ]
+        for step in steps:
+            if on_step:
+                on_step(step)
+        return ActResponse(
+            messages=list(messages) + [AssistantMessage(content=[TextPart(text=response.text)])],
+            steps=steps,
+            text=response.text,
+            output=response.output,
+        )
+
+
+def test_usage_is_aggregated_per_agent():
+    client = MeteredClient([make_plan(("Alice", "a", 1), ("Bob", "b", 1))])
+    swarm, orchestrator = make_swarm(client)
+
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert response.stop_reason is None
+    assert response.usage.total.input_tokens == 400
+    assert response.usage.total.output_tokens == 40
+    assert response.usage.total.act_calls == 4
+    assert response.usage.agents["Alice"].total_tokens == 110
+    assert response.usage.agents["Orchestrator"].act_calls == 2
+
+
+def test_run_budget_stops_with_partial_results():
+    client = MeteredClient([make_plan(("Alice", "a", 1)), make_plan(("Bob", "b", 1))], steps=5)
+    swarm, orchestrator = make_swarm(client, budget=Budget(max_tokens=300))
+
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert response.stop_reason == "Run stopped: token budget of 300 exceeded"
+    # Alice was stopped mid-task and Bob never started
+    assert [r.agent_name for r in response.results] == ["Alice"]
+    assert response.results[0].error == response.stop_reason
+    assert len(response.results[0].steps) == 2
+    assert client.prompts == ["a"]
+
+
+def test_act_call_budget_is_checked_before_calling():
+    client = MeteredClient([make_plan(("Alice", "a", 1), ("Bob", "b", 1))])
+    swarm, orchestrator = make_swarm(client)
+
+    response = swarm.run(orchestrator, prompt="do things", budget=Budget(max_act_calls=2), max_concurrency=1)
+
+    assert response.stop_reason == "Run stopped: budget of 2 act calls exceeded"
+    assert response.usage.total.act_calls == 2
+    assert len(client.prompts) == 1
+
+
+def test_agent_budget_only_stops_that_agent():
+    client = MeteredClient([make_plan(("Alice", "a", 1), ("Bob", "b", 1))], steps=3)
+    swarm, orchestrator = make_swarm(client)
+    swarm._get_agent("Alice").budget = Budget(max_tokens=200)
+
+    response = swarm.run(orchestrator, prompt="do things")
+
+    assert response.stop_reason is None
+    errors = {r.agent_name: r.error for r in response.results}
+    assert errors == {"Alice": "Alice stopped: token budget of 200 exceeded", "Bob": None}
+
+
+def test_usage_events_are_streamed():
+    client = MeteredClient([make_plan(("Alice", "a", 1))])
+    swarm, orchestrator = make_swarm(client)
+
+    events = [e for e in swarm.run_stream(orchestrator, prompt="do things") if isinstance(e, UsageEvent)]
+
+    assert [e.agent_name for e in events] == ["Orchestrator", "Alice", "Orchestrator"]
+    assert events[1].usage == Usage(input_tokens=100, output_tokens=10, act_calls=1, instance_seconds=events[1].usage.instance_seconds)
+    assert events[-1].total.input_tokens == 300
+
+
+def test_cache_hits_are_counted():
+    from types import SimpleNamespace
+    from swarm.usage import UsageTracker
+
+    tracker = UsageTracker()
+    agent = SimpleNamespace(name="Alice", budget=None)
+    for cache_read in (0, 900, 950):
+        tracker.add_step(agent, SimpleNamespace(usage=SimpleNamespace(
+            prompt_tokens=1000, completion_tokens=10, cache_read_input_tokens=cache_read, cache_creation_input_tokens=0,
+        )))
+
+    assert tracker.usage.total.cache_hits == 2
+    assert tracker.usage.agents["Alice"].cache_read_tokens == 1850